@@ -1,87 +1,68 @@
-import time
+import argparse
 import pandas as pd
-from bs4 import BeautifulSoup, Comment
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from io import StringIO
 import matplotlib.pyplot as plt
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http_fetcher import create_fetcher
+from fetch_scheduler import fetch_all
+from page_cache import add_cache_arguments, cache_from_args
+from fbref_tables import extract_table_html, parse_stats_table
+from player_cleaning import convert_age_series, clean_player_name_series, extract_country_code_series
+from player_store import STORE_FORMATS, save_store, store_path_for, compact_schema, compact_players, save_schema, memory_report
+from player_percentiles import DEFAULT_MIN_MINUTES, save_percentiles
+from crawl_jobs import COMPETITIONS, CrawlJournal, expand_jobs, fbref_stats_url, group_by_partition
 
 # Thư mục gốc nơi mọi thứ sẽ được lưu
 base_dir = r"C:\Users\84353\OneDrive\Desktop\BTL1_Python"
 
-# Hàm chuyển đổi tuổi sang định dạng số thập phân
-def convert_age_to_decimal(age_str):
-    try:
-        if pd.isna(age_str) or age_str == "N/A":
-            return "N/A"
-        age_str = str(age_str).strip()
-        if "-" in age_str:
-            years, days = map(int, age_str.split("-"))
-            decimal_age = years + (days / 365)
-            return round(decimal_age, 2)
-        if "." in age_str:
-            return round(float(age_str), 2)
-        if age_str.isdigit():
-            return round(float(age_str), 2)
-        return "N/A"
-    except (ValueError, AttributeError) as e:
-        print(f"⚠️ Lỗi chuyển đổi tuổi cho '{age_str}': {e}")
-        return "N/A"
-
-# Hàm trích xuất mã quốc gia từ cột "Nation"
-def extract_country_code(nation_str):
-    try:
-        if pd.isna(nation_str) or nation_str == "N/A":
-            return "N/A"
-        return nation_str.split()[-1]
-    except (AttributeError, IndexError):
-        return "N/A"
-
-# Hàm làm sạch tên cầu thủ
-def clean_player_name(name):
-    try:
-        if pd.isna(name) or name == "N/A":
-            return "N/A"
-        if "," in name:
-            parts = [part.strip() for part in name.split(",")]
-            if len(parts) >= 2:
-                return " ".join(parts[::-1])
-        return " ".join(name.split()).strip()
-    except (AttributeError, TypeError):
-        return "N/A"
-
-# Thiết lập Selenium WebDriver
-options = Options()
-options.add_argument("--headless") # Chạy trình duyệt ẩn
-options.add_argument("--disable-gpu") # Vô hiệu hóa GPU (đôi khi hữu ích trong môi trường không có GPU)
-options.add_argument("--no-sandbox") # Vô hiệu hóa sandbox (đôi khi cần thiết trong một số môi trường)
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options) # Khởi tạo WebDriver
-
-# Định nghĩa các URL và ID bảng
-urls = [
-    "https://fbref.com/en/comps/9/2024-2025/stats/2024-2025-Premier-League-Stats", # URL thống kê chung
-    "https://fbref.com/en/comps/9/2024-2025/keepers/2024-2025-Premier-League-Stats", # URL thống kê thủ môn
-    "https://fbref.com/en/comps/9/2024-2025/shooting/2024-2025-Premier-League-Stats", # URL thống kê sút bóng
-    "https://fbref.com/en/comps/9/2024-2025/passing/2024-2025-Premier-League-Stats", # URL thống kê chuyền bóng
-    "https://fbref.com/en/comps/9/2024-2025/gca/2024-2025-Premier-League-Stats", # URL thống kê kiến tạo và tạo cơ hội ghi bàn
-    "https://fbref.com/en/comps/9/2024-2025/defense/2024-2025-Premier-League-Stats", # URL thống kê phòng ngự
-    "https://fbref.com/en/comps/9/2024-2025/possession/2024-2025-Premier-League-Stats", # URL thống kê kiểm soát bóng
-    "https://fbref.com/en/comps/9/2024-2025/misc/2024-2025-Premier-League-Stats", # URL thống kê khác
+# Tham số dòng lệnh: chế độ tải trang và địa chỉ gốc của fbref
+parser = argparse.ArgumentParser(description="Thu thập và gộp các bảng thống kê cầu thủ từ fbref.")
+parser.add_argument("--fetch-mode", choices=["http", "selenium"], default="http",
+                    help="http: tải trực tiếp qua HTTP (mặc định); selenium: dùng Chrome headless làm phương án dự phòng")
+parser.add_argument("--base-url", default="https://fbref.com",
+                    help="Địa chỉ gốc của fbref, ví dụ http://localhost:8000 khi phục vụ các trang đã lưu")
+parser.add_argument("--concurrency", type=int, default=4,
+                    help="Số yêu cầu đồng thời tối đa trên mỗi host (chế độ http)")
+parser.add_argument("--min-interval", type=float, default=1.0,
+                    help="Khoảng cách tối thiểu (giây) giữa hai yêu cầu tới cùng một host")
+add_cache_arguments(parser, os.path.join(base_dir, "cache", "pages"))
+# Chế độ thu thập nhiều giải / nhiều mùa: bật khi truyền --competitions hoặc --seasons
+parser.add_argument("--competitions", nargs="+", choices=list(COMPETITIONS),
+                    help="Mã giải đấu fbref cần thu thập, ví dụ 9 12 11 20 13 (Premier League, La Liga, Serie A, Bundesliga, Ligue 1)")
+parser.add_argument("--seasons", nargs="+", help="Các mùa giải cần thu thập, ví dụ 2015-2016 2016-2017")
+parser.add_argument("--workers", type=int, default=4, help="Số luồng xử lý bảng song song ở chế độ nhiều giải / nhiều mùa")
+parser.add_argument("--crawl-dir", default=os.path.join(base_dir, "crawl"),
+                    help="Thư mục lưu nhật ký công việc và các bảng đã đọc ở chế độ nhiều giải / nhiều mùa")
+parser.add_argument("--store-format", choices=list(STORE_FORMATS), default="arrow",
+                    help="Định dạng kho dữ liệu cột ghi kèm result.csv: arrow (đọc qua memory-map) hoặc parquet (nén)")
+parser.add_argument("--percentile-min-minutes", type=int, default=DEFAULT_MIN_MINUTES,
+                    help="Số phút tối thiểu để cầu thủ được xếp hạng trong bảng phân vị percentiles.npz (mặc định 900)")
+args = parser.parse_args()
+
+# Khởi tạo bộ tải trang (HTTP mặc định, Selenium chỉ khi được yêu cầu)
+# Ở chế độ HTTP, các trang được lưu đệm trên đĩa và xác thực lại bằng yêu cầu có điều kiện
+if args.fetch_mode == "http":
+    fetcher = create_fetcher("http", cache=cache_from_args(args))
+else:
+    fetcher = create_fetcher("selenium")
+fbref_base_url = args.base_url.rstrip("/")
+
+# Định nghĩa các trang thống kê và ID bảng tương ứng
+stat_pages = [
+    ("stats", "stats_standard"), # Thống kê chung
+    ("keepers", "stats_keeper"), # Thống kê thủ môn
+    ("shooting", "stats_shooting"), # Thống kê sút bóng
+    ("passing", "stats_passing"), # Thống kê chuyền bóng
+    ("gca", "stats_gca"), # Thống kê kiến tạo và tạo cơ hội ghi bàn
+    ("defense", "stats_defense"), # Thống kê phòng ngự
+    ("possession", "stats_possession"), # Thống kê kiểm soát bóng
+    ("misc", "stats_misc"), # Thống kê khác
 ]
+table_ids = [table_id for _, table_id in stat_pages]
 
-table_ids = [
-    "stats_standard", # ID bảng thống kê chung
-    "stats_keeper", # ID bảng thống kê thủ môn
-    "stats_shooting", # ID bảng thống kê sút bóng
-    "stats_passing", # ID bảng thống kê chuyền bóng
-    "stats_gca", # ID bảng thống kê kiến tạo và tạo cơ hội ghi bàn
-    "stats_defense", # ID bảng thống kê phòng ngự
-    "stats_possession", # ID bảng thống kê kiểm soát bóng
-    "stats_misc", # ID bảng thống kê khác
-]
+# Mặc định: Premier League mùa 2024-2025
+urls = [fbref_stats_url(fbref_base_url, "9", "2024-2025", page) for page, _ in stat_pages]
 
 # Định nghĩa các cột cần thiết theo đúng thứ tự
 required_columns = [
@@ -106,234 +87,325 @@ required_columns = [
     "Aerl Won", "Aerl Lost", "Aerl Won%"
 ]
 
-# Định nghĩa các từ điển đổi tên cột cho từng bảng
-column_rename_dict = {
+# Định nghĩa các cột theo kiểu dữ liệu
+int_columns = ["Matches Played", "Starts", "Minutes", "Gls", "Ast", "crdY", "crdR", "PrgC", "PrgP", "PrgR",
+               "Cmp", "TotDist", "Tkl", "TklW", "Deff Att", "Lost", "Blocks", "Sh", "Pass", "Int",
+               "Touches", "Def Pen", "Def 3rd", "Mid 3rd", "Att 3rd", "Att Pen", "Take-Ons Att",
+               "Carries", "Carries 1_3", "CPA", "Mis", "Dis", "Rec", "Rec PrgR",
+               "Fls", "Fld", "Off", "Crs", "Recov", "Aerl Won", "Aerl Lost"]
+float_columns = ["Age", "xG", "xAG", "Gls per 90", "Ast per 90", "xG per 90", "xAG per 90", "GA90", "Save%", "CS%", "PK Save%",
+                 "SoT%", "SoT per 90", "G per Sh", "Dist", "Cmp%", "ShortCmp%", "MedCmp%", "LongCmp%", "KP", "Pass into 1_3", "PPA",
+                 "CrsPA", "SCA", "SCA90", "GCA", "GCA90", "Succ%", "Tkld%", "ProDist", "Aerl Won%"]
+string_columns = ["Player", "Nation", "Team", "Position"]
+
+# Cột tạm chứa mã cầu thủ của fbref (dùng làm khóa ghép bảng, không ghi ra result.csv)
+player_id_column = "player_id"
+
+# Định nghĩa ánh xạ thuộc tính data-stat của fbref sang tên cột cho từng bảng
+# (nhận diện ô theo data-stat nên fbref thêm/bớt cột khác không làm lệch kết quả)
+column_data_stat_dict = {
     "stats_standard": {
-        "Unnamed: 1": "Player",
-        "Unnamed: 2": "Nation",
-        "Unnamed: 3": "Position",
-        "Unnamed: 4": "Team",
-        "Unnamed: 5": "Age",
-        "Playing Time": "Matches Played",
-        "Playing Time.1": "Starts",
-        "Playing Time.2": "Minutes",
-        "Performance": "Gls",
-        "Performance.1": "Ast",
-        "Performance.6": "crdY",
-        "Performance.7": "crdR",
-        "Expected": "xG",
-        "Expected.2": "xAG",
-        "Progression": "PrgC",
-        "Progression.1": "PrgP",
-        "Progression.2": "PrgR",
-        "Per 90 Minutes": "Gls per 90",
-        "Per 90 Minutes.1": "Ast per 90",
-        "Per 90 Minutes.5": "xG per 90",
-        "Per 90 Minutes.6": "xAG per 90"
+        "player": "Player",
+        "nationality": "Nation",
+        "position": "Position",
+        "team": "Team",
+        "age": "Age",
+        "games": "Matches Played",
+        "games_starts": "Starts",
+        "minutes": "Minutes",
+        "goals": "Gls",
+        "assists": "Ast",
+        "cards_yellow": "crdY",
+        "cards_red": "crdR",
+        "xg": "xG",
+        "xg_assist": "xAG",
+        "progressive_carries": "PrgC",
+        "progressive_passes": "PrgP",
+        "progressive_passes_received": "PrgR",
+        "goals_per90": "Gls per 90",
+        "assists_per90": "Ast per 90",
+        "xg_per90": "xG per 90",
+        "xg_assist_per90": "xAG per 90"
     },
     "stats_keeper": {
-        "Unnamed: 1": "Player",
-        "Performance.1": "GA90",
-        "Performance.4": "Save%",
-        "Performance.9": "CS%",
-        "Penalty Kicks.4": "PK Save%"
+        "player": "Player",
+        "gk_goals_against_per90": "GA90",
+        "gk_save_pct": "Save%",
+        "gk_clean_sheets_pct": "CS%",
+        "gk_pens_save_pct": "PK Save%"
     },
     "stats_shooting": {
-        "Unnamed: 1": "Player",
-        "Standard.3": "SoT%",
-        "Standard.5": "SoT per 90",
-        "Standard.6": "G per Sh",
-        "Standard.8": "Dist"
+        "player": "Player",
+        "shots_on_target_pct": "SoT%",
+        "shots_on_target_per90": "SoT per 90",
+        "goals_per_shot": "G per Sh",
+        "average_shot_distance": "Dist"
     },
     "stats_passing": {
-        "Unnamed: 1": "Player",
-        "Total": "Cmp",
-        "Total.2": "Cmp%",
-        "Total.3": "TotDist",
-        "Short.2": "ShortCmp%",
-        "Medium.2": "MedCmp%",
-        "Long.2": "LongCmp%",
-        "Unnamed: 26": "KP",
-        "Unnamed: 27": "Pass into 1_3",
-        "Unnamed: 28": "PPA",
-        "Unnamed: 29": "CrsPA",
+        "player": "Player",
+        "passes_completed": "Cmp",
+        "passes_pct": "Cmp%",
+        "passes_total_distance": "TotDist",
+        "passes_pct_short": "ShortCmp%",
+        "passes_pct_medium": "MedCmp%",
+        "passes_pct_long": "LongCmp%",
+        "assisted_shots": "KP",
+        "passes_into_final_third": "Pass into 1_3",
+        "passes_into_penalty_area": "PPA",
+        "crosses_into_penalty_area": "CrsPA",
     },
     "stats_gca": {
-        "Unnamed: 1": "Player",
-        "SCA.1": "SCA90",
-        "GCA.1": "GCA90",
+        "player": "Player",
+        "sca": "SCA",
+        "sca_per90": "SCA90",
+        "gca": "GCA",
+        "gca_per90": "GCA90",
     },
     "stats_defense": {
-        "Unnamed: 1": "Player",
-        "Tackles": "Tkl", "Tackles.1": "TklW",
-        "Challenges.1": "Deff Att",
-        "Challenges.3": "Lost",
-        "Blocks": "Blocks",
-        "Blocks.1": "Sh",
-        "Blocks.2": "Pass",
-        "Unnamed: 20": "Int",
+        "player": "Player",
+        "tackles": "Tkl", "tackles_won": "TklW",
+        "challenges": "Deff Att",
+        "challenges_lost": "Lost",
+        "blocks": "Blocks",
+        "blocked_shots": "Sh",
+        "blocked_passes": "Pass",
+        "interceptions": "Int",
     },
     "stats_possession": {
-        "Unnamed: 1": "Player",
-        "Touches": "Touches",
-        "Touches.1": "Def Pen",
-        "Touches.2": "Def 3rd",
-        "Touches.3": "Mid 3rd",
-        "Touches.4": "Att 3rd",
-        "Touches.5": "Att Pen",
-        "Touches.6": "Live",
-        "Take-Ons": "Take-Ons Att",
-        "Take-Ons.2": "Succ%",
-        "Take-Ons.4": "Tkld%",
-        "Carries": "Carries",
-        "Carries.2": "ProDist",
-        "Carries.4": "Carries 1_3",
-        "Carries.5": "CPA",
-        "Carries.6": "Mis",
-        "Carries.7": "Dis",
-        "Receiving": "Rec",
-        "Receiving.1": "Rec PrgR",
+        "player": "Player",
+        "touches": "Touches",
+        "touches_def_pen_area": "Def Pen",
+        "touches_def_3rd": "Def 3rd",
+        "touches_mid_3rd": "Mid 3rd",
+        "touches_att_3rd": "Att 3rd",
+        "touches_att_pen_area": "Att Pen",
+        "take_ons": "Take-Ons Att",
+        "take_ons_won_pct": "Succ%",
+        "take_ons_tackled_pct": "Tkld%",
+        "carries": "Carries",
+        "carries_progressive_distance": "ProDist",
+        "carries_into_final_third": "Carries 1_3",
+        "carries_into_penalty_area": "CPA",
+        "miscontrols": "Mis",
+        "dispossessed": "Dis",
+        "passes_received": "Rec",
+        "progressive_passes_received": "Rec PrgR",
     },
     "stats_misc": {
-        "Unnamed: 1": "Player",
-        "Performance.3": "Fls",
-        "Performance.4": "Fld",
-        "Performance.5": "Off",
-        "Performance.6": "Crs",
-        "Performance.12": "Recov",
-        "Aerial Duels": "Aerl Won",
-        "Aerial Duels.1": "Aerl Lost",
-        "Aerial Duels.2": "Aerl Won%"
+        "player": "Player",
+        "fouls": "Fls",
+        "fouled": "Fld",
+        "offsides": "Off",
+        "crosses": "Crs",
+        "ball_recoveries": "Recov",
+        "aerials_won": "Aerl Won",
+        "aerials_lost": "Aerl Lost",
+        "aerials_won_pct": "Aerl Won%"
     }
 }
 
-# Khởi tạo từ điển để lưu trữ tất cả các bảng
-all_tables = {}
-
-# Thu thập và xử lý từng bảng
-for url, table_id in zip(urls, table_ids):
-    print(f"🔍 Đang xử lý {table_id} từ {url}")
-    driver.get(url)
-    time.sleep(3) # Đợi trang tải xong
-
-    soup = BeautifulSoup(driver.page_source, "html.parser")
-    # Tìm kiếm các comment trong HTML
-    comments = soup.find_all(string=lambda text: isinstance(text, Comment))
-    table = None
-    # Duyệt qua các comment để tìm bảng có ID phù hợp
-    for comment in comments:
-        if table_id in comment:
-            comment_soup = BeautifulSoup(comment, "html.parser")
-            table = comment_soup.find("table", {"id": table_id})
-            if table:
-                break # Tìm thấy bảng, thoát vòng lặp
-
-    if not table:
+# Đọc bảng của một trang đã tải vào DataFrame có kiểu dữ liệu và làm sạch các cột (None nếu không đọc được)
+def read_table(table_id, page_source):
+    # Cắt đúng đoạn HTML của bảng (kể cả khi bảng nằm trong comment) rồi chỉ phân tích đoạn đó
+    table_html = extract_table_html(page_source, table_id)
+
+    if not table_html:
         print(f"⚠️ Không tìm thấy bảng {table_id}!")
-        continue # Bỏ qua bảng này và chuyển sang bảng tiếp theo
+        return None # Bỏ qua bảng này
 
     try:
-        # Đọc bảng HTML vào DataFrame
-        df = pd.read_html(StringIO(str(table)), header=0)[0]
+        # Đọc bảng theo thuộc tính data-stat, các cột số được chuyển kiểu ngay khi đọc
+        # ("Age" giữ dạng chuỗi "năm-ngày" để chuyển đổi riêng bên dưới)
+        # Mọi bảng đều đọc thêm mã cầu thủ của fbref và cột "team" để làm khóa ghép (player_id, Team)
+        df = parse_stats_table(table_html, {**column_data_stat_dict[table_id], "team": "Team"},
+                               int_columns=int_columns,
+                               float_columns=[col for col in float_columns if col != "Age"],
+                               id_column=player_id_column)
     except Exception as e:
         print(f"❌ Lỗi khi đọc bảng {table_id}: {e}")
-        continue # Xử lý lỗi và bỏ qua bảng này
-
-    print(f"📋 Các cột gốc trong {table_id}:", df.columns.tolist())
-    # Đổi tên các cột theo từ điển đã định nghĩa
-    df = df.rename(columns=column_rename_dict.get(table_id, {}))
-    # Xóa các cột trùng lặp (do header nhiều dòng)
-    df = df.loc[:, ~df.columns.duplicated()]
+        return None # Xử lý lỗi và bỏ qua bảng này
 
     # Làm sạch và xử lý cột "Player"
     if "Player" in df.columns:
-        df["Player"] = df["Player"].apply(clean_player_name)
+        df["Player"] = clean_player_name_series(df["Player"])
         print(f"Tên cầu thủ mẫu trong {table_id}:", df["Player"].head(5).tolist())
 
     # Chuyển đổi và xử lý cột "Age"
     if "Age" in df.columns:
         print(f"Giá trị Age thô trong {table_id} (trước khi chuyển đổi):", df["Age"].head(5).tolist())
-        df["Age"] = df["Age"].apply(convert_age_to_decimal)
+        df["Age"] = convert_age_series(df["Age"])
         print(f"Giá trị Age đã xử lý trong {table_id} (sau khi chuyển đổi):", df["Age"].head(5).tolist())
 
-    print(f"📝 Các cột đã đổi tên và làm sạch trong {table_id}:", df.columns.tolist())
-    # Lưu DataFrame vào từ điển
-    all_tables[table_id] = df
-
-# Gộp tất cả các DataFrame dựa trên cột "Player"
-merged_df = None
+    print(f"📝 Các cột đã đọc và làm sạch trong {table_id}:", df.columns.tolist())
+    return df
 
-for table_id, df in all_tables.items():
-    # Chỉ giữ lại các cột cần thiết
-    df = df[[col for col in df.columns if col in required_columns]]
-    # Xóa các hàng trùng lặp dựa trên "Player"
-    df = df.drop_duplicates(subset=["Player"], keep="first")
-
-    if merged_df is None:
-        merged_df = df # Bảng đầu tiên được gán làm merged_df
+# Đánh chỉ mục một bảng theo khóa (mã cầu thủ fbref, đội bóng) và chỉ giữ các cột cần thiết
+# (cầu thủ chuyển đội giữa mùa có một dòng cho mỗi đội; hai cầu thủ trùng tên vẫn có mã khác nhau)
+def index_by_player(df):
+    # Dòng không có liên kết tới trang cầu thủ thì dùng tên làm mã
+    if player_id_column in df.columns:
+        player_ids = df[player_id_column].fillna(df["Player"])
     else:
+        player_ids = df["Player"]
+    teams = df["Team"].fillna("") if "Team" in df.columns else pd.Series("", index=df.index)
+    key = pd.MultiIndex.from_arrays([player_ids, teams], names=[player_id_column, "Team"])
+    df = df[[col for col in df.columns if col in required_columns]].set_axis(key, axis=0)
+    # Xóa các dòng trùng khóa, giữ dòng đầu tiên
+    return df[~df.index.duplicated(keep="first")]
+
+# Gộp các bảng của cùng một giải / một mùa thành một DataFrame (None nếu thiếu bảng thống kê chung)
+def merge_tables(tables):
+    if "stats_standard" not in tables:
+        print("❌ Thiếu bảng stats_standard (chứa số phút thi đấu), không thể gộp dữ liệu!")
+        return None
+
+    # Bảng thống kê chung quyết định danh sách cầu thủ; lọc cầu thủ có hơn 90 phút thi đấu ngay tại đây
+    standard = index_by_player(tables["stats_standard"])
+    standard = standard[standard["Minutes"].notna() & (standard["Minutes"] > 90)]
+
+    # Mỗi bảng còn lại được căn theo chỉ mục của bảng thống kê chung (tra cứu băm theo khóa)
+    # rồi ghép tất cả trong một lần nối theo cột, thay cho chuỗi pd.merge sao chép bảng sau mỗi lần gộp
+    frames = [standard]
+    for table_id in [tid for tid in table_ids if tid in tables and tid != "stats_standard"]:
+        df = index_by_player(tables[table_id]).drop(columns=["Player", "Team"], errors="ignore")
+        frames.append(df.reindex(standard.index))
+    merged_df = pd.concat(frames, axis=1)
+
+    # Sắp xếp theo tên cầu thủ và sắp xếp lại các cột theo thứ tự của required_columns
+    merged_df = merged_df.sort_values("Player", kind="stable").reset_index(drop=True)
+    merged_df = merged_df.loc[:, [col for col in required_columns if col in merged_df.columns]]
+
+    # Chuyển đổi cột "Nation" chỉ còn mã quốc gia
+    if "Nation" in merged_df.columns:
+        merged_df["Nation"] = extract_country_code_series(merged_df["Nation"])
+
+    # Làm sạch lại cột "Player" sau khi gộp
+    if "Player" in merged_df.columns:
+        merged_df["Player"] = clean_player_name_series(merged_df["Player"])
+
+    # Điền giá trị NaN trong các cột chuỗi bằng "N/A"
+    for col in string_columns:
+        if col in merged_df.columns:
+            merged_df[col] = merged_df[col].fillna("N/A")
+    return merged_df
+
+# Lưu DataFrame đã gộp vào tệp CSV (giữ nguyên các giá trị NaN dưới dạng "N/A") và kho dữ liệu cột
+def save_result(merged_df, result_path):
+    os.makedirs(os.path.dirname(result_path), exist_ok=True)
+    merged_df.to_csv(result_path, index=False, encoding="utf-8-sig", na_rep="N/A") # na_rep="N/A" để biểu diễn NaN bằng "N/A" trong CSV
+    print(f"✅ Đã lưu dữ liệu đã gộp thành công vào {result_path} với {merged_df.shape[0]} hàng và {merged_df.shape[1]} cột.")
+    # Ghi thêm bản có kiểu dữ liệu (schema nhúng trong tệp) để các script khác đọc qua player_store.load_players
+    save_store(merged_df, store_path_for(result_path, args.store_format), string_columns=string_columns)
+    # Schema gọn (số nguyên / số thực nhỏ nhất không mất thông tin, chuỗi ít giá trị thành categorical dùng chung
+    # một từ điển) để các script đọc lại bảng với load_players(..., compact=True), kèm báo cáo bộ nhớ trước / sau
+    schema = compact_schema(merged_df)
+    schema_path = save_schema(schema, result_path)
+    report = memory_report(merged_df, compact_players(merged_df, schema))
+    before_bytes, after_bytes = report.loc["Tổng", "Byte trước"], report.loc["Tổng", "Byte sau"]
+    print(f"📦 Đã lưu schema gọn vào {schema_path}: bộ nhớ {before_bytes / 1e6:.2f} MB -> {after_bytes / 1e6:.2f} MB "
+          f"(giảm {before_bytes / after_bytes:.1f} lần).")
+    # Bảng phân vị của mọi cột số (toàn giải và theo vị trí) để tra hồ sơ cầu thủ không cần xếp hạng lại
+    save_percentiles(merged_df, result_path, min_minutes=args.percentile_min_minutes)
+
+# WebDriver không dùng chung được giữa nhiều luồng nên chế độ Selenium chỉ tải tuần tự
+concurrency = args.concurrency if args.fetch_mode == "http" else 1
+cached_func = fetcher.get_cached_page_source if args.fetch_mode == "http" else None
+
+# Chế độ nhiều giải / nhiều mùa: mỗi (giải, mùa, trang thống kê) là một công việc được ghi vào nhật ký
+# khi xong, các bảng được xử lý bởi một nhóm luồng và mỗi (giải, mùa) được lưu thành một tệp riêng
+def run_crawl():
+    competitions = args.competitions or ["9"]
+    seasons = args.seasons or ["2024-2025"]
+    jobs = expand_jobs(fbref_base_url, competitions, seasons, stat_pages)
+    journal = CrawlJournal(os.path.join(args.crawl_dir, "journal.jsonl"))
+    pending = [job for job in jobs if not journal.is_done(job.job_id)]
+    print(f"🗂️ {len(jobs)} công việc ({len(competitions)} giải x {len(seasons)} mùa x {len(stat_pages)} trang), "
+          f"{len(jobs) - len(pending)} đã xong từ lần chạy trước, còn {len(pending)}")
+
+    job_by_url = {job.url: job for job in pending}
+
+    def save_table(job, page_source):
+        df = read_table(job.table_id, page_source)
+        if df is None:
+            raise ValueError(f"Không đọc được bảng {job.table_id}")
+        table_path = os.path.join(args.crawl_dir, "tables", job.competition, job.season, f"{job.table_id}.pkl")
+        os.makedirs(os.path.dirname(table_path), exist_ok=True)
+        # Ghi ra tệp tạm rồi đổi tên để không bao giờ để lại tệp ghi dở
+        df.to_pickle(table_path + ".tmp")
+        os.replace(table_path + ".tmp", table_path)
+        return table_path
+
+    def record_job(job, future):
         try:
-            # Gộp các DataFrame bằng cách sử dụng cột "Player"
-            merged_df = pd.merge(merged_df, df, on="Player", how="outer", validate="1:1")
+            journal.record(job.job_id, "done", future.result())
+            print(f"✅ Xong {job.job_id}")
         except Exception as e:
-            print(f"❌ Lỗi khi gộp bảng {table_id}: {e}")
-            continue # Xử lý lỗi gộp và bỏ qua bảng này
-
-# Sắp xếp lại các cột theo thứ tự của required_columns
-merged_df = merged_df.loc[:, [col for col in required_columns if col in merged_df.columns]]
-
-# Chuyển đổi cột "Minutes" sang dạng số, xử lý các giá trị không hợp lệ
-merged_df["Minutes"] = pd.to_numeric(merged_df["Minutes"], errors="coerce")
-
-# Định nghĩa các cột theo kiểu dữ liệu
-int_columns = ["Matches Played", "Starts", "Minutes", "Gls", "Ast", "crdY", "crdR", "PrgC", "PrgP", "PrgR",
-               "Cmp", "TotDist", "Tkl", "TklW", "Deff Att", "Lost", "Blocks", "Sh", "Pass", "Int",
-               "Touches", "Def Pen", "Def 3rd", "Mid 3rd", "Att 3rd", "Att Pen", "Take-Ons Att",
-               "Carries", "Carries 1_3", "CPA", "Mis", "Dis", "Rec", "Rec PrgR",
-               "Fls", "Fld", "Off", "Crs", "Recov", "Aerl Won", "Aerl Lost"]
-float_columns = ["Age", "xG", "xAG", "Gls per 90", "Ast per 90", "xG per 90", "xAG per 90", "GA90", "Save%", "CS%", "PK Save%",
-                 "SoT%", "SoT per 90", "G per Sh", "Dist", "Cmp%", "ShortCmp%", "MedCmp%", "LongCmp%", "KP", "Pass into 1_3", "PPA",
-                 "CrsPA", "SCA", "SCA90", "GCA", "GCA90", "Succ%", "Tkld%", "ProDist", "Aerl Won%"]
-string_columns = ["Player", "Nation", "Team", "Position"]
-
-# Chuyển đổi các cột kiểu số nguyên, xử lý các giá trị không hợp lệ thành NaN
-for col in int_columns:
-    if col in merged_df.columns:
-        merged_df[col] = pd.to_numeric(merged_df[col], errors="coerce").astype("Int64")
-
-# Chuyển đổi các cột kiểu số thực, giữ nguyên NaN
-for col in float_columns:
-    if col in merged_df.columns:
-        merged_df[col] = pd.to_numeric(merged_df[col], errors="coerce").round(2)
-
-# Lọc ra các cầu thủ có hơn 90 phút thi đấu
-merged_df = merged_df[merged_df["Minutes"].notna() & (merged_df["Minutes"] > 90)]
-
-# Chuyển đổi cột "Nation" chỉ còn mã quốc gia
-if "Nation" in merged_df.columns:
-    merged_df["Nation"] = merged_df["Nation"].apply(extract_country_code)
-
-# Làm sạch lại cột "Player" sau khi gộp
-if "Player" in merged_df.columns:
-    merged_df["Player"] = merged_df["Player"].apply(clean_player_name)
-
-# Điền giá trị NaN trong các cột chuỗi bằng "N/A"
-for col in string_columns:
-    if col in merged_df.columns:
-        merged_df[col] = merged_df[col].fillna("N/A")
-
-# In vài dòng đầu để kiểm tra
-print("\n📊 Xem trước DataFrame cuối cùng (5 dòng đầu) trước khi lưu vào result.csv:")
-print(merged_df.head(5).to_string())
+            journal.record(job.job_id, "failed", error=str(e))
+            print(f"❌ Lỗi khi xử lý {job.job_id}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        def on_page(url, page_source):
+            job = job_by_url[url]
+            future = pool.submit(save_table, job, page_source)
+            future.add_done_callback(lambda f: record_job(job, f))
+
+        def on_error(url, error):
+            job = job_by_url[url]
+            journal.record(job.job_id, "failed", error=str(error))
+            print(f"❌ Lỗi khi tải trang {url}: {error}")
+
+        fetch_all(list(job_by_url), fetcher.get_page_source, on_page, per_host_concurrency=concurrency,
+                  min_interval=args.min_interval, on_error=on_error, cached_func=cached_func)
+
+    # Gộp và lưu từng (giải, mùa) khi mọi trang của nó đã xong
+    for partition, partition_jobs in group_by_partition(jobs).items():
+        if journal.is_done(partition):
+            continue
+        unfinished = [job.job_id for job in partition_jobs if not journal.is_done(job.job_id)]
+        if unfinished:
+            print(f"⏸️ {partition}: còn {len(unfinished)} trang chưa xong, chạy lại lệnh để tiếp tục")
+            continue
+        tables = {job.table_id: pd.read_pickle(journal.output(job.job_id)) for job in partition_jobs}
+        merged_df = merge_tables(tables)
+        if merged_df is None:
+            continue
+        competition, season = partition.split("/")
+        result_path = os.path.join(base_dir, "csv", COMPETITIONS[competition], season, "result.csv")
+        save_result(merged_df, result_path)
+        journal.record(partition, "done", result_path)
+
+if args.competitions or args.seasons:
+    run_crawl()
+else:
+    # Khởi tạo từ điển để lưu trữ tất cả các bảng
+    all_tables = {}
+
+    # Thu thập đồng thời các trang và xử lý từng bảng ngay khi trang của nó tải xong
+    table_id_by_url = dict(zip(urls, table_ids))
+
+    def on_page(url, page_source):
+        table_id = table_id_by_url[url]
+        print(f"🔍 Đang xử lý {table_id} từ {url}")
+        df = read_table(table_id, page_source)
+        if df is not None:
+            all_tables[table_id] = df # Lưu DataFrame vào từ điển
+
+    fetch_all(urls, fetcher.get_page_source, on_page,
+              per_host_concurrency=concurrency, min_interval=args.min_interval, cached_func=cached_func)
+
+    # Gộp tất cả các DataFrame dựa trên cột "Player"
+    merged_df = merge_tables(all_tables)
+    if merged_df is None:
+        # merge_tables đã in lý do (thiếu bảng stats_standard): không ghi result.csv
+        fetcher.close()
+        sys.exit(1)
 
-# Tạo thư mục 'csv' bên trong base_dir nếu nó chưa tồn tại
-csv_dir = os.path.join(base_dir, "csv")
-os.makedirs(csv_dir, exist_ok=True)
+    # In vài dòng đầu để kiểm tra
+    print("\n📊 Xem trước DataFrame cuối cùng (5 dòng đầu) trước khi lưu vào result.csv:")
+    print(merged_df.head(5).to_string())
 
-# Lưu DataFrame đã gộp vào tệp CSV trong thư mục 'csv', giữ nguyên các giá trị NaN
-result_path = os.path.join(csv_dir, "result.csv")
-merged_df.to_csv(result_path, index=False, encoding="utf-8-sig", na_rep="N/A") # na_rep="N/A" để biểu diễn NaN bằng "N/A" trong CSV
-print(f"✅ Đã lưu dữ liệu đã gộp thành công vào {result_path} với {merged_df.shape[0]} hàng và {merged_df.shape[1]} cột.")
+    # Lưu vào tệp result.csv trong thư mục 'csv' bên trong base_dir
+    save_result(merged_df, os.path.join(base_dir, "csv", "result.csv"))
 
-# Đóng WebDriver
-driver.quit()
\ No newline at end of file
+# Đóng bộ tải trang (session HTTP hoặc WebDriver)
+fetcher.close()
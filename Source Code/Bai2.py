@@ -1,277 +1,349 @@
-import time
+import argparse
+import itertools
+import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup, Comment
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from io import StringIO
-import matplotlib.pyplot as plt
 import os
+from player_store import load_players, iter_players
+from player_ranking import rank_extremes, ordinal
+from player_summary import summarize_groups, SUMMARY_STATS, DEFAULT_SUMMARY_STATS
+from histogram_renderer import HistogramJob, HISTOGRAM_MANIFEST, grouped_histograms, render_histograms
+from stats_cache import StatsCache
+from streaming_stats import SKETCH_ACCURACY, stream_summaries
+from team_scoring import SCORING_GROUPS, TeamScorer, parse_weights, weight_vector
 
 # Định nghĩa thư mục gốc
 base_dir = r"C:\Users\84353\OneDrive\Desktop\BTL1_Python"
 
-# Định nghĩa thư mục cho các tệp CSV đầu vào và đầu ra
-csv_dir = os.path.join(base_dir, "csv")
-
-# Định nghĩa đường dẫn đến tệp CSV đầu vào trong thư mục csv
-input_csv_path = os.path.join(csv_dir, "result.csv") # Cập nhật đường dẫn
-
-# Tạo thư mục 'csv' nếu nó chưa tồn tại (hữu ích khi chạy lần đầu)
-os.makedirs(csv_dir, exist_ok=True)
-print(f"Đảm bảo thư mục {csv_dir} tồn tại.")
-
-
-# Đọc tệp CSV vào DataFrame của pandas
-try:
-    # na_values=["N/A"] để đảm bảo các giá trị "N/A" được đọc là NaN (Not a Number)
-    df = pd.read_csv(input_csv_path, na_values=["N/A"])
-    print(f"✅ Tải dữ liệu thành công từ {input_csv_path}")
-except FileNotFoundError:
-    print(f"❌ Lỗi: Không tìm thấy tệp đầu vào tại {input_csv_path}")
-    exit() # Thoát nếu không tìm thấy tệp đầu vào
-except Exception as e:
-    print(f"❌ Lỗi khi tải tệp CSV: {e}")
-    exit() # Thoát nếu có lỗi khác khi tải
-
-# Tạo một bản sao của DataFrame để thực hiện các tính toán, chuyển NaN thành 0 ở các cột số
-df_calc = df.copy()
-
-# Định nghĩa các cột cần loại trừ (không phải là số)
-exclude_columns = ["Player", "Nation", "Team", "Position"]
-
-# Chuyển NaN thành 0 trong các cột số để tính toán
-numeric_columns = [col for col in df_calc.columns if col not in exclude_columns]
-for col in numeric_columns:
-    # Chuyển sang dạng số, đảm bảo NaN cho các giá trị không phải số, sau đó điền 0 vào NaN
-    # Sử dụng errors='coerce' để biến các giá trị không phải số thành NaN trước khi điền
-    df_calc[col] = pd.to_numeric(df_calc[col], errors="coerce").fillna(0)
-
-print("Dữ liệu đã được làm sạch và các cột số đã được xử lý.")
-
-# 1. Tạo tệp top_3.txt
-rankings = {}
-for col in numeric_columns:
-    # Xử lý các trường hợp mà một cột có thể hoàn toàn là 0 hoặc không phải số sau khi chuyển đổi
-    # Kiểm tra nếu tổng tất cả các giá trị là 0 nhưng vẫn có dữ liệu trong cột
-    if df_calc[col].sum() == 0 and df_calc[col].count() > 0:
-          print(f"Bỏ qua xếp hạng cho '{col}' vì tất cả các giá trị đều là 0.")
-          continue # Bỏ qua cột này và chuyển sang cột tiếp theo nếu tất cả giá trị đều là 0
-
-    # Top 3 Cao nhất
-    # Sử dụng copy() để tránh SettingWithCopyWarning
-    top_3_high = df_calc[["Player", "Team", col]].sort_values(by=col, ascending=False).head(3).copy()
-    top_3_high = top_3_high.rename(columns={col: "Value"})
-    top_3_high["Rank"] = ["1st", "2nd", "3rd"]
-
-    # Top 3 Thấp nhất (chỉ xem xét các giá trị khác 0 nếu tồn tại)
-    # Sử dụng copy()
-    non_zero_df = df_calc[df_calc[col] > 0].copy()
-    if not non_zero_df.empty:
-        # Sử dụng copy()
-        top_3_low = non_zero_df[["Player", "Team", col]].sort_values(by=col, ascending=True).head(3).copy()
-    else:
-        # Nếu không có giá trị khác 0, lấy 3 giá trị thấp nhất từ dữ liệu gốc (sẽ là 0)
-        # Sử dụng copy()
-        top_3_low = df_calc[["Player", "Team", col]].sort_values(by=col, ascending=True).head(3).copy()
-
-
-    top_3_low = top_3_low.rename(columns={col: "Value"})
-    top_3_low["Rank"] = ["1st", "2nd", "3rd"]
-
-    rankings[col] = {
-        "Highest": top_3_high,
-        "Lowest": top_3_low
-    }
-
-# Lưu kết quả vào tệp top_3.txt trong base_dir
-top_3_path = os.path.join(base_dir, "top_3.txt")
-with open(top_3_path, "w", encoding="utf-8") as f:
-    for stat, data in rankings.items():
-        f.write(f"\nThống kê: {stat}\n")
-        f.write("\nTop 3 Cao nhất:\n")
-        # Đảm bảo các cột tồn tại trước khi cố gắng in
-        if not data["Highest"].empty:
-             f.write(data["Highest"][["Rank", "Player", "Team", "Value"]].to_string(index=False))
-        else:
-             f.write("Không có dữ liệu.\n")
-
-        f.write("\n\nTop 3 Thấp nhất:\n")
-        if not data["Lowest"].empty:
-            f.write(data["Lowest"][["Rank", "Player", "Team", "Value"]].to_string(index=False))
-        else:
-             f.write("Không có dữ liệu.\n")
-
-        f.write("\n" + "-" * 50 + "\n")
-print(f"✅ Đã lưu xếp hạng top 3 vào {top_3_path}")
-
-# 2. Tính toán trung vị (median), trung bình (mean) và độ lệch chuẩn (standard deviation) cho tệp results2.csv
-rows = []
-# Thêm hàng tổng thể trước
-all_stats = {"": "all"}
-for col in numeric_columns:
-    # Đảm bảo cột là số trước khi tính toán thống kê
-    if pd.api.types.is_numeric_dtype(df_calc[col]):
-        all_stats[f"Trung vị của {col}"] = df_calc[col].median()
-        all_stats[f"Trung bình của {col}"] = df_calc[col].mean()
-        all_stats[f"Độ lệch chuẩn của {col}"] = df_calc[col].std()
+# --- Luồng thực thi chính ---
+# Đặt trong khối __main__ để các tiến trình vẽ histogram và --stream-workers (spawn trên Windows) import script này
+# mà không chạy lại nó
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Thống kê, xếp hạng và vẽ histogram từ bảng cầu thủ (result.csv).")
+    parser.add_argument("--rank-by", nargs="+", choices=["Team", "Position"],
+                        help="Ngoài top_3.txt, xếp hạng riêng trong từng nhóm, ví dụ --rank-by Team hoặc --rank-by Team Position")
+    parser.add_argument("--rank-k", type=int, default=10, help="Số cầu thủ cao nhất / thấp nhất mỗi nhóm khi dùng --rank-by")
+    parser.add_argument("--summary-by", nargs="+", choices=["Team", "Nation", "Position"], default=["Team"],
+                        help="Khóa nhóm của bảng thống kê: Team ghi vào results2.csv, khóa khác ghi vào results2_<khóa>.csv")
+    parser.add_argument("--summary-stats", nargs="+", choices=list(SUMMARY_STATS), default=DEFAULT_SUMMARY_STATS,
+                        help="Các thống kê cho mỗi cột (mặc định: median mean std)")
+    parser.add_argument("--plot-workers", type=int, default=None,
+                        help="Số tiến trình vẽ histogram song song (mặc định: số nhân CPU)")
+    parser.add_argument("--full", action="store_true",
+                        help="Tính lại và vẽ lại toàn bộ, bỏ qua trạng thái của lần chạy trước")
+    parser.add_argument("--score-by", nargs="+", choices=list(SCORING_GROUPS), default=["Team"],
+                        help="Khóa nhóm của bảng xếp hạng điểm tổng hợp: Team, Position (vị trí chính) hoặc Nation")
+    parser.add_argument("--score-weights", nargs="+", metavar="STAT=WEIGHT",
+                        help="Trọng số có dấu cho điểm tổng hợp, ví dụ Gls=2 GA90=-1.5 (mặc định 1, thống kê tiêu cực -1; 0 là bỏ qua)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Chỉ tính results2*.csv từ luồng các khối dòng (bộ nhớ không phụ thuộc số cầu thủ); trung vị gần đúng")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Số dòng mỗi khối ở chế độ --streaming")
+    parser.add_argument("--sketch-accuracy", type=float, default=SKETCH_ACCURACY,
+                        help="Sai số tương đối tối đa của trung vị ở chế độ --streaming (mặc định 0.01 = 1%%)")
+    parser.add_argument("--stream-workers", type=int, default=1,
+                        help="Số tiến trình tính các khối ở chế độ --streaming (kết quả từng phần được gộp lại)")
+    args = parser.parse_args()
+
+    # Định nghĩa thư mục cho các tệp CSV đầu vào và đầu ra
+    csv_dir = os.path.join(base_dir, "csv")
+
+    # Định nghĩa đường dẫn đến tệp CSV đầu vào trong thư mục csv
+    input_csv_path = os.path.join(csv_dir, "result.csv") # Cập nhật đường dẫn
+
+    # Tạo thư mục 'csv' nếu nó chưa tồn tại (hữu ích khi chạy lần đầu)
+    os.makedirs(csv_dir, exist_ok=True)
+    print(f"Đảm bảo thư mục {csv_dir} tồn tại.")
+
+    # Định nghĩa các cột cần loại trừ (không phải là số)
+    exclude_columns = ["Player", "Nation", "Team", "Position"]
+
+
+    def results2_path_for(summary_key):
+        # Bảng thống kê theo đội là results2.csv, theo khóa khác là results2_<khóa>.csv
+        return os.path.join(csv_dir, "results2.csv" if summary_key == "Team" else f"results2_{summary_key}.csv")
+
+
+    # Chế độ theo luồng: đọc từng khối dòng, giữ bộ tích lũy theo nhóm (Welford / Chan + phác thảo phân vị) thay cho
+    # toàn bộ bảng; chỉ tạo các tệp results2*.csv
+    if args.streaming:
+        def cleaned_chunks():
+            for chunk in iter_players(input_csv_path, chunk_size=args.chunk_size):
+                # Cùng cách làm sạch như df_calc bên dưới: cột số, giá trị không phải số hoặc thiếu thành 0
+                for col in chunk.columns:
+                    if col not in exclude_columns:
+                        chunk[col] = pd.to_numeric(chunk[col], errors="coerce").fillna(0)
+                yield chunk
+
+        try:
+            chunks = cleaned_chunks()
+            first_chunk = next(chunks, None)
+        except FileNotFoundError:
+            print(f"❌ Lỗi: Không tìm thấy tệp đầu vào tại {input_csv_path}")
+            exit()
+        if first_chunk is None:
+            print(f"❌ Lỗi: Tệp đầu vào {input_csv_path} không có dòng nào")
+            exit()
+        stream_columns = [col for col in first_chunk.columns if col not in exclude_columns]
+        summaries = stream_summaries(itertools.chain([first_chunk], chunks), stream_columns, args.summary_by,
+                                     relative_accuracy=args.sketch_accuracy, workers=args.stream_workers)
+        for summary_key, summary in summaries.items():
+            results_df = summary.summary(args.summary_stats)
+            results_df.to_csv(results2_path_for(summary_key), index=False, encoding="utf-8-sig")
+            print(f"✅ Đã lưu thống kê (theo luồng) vào {results2_path_for(summary_key)} với {results_df.shape[0]} hàng và "
+                  f"{results_df.shape[1]} cột; trung vị có sai số tương đối tối đa {args.sketch_accuracy:.2%}.")
+        exit()
+
+
+    # Đọc tệp CSV vào DataFrame của pandas
+    try:
+        # Đọc qua bộ nạp dùng chung (kho dữ liệu cột nếu có, ngược lại result.csv); "N/A" được đọc là NaN
+        df = load_players(input_csv_path)
+        print(f"✅ Tải dữ liệu thành công từ {input_csv_path}")
+    except FileNotFoundError:
+        print(f"❌ Lỗi: Không tìm thấy tệp đầu vào tại {input_csv_path}")
+        exit() # Thoát nếu không tìm thấy tệp đầu vào
+    except Exception as e:
+        print(f"❌ Lỗi khi tải tệp CSV: {e}")
+        exit() # Thoát nếu có lỗi khác khi tải
+
+    # DataFrame dùng cho các tính toán, chuyển NaN thành 0 ở các cột số; mỗi cột số được thay bằng cột mới
+    # và df không còn được dùng sau đây nên không cần sao chép cả bảng
+    df_calc = df
+
+    # Chuyển NaN thành 0 trong các cột số để tính toán
+    numeric_columns = [col for col in df_calc.columns if col not in exclude_columns]
+    for col in numeric_columns:
+        # Chuyển sang dạng số, đảm bảo NaN cho các giá trị không phải số, sau đó điền 0 vào NaN
+        # Sử dụng errors='coerce' để biến các giá trị không phải số thành NaN trước khi điền
+        df_calc[col] = pd.to_numeric(df_calc[col], errors="coerce").fillna(0)
+
+    print("Dữ liệu đã được làm sạch và các cột số đã được xử lý.")
+
+    # Trạng thái của lần chạy trước (dấu vân tay theo đội và cột, các bảng trung gian): chỉ tính lại các đội,
+    # cột và xếp hạng bị ảnh hưởng bởi dữ liệu thay đổi; --full để tính lại toàn bộ
+    stats_cache = StatsCache(os.path.join(base_dir, "cache", "bai2"),
+                             config={"columns": numeric_columns, "summary_stats": args.summary_stats}, full=args.full)
+    team_changes = stats_cache.changes(df_calc, "Team", numeric_columns)
+    if team_changes.full:
+        print("🔄 Tính lại toàn bộ (không dùng trạng thái của lần chạy trước).")
     else:
-        all_stats[f"Trung vị của {col}"] = None # Hoặc một chỉ báo nào đó
-        all_stats[f"Trung bình của {col}"] = None
-        all_stats[f"Độ lệch chuẩn của {col}"] = None
-
-rows.append(all_stats)
-
-# Tính toán thống kê cho từng đội
-teams = sorted(df_calc["Team"].unique()) # Lấy danh sách các đội duy nhất và sắp xếp
-for team in teams:
-    # Sử dụng copy()
-    team_df = df_calc[df_calc["Team"] == team].copy()
-    team_stats = {"": team}
+        print(f"🔄 So với lần chạy trước: {len(team_changes.changed_groups)}/{len(team_changes.groups)} đội và "
+              f"{len(team_changes.changed_columns)}/{len(numeric_columns)} cột thay đổi.")
+
+    # 1. Tạo tệp top_3.txt
+    ranked_columns = []
     for col in numeric_columns:
-          if pd.api.types.is_numeric_dtype(team_df[col]):
-              team_stats[f"Trung vị của {col}"] = team_df[col].median()
-              team_stats[f"Trung bình của {col}"] = team_df[col].mean()
-              team_stats[f"Độ lệch chuẩn của {col}"] = team_df[col].std()
-          else:
-              team_stats[f"Trung vị của {col}"] = None
-              team_stats[f"Trung bình của {col}"] = None
-              team_stats[f"Độ lệch chuẩn của {col}"] = None
-    rows.append(team_stats)
-
-# Tạo DataFrame từ các hàng thống kê
-results_df = pd.DataFrame(rows)
-# Đổi tên cột đầu tiên
-results_df = results_df.rename(columns={"": "Đội/Tổng thể"})
-for col in results_df.columns:
-    if col != "Đội/Tổng thể":
-        # Chỉ làm tròn các cột số
-        if pd.api.types.is_numeric_dtype(results_df[col]):
-            results_df[col] = results_df[col].round(2)
-
-# Lưu kết quả vào tệp results2.csv trong thư mục 'csv'
-results2_path = os.path.join(csv_dir, "results2.csv")
-results_df.to_csv(results2_path, index=False, encoding="utf-8-sig")
-print(f"✅ Đã lưu thống kê thành công vào {results2_path} với {results_df.shape[0]} hàng và {results_df.shape[1]} cột.")
-
-# 3. Vẽ biểu đồ histogram cho các thống kê đã chọn
-selected_stats = ["Gls per 90", "xG per 90", "SCA90", "GA90", "TklW", "Blocks"]
-histograms_dir = os.path.join(base_dir, "histograms")
-league_dir = os.path.join(histograms_dir, "league")
-teams_dir = os.path.join(histograms_dir, "teams")
-
-# Tạo các thư mục lưu histogram
-os.makedirs(league_dir, exist_ok=True)
-os.makedirs(teams_dir, exist_ok=True)
-print(f"Đảm bảo các thư mục {league_dir} và {teams_dir} tồn tại.")
-
-# Lấy danh sách các đội đã sắp xếp
-teams = sorted(df_calc["Team"].unique())
-for stat in selected_stats:
-    # Kiểm tra xem thống kê có tồn tại và là kiểu số hay không
-    if stat not in df_calc.columns or not pd.api.types.is_numeric_dtype(df_calc[stat]):
-        print(f"⚠️ Thống kê '{stat}' không tìm thấy hoặc không phải là số trong DataFrame. Bỏ qua việc tạo histogram.")
-        continue
-
-    # Histogram toàn giải đấu
-    plt.figure(figsize=(10, 6))
-    plt.hist(df_calc[stat], bins=20, color="skyblue", edgecolor="black")
-    plt.title(f"Phân phối toàn giải đấu của {stat}")
-    plt.xlabel(stat)
-    plt.ylabel("Số lượng cầu thủ")
-    plt.grid(True, alpha=0.3)
-    # Lưu biểu đồ
-    plt.savefig(os.path.join(league_dir, f"{stat}_league.png"), bbox_inches="tight")
-    plt.close() # Đóng biểu đồ để giải phóng bộ nhớ
-    print(f"📊 Đã lưu histogram toàn giải đấu cho {stat}")
-
-    # Histogram cho từng đội
-    for team in teams:
-        # Sử dụng copy()
-        team_data = df_calc[df_calc["Team"] == team].copy()
-        # Kiểm tra nếu dữ liệu đội rỗng hoặc cột thống kê không phải số
-        if team_data.empty or not pd.api.types.is_numeric_dtype(team_data[stat]):
-             print(f"Bỏ qua histogram cho '{team}' - '{stat}' do dữ liệu rỗng hoặc cột không phải số.")
-             continue
-
-        plt.figure(figsize=(8, 6))
+        # Xử lý các trường hợp mà một cột có thể hoàn toàn là 0 hoặc không phải số sau khi chuyển đổi
+        # Kiểm tra nếu tổng tất cả các giá trị là 0 nhưng vẫn có dữ liệu trong cột
+        if df_calc[col].sum() == 0 and df_calc[col].count() > 0:
+              print(f"Bỏ qua xếp hạng cho '{col}' vì tất cả các giá trị đều là 0.")
+              continue # Bỏ qua cột này và chuyển sang cột tiếp theo nếu tất cả giá trị đều là 0
+        ranked_columns.append(col)
+
+    # Top 3 cao nhất và top 3 thấp nhất (chỉ xét các giá trị khác 0 nếu tồn tại) của mọi cột trong một lần tính;
+    # giá trị bằng nhau thì cầu thủ đứng trước trong bảng xếp trước
+    # Vị trí dòng đã lưu chỉ dùng lại được khi thứ tự cầu thủ không đổi
+    cached_extremes = None if stats_cache.row_order_changed(df_calc) else stats_cache.table("top_3")
+    if cached_extremes is None:
+        extremes = rank_extremes(df_calc, ranked_columns, k=3)
+    else:
+        # Xếp hạng của một cột chỉ có thể thay đổi khi cột đó thay đổi ở ít nhất một đội
+        changed_columns = set(team_changes.changed_columns)
+        cached_columns = set(cached_extremes["Stat"])
+        stale_columns = [col for col in ranked_columns if col in changed_columns or col not in cached_columns]
+        extremes = pd.concat([
+            cached_extremes[cached_extremes["Stat"].isin(set(ranked_columns) - set(stale_columns))],
+            rank_extremes(df_calc, stale_columns, k=3),
+        ], ignore_index=True)
+        column_order = {col: i for i, col in enumerate(ranked_columns)}
+        extremes = extremes.sort_values("Stat", key=lambda stats: stats.map(column_order), kind="stable")
+    stats_cache.set_table("top_3", extremes)
+    rankings = {}
+    for (col, side), ranked in extremes.groupby(["Stat", "Side"], sort=False):
+        # Lấy lại Player, Team và giá trị từ df_calc để giữ nguyên kiểu dữ liệu (số nguyên / số thực) của cột
+        table = df_calc[["Player", "Team", col]].iloc[ranked["Row"]].rename(columns={col: "Value"})
+        table.insert(0, "Rank", [ordinal(rank) for rank in ranked["Rank"]])
+        rankings.setdefault(col, {"Highest": pd.DataFrame(), "Lowest": pd.DataFrame()})[side] = table
+
+    # Lưu kết quả vào tệp top_3.txt trong base_dir
+    top_3_path = os.path.join(base_dir, "top_3.txt")
+    with open(top_3_path, "w", encoding="utf-8") as f:
+        for stat, data in rankings.items():
+            f.write(f"\nThống kê: {stat}\n")
+            f.write("\nTop 3 Cao nhất:\n")
+            # Đảm bảo các cột tồn tại trước khi cố gắng in
+            if not data["Highest"].empty:
+                 f.write(data["Highest"][["Rank", "Player", "Team", "Value"]].to_string(index=False))
+            else:
+                 f.write("Không có dữ liệu.\n")
+
+            f.write("\n\nTop 3 Thấp nhất:\n")
+            if not data["Lowest"].empty:
+                f.write(data["Lowest"][["Rank", "Player", "Team", "Value"]].to_string(index=False))
+            else:
+                 f.write("Không có dữ liệu.\n")
+
+            f.write("\n" + "-" * 50 + "\n")
+    print(f"✅ Đã lưu xếp hạng top 3 vào {top_3_path}")
+
+    # Xếp hạng theo nhóm (tùy chọn): top-k cao nhất / thấp nhất của mọi thống kê trong từng đội / vị trí
+    if args.rank_by:
+        group_rankings = rank_extremes(df_calc, ranked_columns, k=args.rank_k, by=args.rank_by)
+        group_rankings.insert(len(args.rank_by), "Player", df_calc["Player"].iloc[group_rankings["Row"]].to_numpy())
+        group_rankings["Rank"] = group_rankings["Rank"].map(ordinal)
+        group_rankings_path = os.path.join(csv_dir, f"top_{args.rank_k}_by_{'_'.join(args.rank_by)}.csv")
+        group_rankings.drop(columns="Row").to_csv(group_rankings_path, index=False, encoding="utf-8-sig")
+        print(f"✅ Đã lưu xếp hạng top {args.rank_k} theo {', '.join(args.rank_by)} vào {group_rankings_path} ({len(group_rankings)} dòng).")
+
+    # 2. Tính toán trung vị (median), trung bình (mean) và độ lệch chuẩn (standard deviation) cho tệp results2.csv
+    # Hàng "all" cho toàn bộ cầu thủ, sau đó mỗi đội (hoặc quốc tịch / vị trí) một hàng, tính trong một lần gom nhóm
+    for summary_key in args.summary_by:
+        changes = stats_cache.changes(df_calc, summary_key, numeric_columns)
+        # Bảng chưa làm tròn của lần chạy trước; chỉ các nhóm và cột thay đổi (cùng hàng "all" của các cột đó) được tính lại
+        summary = stats_cache.table(f"summary_{summary_key}")
+        if summary is None:
+            summary = summarize_groups(df_calc, numeric_columns, by=summary_key, stats=args.summary_stats, decimals=None)
+        elif changes.changed_columns:
+            label_column = summary.columns[0]
+            fresh = summarize_groups(df_calc, changes.changed_columns, by=summary_key, stats=args.summary_stats,
+                                     decimals=None, groups=changes.changed_groups).set_index(label_column)
+            # Bỏ các nhóm không còn dữ liệu, thêm các nhóm mới, rồi ghi đè các ô được tính lại
+            summary = summary.set_index(label_column).reindex(["all"] + changes.groups)
+            summary.loc[fresh.index, fresh.columns] = fresh
+            summary = summary.reset_index()
+        stats_cache.set_table(f"summary_{summary_key}", summary)
+        results_df = summary.round(2)
+
+        # Lưu kết quả vào tệp results2.csv trong thư mục 'csv'
+        results2_path = results2_path_for(summary_key)
+        results_df.to_csv(results2_path, index=False, encoding="utf-8-sig")
+        print(f"✅ Đã lưu thống kê thành công vào {results2_path} với {results_df.shape[0]} hàng và {results_df.shape[1]} cột.")
+
+    # 3. Vẽ biểu đồ histogram cho các thống kê đã chọn
+    selected_stats = ["Gls per 90", "xG per 90", "SCA90", "GA90", "TklW", "Blocks"]
+    histograms_dir = os.path.join(base_dir, "histograms")
+    league_dir = os.path.join(histograms_dir, "league")
+    teams_dir = os.path.join(histograms_dir, "teams")
+
+    # Tạo các thư mục lưu histogram
+    os.makedirs(league_dir, exist_ok=True)
+    os.makedirs(teams_dir, exist_ok=True)
+    print(f"Đảm bảo các thư mục {league_dir} và {teams_dir} tồn tại.")
+
+    histogram_stats = []
+    for stat in selected_stats:
+        # Kiểm tra xem thống kê có tồn tại và là kiểu số hay không
+        if stat not in df_calc.columns or not pd.api.types.is_numeric_dtype(df_calc[stat]):
+            print(f"⚠️ Thống kê '{stat}' không tìm thấy hoặc không phải là số trong DataFrame. Bỏ qua việc tạo histogram.")
+            continue
+        histogram_stats.append(stat)
+
+    # Đếm histogram của mọi thống kê cho toàn giải và cho mọi đội (mã đội theo thứ tự tên đội) trong một lần,
+    # thay cho việc lọc lại dữ liệu từng đội cho mỗi thống kê
+    histogram_values = df_calc[histogram_stats].to_numpy(dtype="float64")
+    team_codes, teams = pd.factorize(df_calc["Team"], sort=True)
+    league_edges, league_counts = grouped_histograms(histogram_values, np.zeros(len(df_calc), dtype=np.intp), 1, bins=20)
+    team_edges, team_counts = grouped_histograms(histogram_values, team_codes, len(teams), bins=10)
+
+    histogram_jobs = []
+    for stat_index, stat in enumerate(histogram_stats):
+        # Histogram toàn giải đấu
+        histogram_jobs.append(HistogramJob(
+            path=os.path.join(league_dir, f"{stat}_league.png"),
+            edges=league_edges[stat_index, 0], counts=league_counts[stat_index, 0],
+            title=f"Phân phối toàn giải đấu của {stat}", xlabel=stat, ylabel="Số lượng cầu thủ",
+            color="skyblue", alpha=None, figsize=(10, 6),
+        ))
+
+        # Histogram cho từng đội
         # Sử dụng màu khác nhau cho các thống kê phòng ngự
         color = "lightgreen" if stat in ["GA90", "TklW", "Blocks"] else "skyblue"
-        plt.hist(team_data[stat], bins=10, color=color,
-                 edgecolor="black", alpha=0.7)
-        plt.title(f"{team} - Phân phối của {stat}")
-        plt.xlabel(stat)
-        plt.ylabel("Số lượng cầu thủ")
-        plt.grid(True, alpha=0.3)
         # Thay thế khoảng trắng và dấu gạch chéo cho tên tệp
         stat_filename = stat.replace(" ", "_").replace("/", "_")
-        # Lưu biểu đồ cho từng đội
-        plt.savefig(os.path.join(teams_dir, f"{team}_{stat_filename}.png"), bbox_inches="tight")
-        plt.close() # Đóng biểu đồ
-        print(f"📊 Đã lưu histogram cho {team} - {stat}")
-
-print("✅ Tất cả các histogram cho các thống kê đã chọn đã được tạo và lưu trong thư mục 'histograms'.")
-
-# 4. Xác định đội có giá trị trung bình cao nhất cho mỗi thống kê
-# Đảm bảo chỉ các cột số được bao gồm trong tính toán trung bình theo nhóm
-numeric_cols_for_mean = [col for col in numeric_columns if pd.api.types.is_numeric_dtype(df_calc[col])]
-
-if not numeric_cols_for_mean:
-    print("⚠️ Không có cột số nào khả dụng để tính toán trung bình của đội.")
-    highest_teams_df = pd.DataFrame() # Tạo DataFrame rỗng
-else:
-    # Tính trung bình cho từng đội theo các cột số
-    team_means = df_calc.groupby("Team")[numeric_cols_for_mean].mean().reset_index()
-
-    highest_teams = []
-    for stat in numeric_cols_for_mean:
-        # Kiểm tra xem cột có tồn tại và có dữ liệu trước khi tìm giá trị lớn nhất
-        if stat in team_means.columns and not team_means[stat].isnull().all():
-            # Tìm hàng có giá trị trung bình lớn nhất cho thống kê hiện tại
-            max_row = team_means.loc[team_means[stat].idxmax()]
-            highest_teams.append({
-                "Thống kê": stat,
-                "Đội": max_row["Team"],
-                "Giá trị Trung bình": round(max_row[stat], 2)
-            })
-        else:
-             print(f"Bỏ qua tính toán trung bình cao nhất cho '{stat}' do thiếu dữ liệu hoặc tất cả là NaN.")
-
-    # Tạo DataFrame từ kết quả
-    highest_teams_df = pd.DataFrame(highest_teams)
-
-# Lưu thống kê đội có giá trị cao nhất vào tệp highest_team_stats.csv trong thư mục 'csv'
-highest_team_stats_path = os.path.join(csv_dir, "highest_team_stats.csv")
-highest_teams_df.to_csv(highest_team_stats_path, index=False, encoding="utf-8-sig")
-print(f"✅ Đã lưu thống kê đội có giá trị cao nhất vào {highest_team_stats_path} với {highest_teams_df.shape[0]} hàng.")
-
-# 5. Xác định đội có thành tích tốt nhất
-# Định nghĩa các thống kê mà giá trị thấp hơn là tốt hơn (ví dụ: số bàn thua, thẻ phạt, mất bóng)
-negative_stats = [
-    "GA90", "crdY", "crdR", "Lost", "Mis", "Dis", "Fls", "Off", "Aerl Lost"
-]
-
-# Đảm bảo highest_teams_df không rỗng trước khi tiếp tục
-if not highest_teams_df.empty:
-    # Lọc ra các thống kê "tích cực" (không nằm trong danh sách negative_stats) thực sự có trong DataFrame
-    # Sử dụng copy()
-    positive_stats_df = highest_teams_df[~highest_teams_df["Thống kê"].isin(negative_stats)].copy()
-
-    if not positive_stats_df.empty:
-        # Đếm số lần mỗi đội đứng đầu trong các thống kê tích cực
-        team_wins = positive_stats_df["Đội"].value_counts()
-
-        if not team_wins.empty:
-            # Xác định đội có số lần đứng đầu nhiều nhất
-            best_team = team_wins.idxmax()
-            win_count = team_wins.max()
-
-            print(f"\nĐội có thành tích tốt nhất mùa giải Premier League 2024-2025 (dựa trên việc dẫn đầu nhiều thống kê tích cực nhất) là: {best_team}")
-            print(f"Họ dẫn đầu trong {win_count} trên tổng số {len(positive_stats_df)} thống kê tích cực.")
-        else:
-            print("\nKhông thể xác định đội có thành tích tốt nhất vì không có đội nào dẫn đầu trong các thống kê tích cực.")
+        for team_index, team in enumerate(teams):
+            histogram_jobs.append(HistogramJob(
+                path=os.path.join(teams_dir, f"{team}_{stat_filename}.png"),
+                edges=team_edges[stat_index, team_index], counts=team_counts[stat_index, team_index],
+                title=f"{team} - Phân phối của {stat}", xlabel=stat, ylabel="Số lượng cầu thủ",
+                color=color, alpha=0.7, figsize=(8, 6),
+            ))
+
+    # Vẽ song song bằng Agg; ảnh có dữ liệu đầu vào không đổi so với lần chạy trước được giữ nguyên
+    rendered, skipped = render_histograms(histogram_jobs, os.path.join(histograms_dir, HISTOGRAM_MANIFEST),
+                                          workers=args.plot_workers, force=args.full)
+    print(f"📊 Đã vẽ {rendered} histogram, giữ nguyên {skipped} histogram không đổi.")
+
+    print("✅ Tất cả các histogram cho các thống kê đã chọn đã được tạo và lưu trong thư mục 'histograms'.")
+
+    # 4. Xác định đội có giá trị trung bình cao nhất cho mỗi thống kê
+    # Đảm bảo chỉ các cột số được bao gồm trong tính toán trung bình theo nhóm
+    numeric_cols_for_mean = [col for col in numeric_columns if pd.api.types.is_numeric_dtype(df_calc[col])]
+
+    if not numeric_cols_for_mean:
+        print("⚠️ Không có cột số nào khả dụng để tính toán trung bình của đội.")
+        highest_teams_df = pd.DataFrame() # Tạo DataFrame rỗng
     else:
-        print("\nKhông tìm thấy thống kê tích cực nào để xác định đội có thành tích tốt nhất.")
-else:
-    print("\nKhông thể xác định đội có thành tích tốt nhất vì dữ liệu thống kê đội có giá trị cao nhất không khả dụng.")
\ No newline at end of file
+        # Đội dẫn đầu của một thống kê chỉ có thể thay đổi khi cột đó thay đổi ở ít nhất một đội
+        cached_highest = stats_cache.table("highest_team_stats")
+        stale_columns = numeric_cols_for_mean
+        if cached_highest is not None:
+            changed_columns = set(team_changes.changed_columns)
+            cached_highest = cached_highest[~cached_highest["Thống kê"].isin(changed_columns)]
+            stale_columns = [col for col in numeric_cols_for_mean if col in changed_columns]
+
+        # Tính trung bình cho từng đội theo các cột số
+        team_means = df_calc.groupby("Team")[stale_columns].mean().reset_index()
+
+        highest_teams = []
+        for stat in stale_columns:
+            # Kiểm tra xem cột có tồn tại và có dữ liệu trước khi tìm giá trị lớn nhất
+            if stat in team_means.columns and not team_means[stat].isnull().all():
+                # Tìm hàng có giá trị trung bình lớn nhất cho thống kê hiện tại
+                max_row = team_means.loc[team_means[stat].idxmax()]
+                highest_teams.append({
+                    "Thống kê": stat,
+                    "Đội": max_row["Team"],
+                    "Giá trị Trung bình": round(max_row[stat], 2)
+                })
+            else:
+                 print(f"Bỏ qua tính toán trung bình cao nhất cho '{stat}' do thiếu dữ liệu hoặc tất cả là NaN.")
+
+        # Tạo DataFrame từ kết quả, theo thứ tự các cột số
+        highest_teams_df = pd.DataFrame(highest_teams, columns=["Thống kê", "Đội", "Giá trị Trung bình"])
+        if cached_highest is not None:
+            column_order = {col: i for i, col in enumerate(numeric_cols_for_mean)}
+            highest_teams_df = pd.concat([cached_highest, highest_teams_df], ignore_index=True)
+            highest_teams_df = highest_teams_df[highest_teams_df["Thống kê"].isin(column_order)]
+            highest_teams_df = highest_teams_df.sort_values("Thống kê", key=lambda stats: stats.map(column_order),
+                                                            kind="stable", ignore_index=True)
+        stats_cache.set_table("highest_team_stats", highest_teams_df)
+
+    # Lưu thống kê đội có giá trị cao nhất vào tệp highest_team_stats.csv trong thư mục 'csv'
+    highest_team_stats_path = os.path.join(csv_dir, "highest_team_stats.csv")
+    highest_teams_df.to_csv(highest_team_stats_path, index=False, encoding="utf-8-sig")
+    print(f"✅ Đã lưu thống kê đội có giá trị cao nhất vào {highest_team_stats_path} với {highest_teams_df.shape[0]} hàng.")
+
+    # Mọi tệp kết quả đã được ghi: lưu trạng thái cho lần chạy sau
+    stats_cache.save()
+
+    # 5. Xác định đội có thành tích tốt nhất
+    # Điểm tổng hợp: z-score của bảng trung bình theo nhóm nhân với vector trọng số có dấu (thống kê tiêu cực như
+    # số bàn thua, thẻ phạt, mất bóng mặc định có trọng số âm), xếp hạng đầy đủ cho mọi nhóm
+    if not numeric_cols_for_mean:
+        print("\nKhông thể xác định đội có thành tích tốt nhất vì không có cột số nào khả dụng.")
+        exit()
+    try:
+        score_weights = weight_vector(numeric_cols_for_mean, parse_weights(args.score_weights))
+    except ValueError as e:
+        print(f"❌ Lỗi trọng số: {e}")
+        exit()
+    for score_key in args.score_by:
+        scorer = TeamScorer(df_calc, numeric_cols_for_mean, by=score_key)
+        leaderboard = scorer.leaderboard(score_weights)
+        leaderboard_path = os.path.join(csv_dir, f"leaderboard_{score_key}.csv")
+        leaderboard.to_csv(leaderboard_path, index=False, encoding="utf-8-sig")
+        print(f"✅ Đã lưu bảng xếp hạng điểm tổng hợp theo {score_key} vào {leaderboard_path} ({len(leaderboard)} nhóm).")
+        if score_key == "Team" and not leaderboard.empty:
+            best = leaderboard.iloc[0]
+            print(f"\n🏆 Đội có thành tích tốt nhất mùa giải Premier League 2024-2025 (điểm tổng hợp z-score có trọng số "
+                  f"trên {int((score_weights != 0).sum())} thống kê) là: {best['Team']}")
+            print(f"Điểm tổng hợp {best['Điểm tổng hợp']:.4f}, dẫn đầu {best['Số thống kê dẫn đầu']} thống kê.")
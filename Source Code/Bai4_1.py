@@ -1,19 +1,16 @@
 # Import các thư viện cần thiết
-from fuzzywuzzy import fuzz, process # Thư viện xử lý chuỗi mờ (fuzzy string matching)
-# fuzz: Cung cấp các hàm so sánh mức độ tương đồng giữa hai chuỗi (ví dụ: fuzz.token_sort_ratio)
-# process: Cung cấp các công cụ để tìm kiếm chuỗi phù hợp nhất trong một danh sách hoặc tập dữ liệu (ví dụ: process.extractOne)
-
-from selenium import webdriver # Thư viện tự động hóa trình duyệt web
-# Selenium dùng để điều khiển trình duyệt (như Chrome, Firefox) để tương tác với các trang web động (chạy JavaScript).
-from selenium.webdriver.chrome.service import Service # Dùng để tạo một dịch vụ điều khiển trình điều khiển ChromeDriver.
-from selenium.webdriver.common.by import By # Dùng để xác định vị trí các phần tử trên trang web (ví dụ: theo CLASS_NAME, TAG_NAME).
-from selenium.webdriver.chrome.options import Options # Dùng để cấu hình tùy chọn cho Chrome, ví dụ chạy ẩn (headless), không hiển thị ảnh, tắt thông báo.
-from selenium.webdriver.support.ui import WebDriverWait # Cung cấp các phương thức để đợi một điều kiện cụ thể xảy ra trên trang web.
-from selenium.webdriver.support import expected_conditions as EC # Cung cấp các điều kiện chờ đợi sẵn có (ví dụ: chờ phần tử xuất hiện).
-from webdriver_manager.chrome import ChromeDriverManager # Tự động tải và cấu hình ChromeDriver phù hợp với phiên bản trình duyệt Chrome trên máy tính của bạn.
-
 import pandas as pd # Thư viện xử lý dữ liệu dạng bảng (DataFrame).
 import os # Thư viện tương tác với hệ điều hành, dùng để xử lý đường dẫn file/thư mục.
+import sys # Thoát với mã lỗi khi không đọc được bảng chuyển nhượng nào.
+import argparse # Thư viện đọc tham số dòng lệnh.
+
+from http_fetcher import create_fetcher # Bộ tải trang qua HTTP (connection pool, keep-alive, gzip).
+from fetch_scheduler import fetch_all # Bộ lập lịch tải đồng thời có giới hạn tốc độ theo host.
+from footballtransfers import parse_table_rows, get_table_rows # Đọc các dòng của bảng footballtransfers từ HTML.
+from page_cache import add_cache_arguments, cache_from_args # Bộ nhớ đệm trang HTML trên đĩa.
+from player_store import load_players # Bộ nạp dữ liệu cầu thủ dùng chung (kho dữ liệu cột hoặc result.csv).
+from player_identity import IdentityTable # Bảng định danh cầu thủ: tra tên đã gặp trước khi so khớp mờ theo lô.
+from name_matcher import MATCH_BACKENDS # Các cách tính điểm so khớp mờ (fuzzywuzzy mặc định, rapidfuzz tùy chọn).
 
 # --- Cấu hình đường dẫn file/thư mục ---
 
@@ -26,170 +23,227 @@ csv_dir = os.path.join(base_dir, "csv")
 # Đường dẫn đầy đủ đến file result.csv
 result_path = os.path.join(csv_dir, "result.csv")
 
-# --- Tải và xử lý dữ liệu ban đầu ---
-
-# Mở file result.csv để tính toán
-# na_values=["N/A"] chỉ định rằng các giá trị "N/A" trong file sẽ được đọc là NaN (Not a Number)
-try:
-    df = pd.read_csv(result_path, na_values=["N/A"], encoding="utf-8-sig")
-    print(f"Đã tải dữ liệu thành công từ {result_path}")
-except FileNotFoundError:
-    print(f"Lỗi: Không tìm thấy result.csv tại {result_path}")
-    # Thoát chương trình nếu không tìm thấy file dữ liệu gốc
-    exit()
-except Exception as e:
-    print(f"Đã xảy ra lỗi khi tải dữ liệu: {e}")
-    exit()
-
-# Tạo ra bản copy của df để tính toán, tránh làm ảnh hưởng đến dataframe gốc
-df_calc = df.copy()
-
-# Lọc số cầu thủ có trên 900 phút thi đấu và lưu vào DataFrame mới
-minutes_threshold = 900
-df_calc_filtered = df_calc[df_calc['Minutes'] > minutes_threshold].copy()
-print(f"Số cầu thủ có trên {minutes_threshold} phút thi đấu: {len(df_calc_filtered)}")
-
-# Ghi danh sách cầu thủ đủ điều kiện ra file CSV mới trong thư mục csv
-filtered_players_filename = "players_over_900_minutes.csv"
-filtered_path = os.path.join(csv_dir, filtered_players_filename)
-df_calc_filtered.to_csv(filtered_path, index=False, encoding='utf-8-sig')
-print(f"Đã lưu danh sách cầu thủ đủ điều kiện vào {filtered_path} với {df_calc_filtered.shape[0]} dòng và {df_calc_filtered.shape[1]} cột.")
-
-# --- Chuẩn bị dữ liệu cho Fuzzy Matching ---
-
-# Hàm cắt ngắn tên cầu thủ thành 2 từ đầu tiên (để tăng độ chính xác khi so khớp tên)
-def shorten_name(name):
-    parts = name.strip().split()
-    # Trả về 2 từ đầu tiên nếu tên có ít nhất 2 từ, ngược lại trả về toàn bộ tên
-    return " ".join(parts[:2]) if len(parts) >= 2 else name
-
-# Đọc lại danh sách cầu thủ đã lọc từ file CSV vừa tạo
-# Điều này đảm bảo chúng ta làm việc với cùng một tập dữ liệu đã lọc
-csv_file_filtered = os.path.join(csv_dir, filtered_players_filename)
-try:
-    df_players = pd.read_csv(csv_file_filtered)
-except FileNotFoundError:
-     print(f"Lỗi: Không tìm thấy file cầu thủ đã lọc tại {csv_file_filtered}")
-     exit()
-
-
-# Tạo ra danh sách tên rút gọn từ cột 'Player' để sử dụng cho fuzzy matching
-# .str.strip() loại bỏ khoảng trắng ở đầu và cuối tên
-player_names_shortened_list = [shorten_name(name) for name in df_players['Player'].str.strip()]
-
-# Tạo ra dictionary để tra cứu phút thi đấu theo tên cầu thủ (tên đầy đủ)
-player_minutes_dict = dict(zip(df_players['Player'].str.strip(), df_players['Minutes']))
-
-# --- Cấu hình và khởi tạo Selenium WebDriver ---
-
-# Định cấu hình trình duyệt Chrome chạy ở chế độ ẩn (headless)
-options = Options() # Tạo một đối tượng Options để cấu hình trình duyệt Chrome
-options.add_argument("--headless") # Chạy trình duyệt ở chế độ ẩn (không mở cửa sổ trình duyệt thật)
-options.add_argument("--no-sandbox") # Tắt chế độ sandbox (bảo vệ) của Chrome.
-options.add_argument("--disable-dev-shm-usage") # Yêu cầu Chrome không dùng /dev/shm (shared memory) làm nơi lưu trữ tạm thời.
-options.add_argument("--disable-gpu") # Tắt tăng tốc phần cứng GPU (đôi khi cần thiết trong môi trường headless)
-
-
-# Khởi tạo trình điều khiển Chrome (webdriver.Chrome)
-# ChromeDriverManager().install() tự động tải và chỉ định đúng phiên bản ChromeDriver phù hợp với trình duyệt của bạn.
-# options=options áp dụng tất cả cấu hình vừa khai báo.
-try:
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    print("Đã khởi tạo Selenium WebDriver thành công.")
-except Exception as e:
-    print(f"Lỗi khi khởi tạo WebDriver: {e}")
-    print("Vui lòng kiểm tra cài đặt Chrome và kết nối internet.")
-    exit()
-
-
-# --- Crawl dữ liệu chuyển nhượng ---
-
-# Tạo danh sách các URL từ trang 1 đến 14 của danh sách chuyển nhượng Premier League mùa 2024-2025.
-base_url = "https://www.footballtransfers.com/us/transfers/confirmed/2024-2025/uk-premier-league/"
-urls_to_scrape = [f"{base_url}{i}" for i in range(1, 15)] # Crawl từ trang 1 đến trang 14
-
-# Tạo danh sách rỗng để lưu thông tin cầu thủ khớp (Tên cầu thủ, Giá trị chuyển nhượng)
-transfer_data = []
-
-# Duyệt qua từng URL trong danh sách cần crawl
-for url in urls_to_scrape:
+# Đường dẫn đến bảng định danh cầu thủ (tên trên footballtransfers -> tên trong result.csv)
+identity_path = os.path.join(csv_dir, "player_identity.csv")
+
+# --- Luồng thực thi chính ---
+# Đặt trong khối __main__ để tiến trình con của match_batch (spawn trên Windows) import script này mà không chạy lại nó
+if __name__ == "__main__":
+    # --- Tham số dòng lệnh ---
+    parser = argparse.ArgumentParser(description="Thu thập giá trị chuyển nhượng từ footballtransfers.")
+    parser.add_argument("--fetch-mode", choices=["http", "selenium"], default="http",
+                        help="http: tải trực tiếp qua HTTP (mặc định), trang không có bảng trong HTML được đọc lại bằng Selenium; "
+                             "selenium: dùng Chrome headless cho mọi trang")
+    parser.add_argument("--concurrency", type=int, default=4, help="Số yêu cầu đồng thời tối đa trên mỗi host")
+    parser.add_argument("--min-interval", type=float, default=1.0, help="Khoảng cách tối thiểu (giây) giữa hai yêu cầu tới cùng host")
+    parser.add_argument("--league", default="uk-premier-league", help="Tên giải trong URL của footballtransfers, ví dụ es-laliga")
+    parser.add_argument("--season", default="2024-2025", help="Mùa giải của danh sách chuyển nhượng, ví dụ 2023-2024")
+    parser.add_argument("--pages", type=int, default=14, help="Số trang danh sách chuyển nhượng cần crawl (từ trang 1)")
+    parser.add_argument("--match-workers", type=int, default=None,
+                        help="Số tiến trình/luồng dùng để so khớp tên (mặc định: số nhân CPU)")
+    parser.add_argument("--match-backend", choices=MATCH_BACKENDS, default="fuzzywuzzy",
+                        help="fuzzywuzzy: cùng kết quả với extractOne (mặc định); rapidfuzz: vector hóa, nhanh hơn "
+                             "nhưng điểm Levenshtein cao hơn difflib nên có thể khớp thêm tên ở cùng ngưỡng")
+    add_cache_arguments(parser, os.path.join(base_dir, "cache", "pages"))
+    args = parser.parse_args()
+
+    # --- Tải và xử lý dữ liệu ban đầu ---
+
+    # Đọc dữ liệu cầu thủ có trên 900 phút thi đấu qua bộ nạp dùng chung
+    # (điều kiện lọc được áp dụng ngay khi đọc; các giá trị "N/A" được đọc là NaN)
+    minutes_threshold = 900
     try:
-        driver.get(url) # Dùng Selenium WebDriver để mở trang web
-        print(f"Đang crawl dữ liệu từ: {url}")
+        df_calc_filtered = load_players(result_path, filters=[("Minutes", ">", minutes_threshold)])
+        print(f"Đã tải dữ liệu thành công từ {result_path}")
+    except FileNotFoundError:
+        print(f"Lỗi: Không tìm thấy result.csv tại {result_path}")
+        # Thoát chương trình nếu không tìm thấy file dữ liệu gốc
+        exit()
+    except Exception as e:
+        print(f"Đã xảy ra lỗi khi tải dữ liệu: {e}")
+        exit()
 
-        # Đợi bảng chuyển nhượng xuất hiện (tối đa 10 giây).
-        # Điều này đảm bảo trang web đã tải xong dữ liệu cần thiết trước khi tìm kiếm phần tử.
-        wait = WebDriverWait(driver, 10)
-        table = wait.until(
-            EC.presence_of_element_located((By.CLASS_NAME, "transfer-table"))
-        )
+    print(f"Số cầu thủ có trên {minutes_threshold} phút thi đấu: {len(df_calc_filtered)}")
 
-        # Tìm tất cả các dòng (<tr>) trong bảng
-        rows = table.find_elements(By.TAG_NAME, "tr")
+    # Ghi danh sách cầu thủ đủ điều kiện ra file CSV mới trong thư mục csv
+    filtered_players_filename = "players_over_900_minutes.csv"
+    filtered_path = os.path.join(csv_dir, filtered_players_filename)
+    df_calc_filtered.to_csv(filtered_path, index=False, encoding='utf-8-sig')
+    print(f"Đã lưu danh sách cầu thủ đủ điều kiện vào {filtered_path} với {df_calc_filtered.shape[0]} dòng và {df_calc_filtered.shape[1]} cột.")
 
-        # Lặp qua từng dòng trong bảng để lấy dữ liệu
-        for row in rows:
-            # Tìm tất cả các ô dữ liệu (<td>) trong dòng hiện tại
-            cols = row.find_elements(By.TAG_NAME, "td")
+    # --- Chuẩn bị dữ liệu cho Fuzzy Matching ---
 
-            # Kiểm tra xem dòng có đủ cột dữ liệu cần thiết không
-            if cols and len(cols) >= 2: # Cần ít nhất 2 cột (Tên cầu thủ, Giá trị chuyển nhượng)
+    # Hàm cắt ngắn tên cầu thủ thành 2 từ đầu tiên (để tăng độ chính xác khi so khớp tên)
+    def shorten_name(name):
+        parts = name.strip().split()
+        # Trả về 2 từ đầu tiên nếu tên có ít nhất 2 từ, ngược lại trả về toàn bộ tên
+        return " ".join(parts[:2]) if len(parts) >= 2 else name
 
-                # Lấy tên cầu thủ từ cột đầu tiên (index 0)
-                # .text lấy nội dung văn bản, .strip() loại bỏ khoảng trắng dư thừa
-                # .split("\n")[0] xử lý trường hợp tên có xuống dòng
-                player_name_scraped = cols[0].text.strip().split("\n")[0].strip()
+    # Đọc lại danh sách cầu thủ đã lọc từ file CSV vừa tạo
+    # Điều này đảm bảo chúng ta làm việc với cùng một tập dữ liệu đã lọc
+    csv_file_filtered = os.path.join(csv_dir, filtered_players_filename)
+    try:
+        df_players = pd.read_csv(csv_file_filtered)
+    except FileNotFoundError:
+         print(f"Lỗi: Không tìm thấy file cầu thủ đã lọc tại {csv_file_filtered}")
+         exit()
 
-                # Rút gọn tên cầu thủ vừa crawl được để so sánh với danh sách tên rút gọn
-                shortened_player_name_scraped = shorten_name(player_name_scraped)
 
-                # Lấy giá trị chuyển nhượng từ cột cuối cùng (index -1)
-                # Kiểm tra độ dài cột để tránh lỗi index out of range
-                transfer_value_scraped = cols[-1].text.strip() if len(cols) >= 3 else "N/A"
+    # Danh sách tên cầu thủ từ cột 'Player' dùng làm tên chuẩn khi so khớp (được rút gọn bằng shorten_name trước khi so khớp)
+    # .str.strip() loại bỏ khoảng trắng ở đầu và cuối tên
+    player_names_list = df_players['Player'].str.strip().tolist()
 
-                # --- Thực hiện Fuzzy Matching ---
+    # Tạo ra dictionary để tra cứu phút thi đấu theo tên cầu thủ (tên đầy đủ)
+    player_minutes_dict = dict(zip(df_players['Player'].str.strip(), df_players['Minutes']))
 
-                # Tìm tên cầu thủ trong danh sách player_names_shortened_list khớp nhất với tên cầu thủ vừa crawl được
-                # scorer=fuzz.token_sort_ratio: sử dụng phương pháp so sánh dựa trên sắp xếp token
-                # process.extractOne trả về (tên khớp nhất, điểm tương đồng) hoặc None
-                best_match = process.extractOne(shortened_player_name_scraped, player_names_shortened_list, scorer=fuzz.token_sort_ratio)
+    # --- Crawl dữ liệu chuyển nhượng ---
 
-                # Kiểm tra xem có kết quả khớp và điểm tương đồng có đủ cao không (ví dụ >= 85)
-                similarity_threshold = 85
-                if best_match and best_match[1] >= similarity_threshold:
-                    # Lấy tên cầu thủ khớp nhất từ danh sách của chúng ta
-                    matched_name_shortened = best_match[0]
+    # Tạo danh sách các URL của danh sách chuyển nhượng theo giải và mùa
+    # (mặc định: trang 1 đến 14 của Premier League mùa 2024-2025).
+    base_url = f"https://www.footballtransfers.com/us/transfers/confirmed/{args.season}/{args.league}/"
+    urls_to_scrape = [f"{base_url}{i}" for i in range(1, args.pages + 1)] # Crawl từ trang 1 đến trang args.pages
 
-                    # Tìm tên đầy đủ tương ứng với tên rút gọn đã khớp (tùy chọn, nếu cần tên đầy đủ)
-                    # Trong trường hợp này, chúng ta lưu tên cầu thủ đã crawl được (player_name_scraped)
-                    # và giá trị chuyển nhượng (transfer_value_scraped)
+    # Ngưỡng điểm tương đồng tối thiểu để coi là khớp
+    similarity_threshold = 85
 
-                    # Thêm thông tin cầu thủ khớp vào danh sách transfer_data
-                    transfer_data.append([player_name_scraped, transfer_value_scraped])
-                    # print(f"Đã khớp: {player_name_scraped} (Điểm: {best_match[1]})") # Có thể bỏ ghi log này nếu không cần
+    # Hàm xử lý các dòng của một trang (mỗi dòng là danh sách văn bản của các ô <td>)
+    # và trả về danh sách [Tên cầu thủ, Giá trị chuyển nhượng]; việc so khớp tên được làm một lần cho mọi trang
+    def process_rows(rows):
+        page_transfer_data = []
+        for cols in rows:
+            # Kiểm tra xem dòng có đủ cột dữ liệu cần thiết không
+            if cols and len(cols) >= 2: # Cần ít nhất 2 cột (Tên cầu thủ, Giá trị chuyển nhượng)
 
-    except Exception as e:
-        print(f"Đã xảy ra lỗi khi crawl hoặc xử lý URL {url}: {e}")
-        # Tiếp tục vòng lặp để thử URL tiếp theo
-
-# Đóng WebDriver sau khi hoàn thành crawl
-driver.quit()
-print("Đã đóng Selenium WebDriver.")
-
-# --- Lưu kết quả vào file CSV ---
-
-# Kiểm tra xem có dữ liệu chuyển nhượng nào được tìm thấy không
-if transfer_data:
-    # Tạo DataFrame từ danh sách transfer_data
-    df_tv = pd.DataFrame(transfer_data, columns=['Player', 'Price'])
-
-    # Lưu DataFrame vào file player_transfer_fee.csv trong thư mục csv
-    transfer_fee_filename = "player_transfer_fee.csv"
-    transfer_fee_path = os.path.join(csv_dir, transfer_fee_filename)
-    df_tv.to_csv(transfer_fee_path, index=False, encoding='utf-8-sig')
-    print(f"Kết quả giá trị chuyển nhượng đã được lưu vào '{transfer_fee_path}'")
-else:
-    print("Không tìm thấy cầu thủ nào khớp với danh sách chuyển nhượng.")
-
-# --- Kết thúc ---
-print("\nQuá trình xử lý hoàn tất.")
+                # Lấy tên cầu thủ từ cột đầu tiên (index 0)
+                # .split("\n")[0] xử lý trường hợp tên có xuống dòng
+                player_name_scraped = cols[0].strip().split("\n")[0].strip()
+
+                # Lấy giá trị chuyển nhượng từ cột cuối cùng (index -1)
+                # Kiểm tra độ dài cột để tránh lỗi index out of range
+                transfer_value_scraped = cols[-1].strip() if len(cols) >= 3 else "N/A"
+
+                page_transfer_data.append([player_name_scraped, transfer_value_scraped])
+        return page_transfer_data
+
+    # Phương án dự phòng: crawl bằng Selenium khi bảng chỉ xuất hiện sau khi chạy JavaScript
+    def crawl_with_selenium(urls):
+        from selenium import webdriver # Thư viện tự động hóa trình duyệt web
+        from selenium.webdriver.chrome.service import Service # Dịch vụ điều khiển ChromeDriver.
+        from selenium.webdriver.common.by import By # Xác định vị trí các phần tử trên trang web (ví dụ: theo CLASS_NAME, TAG_NAME).
+        from selenium.webdriver.chrome.options import Options # Cấu hình tùy chọn cho Chrome, ví dụ chạy ẩn (headless).
+        from selenium.webdriver.support.ui import WebDriverWait # Đợi một điều kiện cụ thể xảy ra trên trang web.
+        from selenium.webdriver.support import expected_conditions as EC # Các điều kiện chờ đợi sẵn có.
+        from webdriver_manager.chrome import ChromeDriverManager # Tự động tải ChromeDriver phù hợp với trình duyệt Chrome.
+
+        # Định cấu hình trình duyệt Chrome chạy ở chế độ ẩn (headless)
+        options = Options()
+        options.add_argument("--headless") # Chạy trình duyệt ở chế độ ẩn (không mở cửa sổ trình duyệt thật)
+        options.add_argument("--no-sandbox") # Tắt chế độ sandbox (bảo vệ) của Chrome.
+        options.add_argument("--disable-dev-shm-usage") # Yêu cầu Chrome không dùng /dev/shm (shared memory) làm nơi lưu trữ tạm thời.
+        options.add_argument("--disable-gpu") # Tắt tăng tốc phần cứng GPU (đôi khi cần thiết trong môi trường headless)
+
+        # Khởi tạo trình điều khiển Chrome (webdriver.Chrome)
+        try:
+            driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+            print("Đã khởi tạo Selenium WebDriver thành công.")
+        except Exception as e:
+            print(f"Lỗi khi khởi tạo WebDriver: {e}")
+            print("Vui lòng kiểm tra cài đặt Chrome và kết nối internet.")
+            sys.exit(1)
+
+        for url in urls:
+            try:
+                driver.get(url) # Dùng Selenium WebDriver để mở trang web
+                print(f"Đang crawl dữ liệu từ: {url}")
+
+                # Đợi bảng chuyển nhượng xuất hiện (tối đa 10 giây).
+                wait = WebDriverWait(driver, 10)
+                table = wait.until(
+                    EC.presence_of_element_located((By.CLASS_NAME, "transfer-table"))
+                )
+
+                # Lấy HTML của cả bảng bằng một lần gọi WebDriver rồi đọc văn bản từng ô ngay trong Python
+                rows = get_table_rows(driver, table, "transfer-table")
+                page_results[url] = process_rows(rows)
+
+            except Exception as e:
+                print(f"Đã xảy ra lỗi khi crawl hoặc xử lý URL {url}: {e}")
+                # Tiếp tục vòng lặp để thử URL tiếp theo
+
+        # Đóng WebDriver sau khi hoàn thành crawl
+        driver.quit()
+        print("Đã đóng Selenium WebDriver.")
+
+    # Kết quả theo từng URL; các trang có thể tải xong theo thứ tự bất kỳ
+    page_results = {}
+
+    # Xử lý một trang ngay khi nó được tải xong
+    def on_page(url, page_source):
+        print(f"Đang crawl dữ liệu từ: {url}")
+        rows = parse_table_rows(page_source, "transfer-table")
+        if rows is None:
+            print(f"Không tìm thấy bảng chuyển nhượng trong HTML của {url}.")
+            return
+        page_results[url] = process_rows(rows)
+
+    if args.fetch_mode == "http":
+        # Tải đồng thời tất cả các trang qua HTTP, giới hạn số yêu cầu và khoảng cách trên mỗi host
+        with create_fetcher("http", cache=cache_from_args(args)) as fetcher:
+            fetch_all(urls_to_scrape, fetcher.get_page_source, on_page,
+                      per_host_concurrency=args.concurrency, min_interval=args.min_interval,
+                      cached_func=fetcher.get_cached_page_source)
+
+        # Trang không có bảng trong HTML (bảng cần JavaScript) hoặc tải lỗi: đọc lại bằng Selenium như trước đây
+        missing_urls = [url for url in urls_to_scrape if url not in page_results]
+        if missing_urls:
+            print(f"⚠️ {len(missing_urls)}/{len(urls_to_scrape)} trang không đọc được bảng qua HTTP, chuyển sang Selenium cho các trang này.")
+            crawl_with_selenium(missing_urls)
+    else:
+        crawl_with_selenium(urls_to_scrape)
+
+    # Không trang nào đọc được bảng: dừng với mã lỗi thay vì ghi tệp kết quả rỗng
+    if not page_results:
+        print("❌ Không đọc được bảng chuyển nhượng ở trang nào (HTTP và Selenium).")
+        sys.exit(1)
+
+    # Gộp kết quả theo đúng thứ tự trang để tệp đầu ra ổn định giữa các lần chạy
+    scraped_data = []
+    for url in urls_to_scrape:
+        scraped_data.extend(page_results.get(url, []))
+
+    # --- Thực hiện Fuzzy Matching ---
+
+    # Tên đã gặp ở các lần chạy trước được lấy từ bảng định danh; các tên còn lại được so khớp (tên rút gọn,
+    # scorer token_sort_ratio) với danh sách cầu thủ trong một lần gọi (chia khối, chạy song song),
+    # chỉ giữ kết quả có điểm tương đồng >= 85
+    identity = IdentityTable(identity_path)
+    best_matches = identity.resolve(
+        "footballtransfers_transfers",
+        [player_name for player_name, _ in scraped_data],
+        player_names_list,
+        similarity_threshold,
+        prepare=shorten_name,
+        workers=args.match_workers,
+        backend=args.match_backend,
+    )
+    identity.save()
+    # Lưu tên cầu thủ đã crawl được và giá trị chuyển nhượng của các cầu thủ khớp
+    transfer_data = [row for row, (canonical_name, _) in zip(scraped_data, best_matches) if canonical_name is not None]
+
+    # --- Lưu kết quả vào file CSV ---
+
+    # Kiểm tra xem có dữ liệu chuyển nhượng nào được tìm thấy không
+    if transfer_data:
+        # Tạo DataFrame từ danh sách transfer_data
+        df_tv = pd.DataFrame(transfer_data, columns=['Player', 'Price'])
+
+        # Lưu DataFrame vào file player_transfer_fee.csv trong thư mục csv
+        transfer_fee_filename = "player_transfer_fee.csv"
+        transfer_fee_path = os.path.join(csv_dir, transfer_fee_filename)
+        df_tv.to_csv(transfer_fee_path, index=False, encoding='utf-8-sig')
+        print(f"Kết quả giá trị chuyển nhượng đã được lưu vào '{transfer_fee_path}'")
+    else:
+        print("Không tìm thấy cầu thủ nào khớp với danh sách chuyển nhượng.")
+
+    # --- Kết thúc ---
+    print("\nQuá trình xử lý hoàn tất.")
@@ -0,0 +1,58 @@
+import time
+import numpy as np
+import pandas as pd
+
+# Dùng chung cho phần đo so sánh (__main__) của các module: dữ liệu cầu thủ tổng hợp và đo thời gian
+
+BENCHMARK_NATIONS = ["ENG", "ESP", "FRA", "GER", "ITA", "BRA", "ARG"]
+BENCHMARK_POSITIONS = ["GK", "DF", "MF", "FW", "DF,MF", "MF,FW"]
+# Phân phối giá trị của các cột thống kê tổng hợp
+STAT_DISTRIBUTIONS = {
+    "uniform": lambda rng, n: rng.random(n),
+    "exponential": lambda rng, n: rng.exponential(2.0, n),
+    "lognormal": lambda rng, n: rng.lognormal(1.0, 1.0, n),
+}
+
+
+def best_time(func, *args, repeat=3):
+    """Gọi func(*args) repeat lần, trả về (kết quả lần cuối, thời gian nhanh nhất tính bằng giây)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def synthetic_players(n_rows, n_stats=75, n_teams=100, distribution="exponential", decimals=2,
+                      zero_rate=0.0, nan_rate=0.0, seed=0):
+    """Bảng cầu thủ tổng hợp có cùng dạng với result.csv: Player, Nation, Team, Position, Minutes rồi
+    n_stats cột "Stat i" theo distribution (STAT_DISTRIBUTIONS), làm tròn decimals chữ số.
+
+    zero_rate / nan_rate: tỉ lệ ô bằng 0 / thiếu trong mỗi cột thống kê (nhiều giá trị bằng nhau và ô trống
+    như dữ liệu thật).
+    """
+    rng = np.random.default_rng(seed)
+    width = len(str(n_teams - 1))
+    data = {
+        "Player": [f"Player {i}" for i in range(n_rows)],
+        "Nation": rng.choice(BENCHMARK_NATIONS, n_rows),
+        "Team": rng.choice([f"Team {i:0{width}d}" for i in range(n_teams)], n_rows),
+        "Position": rng.choice(BENCHMARK_POSITIONS, n_rows),
+        "Minutes": rng.integers(91, 3420, n_rows),
+    }
+    for i in range(n_stats):
+        column = STAT_DISTRIBUTIONS[distribution](rng, n_rows).round(decimals)
+        if zero_rate:
+            column[rng.random(n_rows) < zero_rate] = 0
+        if nan_rate:
+            column[rng.random(n_rows) < nan_rate] = np.nan
+        data[f"Stat {i}"] = column
+    return pd.DataFrame(data)
+
+
+def synthetic_clusters(n_rows, n_columns=70, n_centers=5, seed=0):
+    """Ma trận số (n_rows x n_columns) gồm n_centers cụm Gauss thật, để kiểm tra cách chọn số cụm."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 3, (n_centers, n_columns))
+    return centers[rng.integers(0, n_centers, n_rows)] + rng.normal(0, 1, (n_rows, n_columns))
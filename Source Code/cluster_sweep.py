@@ -0,0 +1,187 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from process_pool import pool_context
+from benchmark_utils import synthetic_clusters
+
+# Thuật toán phân cụm của vòng quét k: kmeans (KMeans đầy đủ) hoặc minibatch (MiniBatchKMeans cho dữ liệu lớn)
+SWEEP_ALGORITHMS = ["kmeans", "minibatch"]
+# Số điểm tối đa để tính silhouette cho mỗi k (silhouette tốn O(n^2), mẫu cố định giữ chi phí không đổi khi n tăng)
+SILHOUETTE_SAMPLE = 2000
+# Các cột của bảng kết quả vòng quét (elbow_sweep.csv); hai cột Gap chỉ có khi tính gap statistic
+SWEEP_COLUMNS = ["k", "WCSS", "Silhouette"]
+GAP_COLUMNS = ["Gap", "Gap SE"]
+# Cách chọn số cụm tự động: điểm gãy (knee) của đường WCSS, silhouette lớn nhất hoặc gap statistic
+K_SELECTION_METHODS = ["knee", "silhouette", "gap"]
+# Số bộ dữ liệu tham chiếu (phân phối đều) cho mỗi k khi tính gap statistic
+GAP_REFERENCES = 5
+
+
+def make_model(k, algorithm="kmeans", random_state=42):
+    """Mô hình phân cụm k cụm của vòng quét (cùng tham số cho vòng quét và lần phân cụm cuối)."""
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    if algorithm == "minibatch":
+        return MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3, batch_size=1024)
+    return KMeans(n_clusters=k, random_state=random_state, n_init=10)
+
+
+def silhouette_sample(n_rows, sample_size=SILHOUETTE_SAMPLE, random_state=42):
+    """Chỉ số các dòng dùng để tính silhouette: cùng một mẫu ngẫu nhiên cố định cho mọi k (mọi dòng nếu ít hơn)."""
+    if n_rows <= sample_size:
+        return np.arange(n_rows)
+    return np.sort(np.random.default_rng(random_state).choice(n_rows, sample_size, replace=False))
+
+
+# Dữ liệu của vòng quét trong mỗi tiến trình con (nhận một lần khi khởi tạo tiến trình, không gửi lại cho từng k)
+_worker_data = {}
+
+
+def _init_worker(X, sample):
+    # Mỗi tiến trình chỉ dùng một luồng tính toán để các tiến trình không tranh nhau nhân CPU
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+    _worker_data["X"], _worker_data["sample"] = X, sample
+
+
+def _fit_k(k, algorithm, random_state):
+    from sklearn.metrics import silhouette_score
+    X, sample = _worker_data["X"], _worker_data["sample"]
+    model = make_model(k, algorithm, random_state).fit(X)
+    labels = model.labels_[sample]
+    # Silhouette chỉ xác định khi mẫu có từ 2 đến (số điểm - 1) cụm
+    silhouette = silhouette_score(X[sample], labels) if 1 < len(np.unique(labels)) < len(sample) else np.nan
+    return k, model, float(model.inertia_), float(silhouette)
+
+
+def _fit_reference(k, reference, algorithm, random_state):
+    # Gap statistic: log WCSS của k cụm trên một bộ dữ liệu tham chiếu phân phối đều trong hộp bao của mẫu,
+    # cùng kích thước với mẫu; bộ tham chiếu được sinh lại từ (random_state, reference) nên không cần gửi đi
+    X = _worker_data["X"][_worker_data["sample"]]
+    rng = np.random.default_rng([random_state, reference])
+    uniform = rng.uniform(X.min(axis=0), X.max(axis=0), size=X.shape)
+    return k, reference, float(np.log(make_model(k, algorithm, random_state).fit(uniform).inertia_))
+
+
+def _run_tasks(func, tasks, X, sample, workers):
+    # Chạy func(*task) cho mọi task trên workers tiến trình (dữ liệu X và mẫu được gửi một lần cho mỗi tiến trình)
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        # Chạy ngay trong tiến trình hiện tại, giữ nguyên số luồng tính toán của KMeans
+        _worker_data["X"], _worker_data["sample"] = X, sample
+        return [func(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(),
+                             initializer=_init_worker, initargs=(X, sample)) as executor:
+        futures = [executor.submit(func, *task) for task in tasks]
+        return [future.result() for future in as_completed(futures)]
+
+
+def sweep_k(X, k_values, algorithm="kmeans", workers=None, sample_size=SILHOUETTE_SAMPLE, random_state=42):
+    """Phân cụm X với mọi k trong k_values song song trên workers tiến trình (mặc định: số nhân CPU).
+
+    Trả về (DataFrame SWEEP_COLUMNS theo k tăng dần, dict k -> mô hình đã fit). WCSS là inertia_ trên toàn bộ
+    dữ liệu, silhouette tính trên silhouette_sample(...) - cùng một mẫu cho mọi k. Với cùng random_state,
+    kết quả giống hệt khi chạy tuần tự.
+    """
+    if algorithm not in SWEEP_ALGORITHMS:
+        raise ValueError(f"Thuật toán không hỗ trợ: {algorithm} (hỗ trợ: {', '.join(SWEEP_ALGORITHMS)})")
+    X = np.ascontiguousarray(X, dtype="float64")
+    sample = silhouette_sample(len(X), sample_size, random_state)
+    # k lớn chạy lâu hơn nên được gửi trước để các tiến trình kết thúc gần cùng lúc
+    tasks = [(k, algorithm, random_state) for k in sorted(k_values, reverse=True)]
+    results = _run_tasks(_fit_k, tasks, X, sample, workers)
+    results.sort(key=lambda result: result[0])
+    curves = pd.DataFrame([(k, wcss, silhouette) for k, _, wcss, silhouette in results], columns=SWEEP_COLUMNS)
+    return curves, {k: model for k, model, _, _ in results}
+
+
+def gap_statistic(X, models, algorithm="kmeans", workers=None, sample_size=SILHOUETTE_SAMPLE,
+                  references=GAP_REFERENCES, random_state=42):
+    """Gap statistic (Tibshirani và cộng sự) cho các mô hình đã fit của sweep_k: DataFrame k + GAP_COLUMNS.
+
+    Gap(k) = trung bình log WCSS của references bộ dữ liệu đều - log WCSS của dữ liệu, tính trên cùng mẫu
+    silhouette_sample (WCSS của dữ liệu lấy từ nhãn và tâm cụm đã fit, không fit lại) nên chi phí không tăng
+    theo số cầu thủ; các bộ tham chiếu được fit song song như sweep_k.
+    """
+    X = np.ascontiguousarray(X, dtype="float64")
+    sample = silhouette_sample(len(X), sample_size, random_state)
+    k_values = sorted(models)
+    tasks = [(k, reference, algorithm, random_state) for k in reversed(k_values) for reference in range(references)]
+    reference_logs = {}
+    for k, reference, log_wcss in _run_tasks(_fit_reference, tasks, X, sample, workers):
+        reference_logs.setdefault(k, []).append(log_wcss)
+    rows = []
+    for k in k_values:
+        model = models[k]
+        wcss = ((X[sample] - model.cluster_centers_[model.labels_[sample]]) ** 2).sum()
+        logs = np.array(reference_logs[k])
+        rows.append((k, logs.mean() - np.log(wcss), logs.std() * np.sqrt(1 + 1 / len(logs))))
+    return pd.DataFrame(rows, columns=["k"] + GAP_COLUMNS)
+
+
+def knee_k(k_values, wcss):
+    """Điểm gãy của đường WCSS giảm dần (Kneedle): chuẩn hóa k và WCSS về [0, 1], chọn k cách xa đường
+    nối hai đầu nhất."""
+    k_values = np.asarray(k_values, dtype="float64")
+    wcss = np.asarray(wcss, dtype="float64")
+    if len(k_values) < 3 or wcss[0] == wcss[-1]:
+        return int(k_values[0])
+    x = (k_values - k_values[0]) / (k_values[-1] - k_values[0])
+    y = (wcss[0] - wcss) / (wcss[0] - wcss[-1])
+    return int(k_values[np.argmax(y - x)])
+
+
+def choose_k(curves, method="knee"):
+    """Số cụm theo method trong K_SELECTION_METHODS từ bảng của sweep_k (method "gap" cần thêm GAP_COLUMNS):
+    - knee: điểm gãy của WCSS (knee_k)
+    - silhouette: k có silhouette (trên mẫu) lớn nhất
+    - gap: k nhỏ nhất có Gap(k) >= Gap(k + 1) - SE(k + 1), không có thì k có Gap lớn nhất
+    """
+    curves = curves.sort_values("k", ignore_index=True)
+    if method == "knee":
+        return knee_k(curves["k"], curves["WCSS"])
+    if method == "silhouette":
+        if curves["Silhouette"].isna().all():
+            raise ValueError("Không có điểm silhouette nào để chọn số cụm")
+        return int(curves.loc[curves["Silhouette"].idxmax(), "k"])
+    if method == "gap":
+        gap, error = curves["Gap"].to_numpy(), curves["Gap SE"].to_numpy()
+        good = np.flatnonzero(gap[:-1] >= gap[1:] - error[1:])
+        return int(curves["k"].iloc[good[0]] if len(good) else curves.loc[curves["Gap"].idxmax(), "k"])
+    raise ValueError(f"Cách chọn số cụm không hỗ trợ: {method} (hỗ trợ: {', '.join(K_SELECTION_METHODS)})")
+
+
+def _sequential_wcss(X, k_values):
+    # Cách cũ của Bai3.py: fit KMeans lần lượt cho từng k, chỉ lấy WCSS
+    from sklearn.cluster import KMeans
+    return [KMeans(n_clusters=k, random_state=42, n_init=10).fit(X).inertia_ for k in k_values]
+
+
+if __name__ == "__main__":
+    # Đo so sánh: python cluster_sweep.py [số cầu thủ]  (mặc định 5000 cầu thủ x 70 cột, k = 2..10)
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    X = synthetic_clusters(n_rows)
+    k_values = range(2, 11)
+
+    start = time.perf_counter()
+    expected = _sequential_wcss(X, k_values)
+    sequential_time = time.perf_counter() - start
+    start = time.perf_counter()
+    curves, models = sweep_k(X, k_values)
+    sweep_time = time.perf_counter() - start
+    same = np.allclose(expected, curves["WCSS"], rtol=1e-9)
+    print(f"📊 {n_rows:,} cầu thủ, k = 2..10: tuần tự (chỉ WCSS) {sequential_time:6.2f} s | song song "
+          f"{os.cpu_count()} tiến trình (WCSS + silhouette trên {min(n_rows, SILHOUETTE_SAMPLE)} điểm) "
+          f"{sweep_time:6.2f} s | cùng WCSS: {'có' if same else 'KHÔNG'}")
+    start = time.perf_counter()
+    minibatch, _ = sweep_k(X, k_values, algorithm="minibatch")
+    print(f"   MiniBatchKMeans: {time.perf_counter() - start:6.2f} s, silhouette tốt nhất ở k = "
+          f"{choose_k(minibatch, 'silhouette')} (KMeans: {choose_k(curves, 'silhouette')})")
+    start = time.perf_counter()
+    curves = curves.merge(gap_statistic(X, models), on="k")
+    gap_time = time.perf_counter() - start
+    print(f"   Chọn k tự động (dữ liệu có 5 cụm thật): knee {choose_k(curves, 'knee')} | silhouette "
+          f"{choose_k(curves, 'silhouette')} | gap {choose_k(curves, 'gap')} ({gap_time:.2f} s, "
+          f"{GAP_REFERENCES} bộ tham chiếu)")
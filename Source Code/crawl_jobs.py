@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+# Các giải đấu trên fbref: mã giải -> tên dùng trong URL
+COMPETITIONS = {
+    "9": "Premier-League",
+    "12": "La-Liga",
+    "11": "Serie-A",
+    "20": "Bundesliga",
+    "13": "Ligue-1",
+}
+
+# Một công việc thu thập = một trang thống kê của một giải trong một mùa
+CrawlJob = namedtuple("CrawlJob", ["job_id", "competition", "season", "page", "table_id", "url"])
+
+
+def fbref_stats_url(base_url, competition, season, page):
+    """URL trang thống kê fbref, ví dụ .../en/comps/9/2024-2025/stats/2024-2025-Premier-League-Stats."""
+    name = COMPETITIONS.get(str(competition))
+    if name is None:
+        raise ValueError(f"Mã giải đấu không hợp lệ: {competition} (hỗ trợ: {', '.join(COMPETITIONS)})")
+    return f"{base_url.rstrip('/')}/en/comps/{competition}/{season}/{page}/{season}-{name}-Stats"
+
+
+def expand_jobs(base_url, competitions, seasons, stat_pages):
+    """Trải (giải đấu, mùa, trang thống kê) thành danh sách CrawlJob; stat_pages là các cặp (trang, table_id)."""
+    jobs = []
+    for competition in competitions:
+        for season in seasons:
+            for page, table_id in stat_pages:
+                jobs.append(CrawlJob(
+                    job_id=f"{competition}/{season}/{page}",
+                    competition=str(competition),
+                    season=season,
+                    page=page,
+                    table_id=table_id,
+                    url=fbref_stats_url(base_url, competition, season, page),
+                ))
+    return jobs
+
+
+def partition_key(job):
+    """Khóa phân vùng kết quả: mỗi (giải đấu, mùa) được gộp và lưu thành một tệp riêng."""
+    return f"{job.competition}/{job.season}"
+
+
+def group_by_partition(jobs):
+    partitions = {}
+    for job in jobs:
+        partitions.setdefault(partition_key(job), []).append(job)
+    return partitions
+
+
+class CrawlJournal:
+    """Nhật ký các công việc đã xong, ghi nối tiếp từng dòng JSON vào đĩa.
+
+    Mỗi dòng ghi trạng thái mới nhất của một công việc hoặc một phân vùng ("done" / "failed")
+    kèm đường dẫn tệp kết quả. Dòng được ghi và đẩy xuống đĩa ngay khi công việc kết thúc,
+    nên khi chương trình bị dừng giữa chừng, lần chạy sau chỉ làm lại các công việc chưa xong.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue # Dòng cuối có thể bị ghi dở khi chương trình dừng đột ngột
+                    self._state[record["key"]] = record
+        except FileNotFoundError:
+            pass
+
+    def record(self, key, status, output=None, **extra):
+        entry = {"key": key, "status": status, "output": output, "at": time.time(), **extra}
+        with self._lock:
+            self._state[key] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def is_done(self, key):
+        """Đã xong khi trạng thái mới nhất là "done" và tệp kết quả (nếu có) vẫn còn trên đĩa."""
+        with self._lock:
+            entry = self._state.get(key)
+        if entry is None or entry["status"] != "done":
+            return False
+        return entry["output"] is None or os.path.exists(entry["output"])
+
+    def output(self, key):
+        with self._lock:
+            entry = self._state.get(key)
+        return entry["output"] if entry is not None else None
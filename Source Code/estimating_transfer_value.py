@@ -1,14 +1,13 @@
 import os
+import argparse
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from fuzzywuzzy import fuzz, process
 import sys # Import sys để thoát chương trình một cách an toàn khi gặp lỗi nghiêm trọng
+from http_fetcher import create_fetcher
+from fetch_scheduler import fetch_all
+from footballtransfers import parse_table_rows, get_table_rows
+from page_cache import add_cache_arguments, cache_from_args
+from player_store import load_players
+from player_identity import IdentityTable
 
 # --- Hằng số và Cấu hình ---
 # Thư mục gốc nơi các file sẽ được lưu vào
@@ -20,29 +19,32 @@ CSV_DIR = os.path.join(BASE_DIR, "csv")
 # Đường dẫn đến file result.csv (chứa thông tin cầu thủ từ nguồn khác)
 RESULT_PATH = os.path.join(CSV_DIR, "result.csv")
 
-# Base URL cần lấy dữ liệu Estimated Transfer Value (ETV)
-BASE_URL = "https://www.footballtransfers.com/us/players/uk-premier-league/"
-# Danh sách các URL cần crawl (từ trang 1 đến trang 22)
-PAGE_NUMBERS = range(1, 23)
-URLS = [f"{BASE_URL}{i}" for i in PAGE_NUMBERS]
+# Thư mục bộ nhớ đệm các trang HTML đã tải
+PAGE_CACHE_DIR = os.path.join(BASE_DIR, "cache", "pages")
+
+# Base URL cần lấy dữ liệu Estimated Transfer Value (ETV), theo sau là tên giải và số trang
+BASE_URL = "https://www.footballtransfers.com/us/players/"
+DEFAULT_LEAGUE = "uk-premier-league"
+# Số trang cần crawl mặc định (từ trang 1 đến trang 22)
+DEFAULT_PAGES = 22
 
 # Ngưỡng so khớp mờ (fuzzy matching) cho tên cầu thủ
 FUZZY_MATCH_THRESHOLD = 80
 
+# Bảng định danh cầu thủ (tên trên footballtransfers -> tên trong result.csv), gồm cả các trường hợp nhập tay
+IDENTITY_PATH = os.path.join(CSV_DIR, "player_identity.csv")
+IDENTITY_SOURCE = "footballtransfers_players"
+
+# Class CSS của bảng cầu thủ trên trang
+TABLE_CLASS = "similar-players-table"
+
 # --- Hàm Hỗ trợ ---
 # Hàm để thu ngắn tên nhằm tăng độ chính xác của thư viện fuzzywuzzy
-# Các trường hợp cụ thể được xử lý trước, sau đó là quy tắc chung.
+# Các trường hợp đặc biệt (ví dụ "Manuel Ugarte" -> "Manuel Ugarte Ribeiro") là các dòng manual
+# trong bảng định danh csv/player_identity.csv và được tra trước khi so khớp mờ.
 def shorten_name(name):
     """Thu ngắn tên cầu thủ để so khớp mờ tốt hơn."""
     name = name.strip()
-    # Xử lý các trường hợp tên đặc biệt
-    if name == "Manuel Ugarte Ribeiro": return "Manuel Ugarte"
-    elif name == "Igor Júlio": return "Igor"
-    elif name == "Igor Thiago": return "Thiago"
-    elif name == "Felipe Morato": return "Morato"
-    elif name == "Nathan Wood-Gordon": return "Nathan Wood"
-    elif name == "Bobby Reid": return "Bobby Cordova-Reid"
-    elif name == "J. Philogene": return "Jaden Philogene Bidace"
 
     # Nếu tên dài quá 3 từ thì chỉ lấy từ đầu tiên và từ cuối cùng
     parts = name.split(" ")
@@ -53,20 +55,21 @@ def load_player_data(file_path):
     """Tải dữ liệu cầu thủ từ CSV và chuẩn bị các từ điển để so khớp."""
     print(f"Đang tải dữ liệu cầu thủ từ {file_path}")
     try:
-        df_players = pd.read_csv(file_path)
+        df_players = load_players(file_path, columns=["Player", "Position"]) # Chỉ đọc hai cột cần dùng
         # Làm sạch tên cầu thủ từ result.csv
         df_players['Player'] = df_players['Player'].astype(str).str.strip()
         df_players['Position'] = df_players['Position'].astype(str).str.strip()
 
-        # Áp dụng hàm thu ngắn tên và tạo các từ điển tra cứu
+        # Mỗi tên thu ngắn ứng với một cầu thủ (cầu thủ sau ghi đè cầu thủ trước có cùng tên thu ngắn)
         shortened_names = df_players['Player'].apply(shorten_name)
-
-        player_positions = dict(zip(shortened_names, df_players['Position']))
         player_original_names = dict(zip(shortened_names, df_players['Player']))
-        player_names_shortened_list = list(player_positions.keys())
+        canonical_names = list(player_original_names.values())
+
+        # Từ điển tra cứu vị trí theo tên trong result.csv
+        player_positions = dict(zip(df_players['Player'], df_players['Position']))
 
         print(f"Đã tải {len(df_players)} cầu thủ.")
-        return player_positions, player_original_names, player_names_shortened_list
+        return player_positions, canonical_names
 
     except FileNotFoundError:
         print(f"Lỗi: Không tìm thấy tệp đầu vào tại {file_path}")
@@ -78,6 +81,12 @@ def load_player_data(file_path):
 # --- Hàm Thiết lập Selenium ---
 def setup_webdriver():
     """Thiết lập và trả về Selenium Chrome WebDriver đã cấu hình."""
+    # Chỉ import Selenium khi dùng phương án dự phòng này
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from webdriver_manager.chrome import ChromeDriverManager
+
     print("Đang thiết lập WebDriver...")
     options = Options()
     options.add_argument("--headless")           # Chạy ở chế độ ẩn (không hiển thị cửa sổ trình duyệt)
@@ -94,15 +103,59 @@ def setup_webdriver():
         print(f"Lỗi khi khởi tạo WebDriver: {str(e)}")
         sys.exit(1) # Thoát nếu WebDriver không khởi tạo được
 
-# --- Hàm Thu thập và Xử lý Dữ liệu cho Một Trang ---
-def scrape_and_process_page(driver, url, player_positions, player_original_names, player_names_shortened_list):
-    """Thu thập dữ liệu từ một URL và so khớp cầu thủ."""
+# --- Hàm Xử lý Dữ liệu cho Một Trang ---
+def process_rows(rows, player_positions, canonical_names, identity):
+    """So khớp các dòng của bảng (mỗi dòng là danh sách văn bản các ô) và chia theo vị trí."""
     # Khởi tạo danh sách để lưu dữ liệu cho từng vị trí trên trang hiện tại
     page_data_gk = []
     page_data_df = []
     page_data_mf = []
     page_data_fw = []
 
+    # Trích xuất tên cầu thủ và ETV từ các hàng có đủ cột (ít nhất là tên cầu thủ và ETV)
+    # Lấy phần đầu tiên trước dấu xuống dòng và loại bỏ khoảng trắng; ETV thường nằm ở cột cuối cùng
+    scraped = [(cols[1].strip().split("\n")[0].strip(), cols[-1].strip()) for cols in rows if cols and len(cols) >= 3]
+
+    # Tra bảng định danh trước, chỉ so khớp mờ (tên thu ngắn, điểm >= ngưỡng) các tên chưa gặp
+    matches = identity.resolve(IDENTITY_SOURCE, [name for name, _ in scraped], canonical_names,
+                               FUZZY_MATCH_THRESHOLD, prepare=shorten_name)
+
+    for (player_name_scraped, etv), (original_name, _) in zip(scraped, matches):
+        # Nếu tìm thấy kết quả so khớp tốt
+        if original_name is not None:
+            # Lấy vị trí theo tên trong result.csv
+            position = player_positions.get(original_name, "Unknown")
+
+            # Thêm dữ liệu vào danh sách phù hợp dựa trên vị trí
+            if "GK" in position:
+                page_data_gk.append([original_name, position, etv])
+            elif position.startswith("DF"): # Hậu vệ
+                page_data_df.append([original_name, position, etv])
+            elif position.startswith("MF"): # Tiền vệ
+                page_data_mf.append([original_name, position, etv])
+            elif position.startswith("FW"): # Tiền đạo
+                page_data_fw.append([original_name, position, etv])
+            # else: # Tùy chọn: xử lý các vị trí không khớp nếu cần
+            #     print(f"Cảnh báo: Vị trí '{position}' cho cầu thủ '{original_name}' không được nhận dạng.")
+
+    # Trả về dữ liệu đã thu thập cho trang này, giữ nguyên thứ tự nhóm vị trí
+    return page_data_gk, page_data_df, page_data_mf, page_data_fw
+
+def process_page_source(page_source, url, player_positions, canonical_names, identity):
+    """Đọc bảng cầu thủ từ HTML đã tải qua HTTP và so khớp các dòng (None nếu HTML không có bảng)."""
+    rows = parse_table_rows(page_source, TABLE_CLASS)
+    if rows is None:
+        print(f"Không tìm thấy bảng cầu thủ trong HTML của {url}.")
+        return None
+    return process_rows(rows, player_positions, canonical_names, identity)
+
+# --- Hàm Thu thập và Xử lý Dữ liệu cho Một Trang bằng Selenium ---
+def scrape_and_process_page(driver, url, player_positions, canonical_names, identity):
+    """Thu thập dữ liệu từ một URL bằng Selenium và so khớp cầu thủ (None nếu không đọc được bảng)."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
     try:
         driver.get(url)
         print(f"Đang xử lý: {url}")
@@ -110,102 +163,120 @@ def scrape_and_process_page(driver, url, player_positions, player_original_names
         # Chờ bảng cầu thủ tải xong (chờ phần tử có class "similar-players-table" xuất hiện)
         wait = WebDriverWait(driver, 15) # Tăng thời gian chờ lên một chút
         table = wait.until(
-            EC.presence_of_element_located((By.CLASS_NAME, "similar-players-table"))
+            EC.presence_of_element_located((By.CLASS_NAME, TABLE_CLASS))
         )
 
-        # Tìm tất cả các hàng (tr) trong bảng
-        rows = table.find_elements(By.TAG_NAME, "tr")
-
-        # Duyệt qua từng hàng
-        for row in rows:
-            # Tìm tất cả các ô dữ liệu (td) trong hàng
-            cols = row.find_elements(By.TAG_NAME, "td")
-
-            # Đảm bảo có đủ cột (ít nhất là tên cầu thủ và ETV)
-            if cols and len(cols) >= 3:
-                # Trích xuất tên cầu thủ và ETV từ dữ liệu thu thập được
-                # Lấy phần đầu tiên trước dấu xuống dòng và loại bỏ khoảng trắng
-                player_name_scraped = cols[1].text.strip().split("\n")[0].strip()
-                etv = cols[-1].text.strip() # ETV thường nằm ở cột cuối cùng
-
-                # Thu ngắn tên cầu thủ đã thu thập để so khớp
-                shortened_player_name_scraped = shorten_name(player_name_scraped)
-
-                # So khớp mờ với danh sách tên cầu thủ đã thu ngắn từ result.csv
-                best_match = process.extractOne(
-                    shortened_player_name_scraped,
-                    player_names_shortened_list,
-                    scorer=fuzz.token_sort_ratio # Sử dụng tỷ lệ sắp xếp token để so khớp
-                )
-
-                # Nếu tìm thấy kết quả so khớp tốt (điểm >= ngưỡng)
-                if best_match and best_match[1] >= FUZZY_MATCH_THRESHOLD:
-                    matched_shortened_name = best_match[0] # Lấy tên đã thu ngắn được so khớp
-
-                    # Lấy tên gốc và vị trí từ các từ điển tra cứu
-                    original_name = player_original_names.get(matched_shortened_name, matched_shortened_name)
-                    position = player_positions.get(matched_shortened_name, "Unknown")
-
-                    # Thêm dữ liệu vào danh sách phù hợp dựa trên vị trí
-                    if "GK" in position:
-                        page_data_gk.append([original_name, position, etv])
-                    elif position.startswith("DF"): # Hậu vệ
-                        page_data_df.append([original_name, position, etv])
-                    elif position.startswith("MF"): # Tiền vệ
-                        page_data_mf.append([original_name, position, etv])
-                    elif position.startswith("FW"): # Tiền đạo
-                        page_data_fw.append([original_name, position, etv])
-                    # else: # Tùy chọn: xử lý các vị trí không khớp nếu cần
-                    #     print(f"Cảnh báo: Vị trí '{position}' cho cầu thủ '{original_name}' không được nhận dạng.")
+        # Lấy HTML của cả bảng bằng một lần gọi WebDriver rồi đọc văn bản từng ô ngay trong Python
+        rows = get_table_rows(driver, table, TABLE_CLASS)
+        return process_rows(rows, player_positions, canonical_names, identity)
 
     except Exception as e:
         print(f"Lỗi khi xử lý trang {url}: {str(e)}")
         # Tiếp tục sang trang tiếp theo ngay cả khi một trang bị lỗi
+        return None
 
-    # Trả về dữ liệu đã thu thập cho trang này, giữ nguyên thứ tự nhóm vị trí
-    return page_data_gk, page_data_df, page_data_mf, page_data_fw
+def scrape_with_selenium(urls, page_results, player_positions, canonical_names, identity):
+    """Thu thập các URL bằng Selenium, ghi kết quả của các trang đọc được bảng vào page_results."""
+    # 2. Thiết lập WebDriver (phương án dự phòng khi bảng cần JavaScript)
+    driver = setup_webdriver()
+    try:
+        # 3. Lặp qua các URL và thu thập dữ liệu
+        for url in urls:
+            result = scrape_and_process_page(
+                driver,
+                url,
+                player_positions,
+                canonical_names,
+                identity
+            )
+            if result is not None:
+                page_results[url] = result
+    finally:
+        # Đảm bảo đóng driver ngay cả khi có lỗi xảy ra trong quá trình thu thập
+        if driver:
+            driver.quit()
+            print("WebDriver đã đóng.")
 
 # --- Luồng Thực thi Chính ---
 if __name__ == "__main__":
+    # Tham số dòng lệnh
+    parser = argparse.ArgumentParser(description="Thu thập giá trị chuyển nhượng ước tính (ETV) từ footballtransfers.")
+    parser.add_argument("--fetch-mode", choices=["http", "selenium"], default="http",
+                        help="http: tải trực tiếp qua HTTP (mặc định), trang không có bảng trong HTML được đọc lại bằng Selenium; "
+                             "selenium: dùng Chrome headless cho mọi trang")
+    parser.add_argument("--concurrency", type=int, default=4, help="Số yêu cầu đồng thời tối đa trên mỗi host")
+    parser.add_argument("--min-interval", type=float, default=1.0, help="Khoảng cách tối thiểu (giây) giữa hai yêu cầu tới cùng host")
+    parser.add_argument("--league", default=DEFAULT_LEAGUE, help="Tên giải trong URL của footballtransfers, ví dụ es-laliga")
+    parser.add_argument("--pages", type=int, default=DEFAULT_PAGES, help="Số trang danh sách cầu thủ cần crawl (từ trang 1)")
+    add_cache_arguments(parser, PAGE_CACHE_DIR)
+    args = parser.parse_args()
+
+    # Danh sách các URL cần crawl (từ trang 1 đến trang args.pages)
+    URLS = [f"{BASE_URL}{args.league}/{i}" for i in range(1, args.pages + 1)]
+
     # 1. Tải và chuẩn bị dữ liệu cầu thủ ban đầu
-    player_positions, player_original_names, player_names_shortened_list = load_player_data(RESULT_PATH)
+    player_positions, canonical_names = load_player_data(RESULT_PATH)
 
     # Kiểm tra xem có dữ liệu cầu thủ để so khớp hay không
-    if not player_names_shortened_list:
+    if not canonical_names:
         print("Không có dữ liệu cầu thủ nào được tải để so khớp. Đang thoát.")
         sys.exit(0) # Thoát một cách an toàn nếu không tìm thấy cầu thủ
 
-    # 2. Thiết lập WebDriver
-    driver = setup_webdriver()
+    # Bảng định danh: tên đã gặp ở các lần chạy trước (và các dòng nhập tay) không phải so khớp lại
+    identity = IdentityTable(IDENTITY_PATH)
 
-    # Khởi tạo danh sách để tích lũy dữ liệu từ tất cả các trang
-    all_data_gk = []
-    all_data_df = []
-    all_data_mf = []
-    all_data_fw = []
+    # Kết quả theo từng URL; các trang có thể tải xong theo thứ tự bất kỳ
+    page_results = {}
 
-    try:
-        # 3. Lặp qua các URL và thu thập dữ liệu
-        for url in URLS:
-            # Thu thập và xử lý dữ liệu cho trang hiện tại
-            gk, df, mf, fw = scrape_and_process_page(
-                driver,
+    if args.fetch_mode == "http":
+        # 2-3. Tải đồng thời các trang qua HTTP và xử lý từng trang ngay khi nó tải xong
+        def on_page(url, page_source):
+            print(f"Đang xử lý: {url}")
+            result = process_page_source(
+                page_source,
                 url,
                 player_positions,
-                player_original_names,
-                player_names_shortened_list
+                canonical_names,
+                identity
             )
-            # Mở rộng danh sách chính với dữ liệu từ trang hiện tại
-            all_data_gk.extend(gk)
-            all_data_df.extend(df)
-            all_data_mf.extend(mf)
-            all_data_fw.extend(fw)
+            if result is not None:
+                page_results[url] = result
+
+        with create_fetcher("http", cache=cache_from_args(args)) as fetcher:
+            fetch_all(URLS, fetcher.get_page_source, on_page,
+                      per_host_concurrency=args.concurrency, min_interval=args.min_interval,
+                      cached_func=fetcher.get_cached_page_source)
+
+        # Trang không có bảng trong HTML (bảng cần JavaScript) hoặc tải lỗi: đọc lại bằng Selenium như trước đây
+        missing = [url for url in URLS if url not in page_results]
+        if missing:
+            print(f"⚠️ {len(missing)}/{len(URLS)} trang không đọc được bảng qua HTTP, chuyển sang Selenium cho các trang này.")
+            scrape_with_selenium(missing, page_results, player_positions, canonical_names, identity)
+    else:
+        scrape_with_selenium(URLS, page_results, player_positions, canonical_names, identity)
 
-    finally:
-        # Đảm bảo đóng driver ngay cả khi có lỗi xảy ra trong quá trình thu thập
-        if driver:
-            driver.quit()
-            print("WebDriver đã đóng.")
+    # Không trang nào đọc được bảng: dừng với mã lỗi thay vì ghi tệp kết quả rỗng
+    if not page_results:
+        print("❌ Không đọc được bảng cầu thủ ở trang nào (HTTP và Selenium).")
+        sys.exit(1)
+
+    # Ghi lại các kết quả so khớp mới để lần chạy sau chỉ cần tra bảng
+    identity.save()
+
+    # Khởi tạo danh sách để tích lũy dữ liệu từ tất cả các trang, theo đúng thứ tự trang
+    all_data_gk = []
+    all_data_df = []
+    all_data_mf = []
+    all_data_fw = []
+    for url in URLS:
+        if url not in page_results:
+            continue
+        gk, df, mf, fw = page_results[url]
+        # Mở rộng danh sách chính với dữ liệu từ trang hiện tại
+        all_data_gk.extend(gk)
+        all_data_df.extend(df)
+        all_data_mf.extend(mf)
+        all_data_fw.extend(fw)
 
     # 4. Kết hợp và Lưu Dữ liệu
     # Kết hợp dữ liệu giữ nguyên thứ tự nhóm ban đầu (GK, DF, MF, FW)
@@ -0,0 +1,146 @@
+import html
+import re
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup, Comment
+
+# Thẻ mở/đóng <table> dùng để theo dõi độ sâu khi bảng có bảng lồng bên trong
+TABLE_TAG_PATTERN = re.compile(r"<(/?)table\b", re.IGNORECASE)
+
+# Các mẫu dùng khi duyệt <tbody>: dòng, ô (td/th), thuộc tính data-stat / class và thẻ HTML bên trong ô
+TBODY_PATTERN = re.compile(r"<tbody\b[^>]*>(.*?)</tbody>", re.IGNORECASE | re.DOTALL)
+ROW_PATTERN = re.compile(r"<tr\b([^>]*)>(.*?)</tr>", re.IGNORECASE | re.DOTALL)
+CELL_PATTERN = re.compile(r"<t[dh]\b([^>]*)>(.*?)</t[dh]>", re.IGNORECASE | re.DOTALL)
+DATA_STAT_PATTERN = re.compile(r"\bdata-stat=[\"']([^\"']*)[\"']")
+CLASS_PATTERN = re.compile(r"\bclass=[\"']([^\"']*)[\"']")
+ID_PATTERN = re.compile(r"\bdata-append-csv=[\"']([^\"']*)[\"']")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+def extract_table_html(page_source, table_id):
+    """Cắt đoạn HTML <table id="table_id">...</table> từ trang thô bằng một lần quét tuyến tính.
+
+    fbref đặt phần lớn các bảng thống kê bên trong comment HTML; vì chỉ làm việc trên chuỗi thô
+    nên hàm tìm được bảng dù nó nằm trong comment hay không. Trả về None nếu không có bảng.
+    """
+    opening = re.search(r"<table\b[^>]*?\bid=[\"']%s[\"']" % re.escape(table_id), page_source, re.IGNORECASE)
+    if opening is None:
+        return None
+
+    # Đi tiếp từ thẻ mở cho tới thẻ </table> tương ứng (có tính độ sâu)
+    depth = 0
+    for tag in TABLE_TAG_PATTERN.finditer(page_source, opening.start()):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            end = page_source.find(">", tag.end())
+            return page_source[opening.start():end + 1]
+    return None
+
+
+def find_table(page_source, table_id):
+    """Tìm bảng theo id và chỉ phân tích đoạn HTML của bảng đó; trả về thẻ <table> của BeautifulSoup hoặc None."""
+    fragment = extract_table_html(page_source, table_id)
+    if fragment is None:
+        return None
+    return BeautifulSoup(fragment, "html.parser").find("table")
+
+
+def find_table_in_comments(page_source, table_id):
+    """Cách làm cũ: phân tích toàn trang, duyệt mọi comment và phân tích lại comment chứa bảng (dùng để đo so sánh)."""
+    soup = BeautifulSoup(page_source, "html.parser")
+    comments = soup.find_all(string=lambda text: isinstance(text, Comment))
+    for comment in comments:
+        if table_id in comment:
+            table = BeautifulSoup(comment, "html.parser").find("table", {"id": table_id})
+            if table:
+                return table
+    return None
+
+
+def parse_stats_table(table_html, column_map, int_columns=(), float_columns=(), id_column=None, id_stat="player"):
+    """Đọc bảng thống kê fbref thành DataFrame bằng một lượt duyệt các dòng của <tbody>.
+
+    Mỗi ô được nhận diện qua thuộc tính data-stat (ví dụ data-stat="minutes") thay vì vị trí cột,
+    column_map ánh xạ data-stat sang tên cột mong muốn; các data-stat khác bị bỏ qua nên bảng
+    có thêm cột mới không làm lệch kết quả. Các dòng tiêu đề lặp lại (class "thead") bị bỏ qua.
+    Cột trong int_columns được đưa thẳng về kiểu Int64, cột trong float_columns về float64,
+    các cột còn lại giữ dạng chuỗi (ô rỗng thành NaN).
+    Nếu có id_column, mã định danh ổn định của fbref (thuộc tính data-append-csv của ô id_stat,
+    ví dụ "ba3316e1" trong đường dẫn /en/players/ba3316e1/...) được lưu vào cột id_column.
+    """
+    values = {column: [] for column in column_map.values()}
+    if id_column is not None:
+        values[id_column] = []
+    tbody = TBODY_PATTERN.search(table_html)
+    if tbody is not None:
+        for row in ROW_PATTERN.finditer(tbody.group(1)):
+            row_class = CLASS_PATTERN.search(row.group(1))
+            if row_class is not None and "thead" in row_class.group(1).split():
+                continue # Dòng tiêu đề lặp lại giữa bảng
+            cells = {}
+            for cell in CELL_PATTERN.finditer(row.group(2)):
+                data_stat = DATA_STAT_PATTERN.search(cell.group(1))
+                if data_stat is None:
+                    continue
+                if data_stat.group(1) in column_map:
+                    text = html.unescape(TAG_PATTERN.sub("", cell.group(2))).strip()
+                    cells[column_map[data_stat.group(1)]] = text if text else None
+                if id_column is not None and data_stat.group(1) == id_stat:
+                    row_id = ID_PATTERN.search(cell.group(1))
+                    cells[id_column] = row_id.group(1) if row_id is not None and row_id.group(1) else None
+            if not cells:
+                continue # Dòng trống / dòng ngăn cách
+            for column, column_values in values.items():
+                column_values.append(cells.get(column))
+
+    columns = {}
+    for column, column_values in values.items():
+        if column in int_columns or column in float_columns:
+            # fbref ghi số lớn có dấu phẩy hàng nghìn, ví dụ "2,430"
+            numbers = pd.to_numeric(
+                pd.Series([v.replace(",", "") if v is not None else None for v in column_values], dtype=object),
+                errors="coerce",
+            )
+            columns[column] = numbers.astype("Int64") if column in int_columns else numbers.astype("float64")
+        else:
+            columns[column] = pd.Series(np.array(column_values, dtype=object))
+    df = pd.DataFrame(columns)
+    return df
+
+
+def _measure(func, *args, repeat=3):
+    # Thời gian tốt nhất sau vài lần chạy và bộ nhớ đỉnh (tracemalloc) của một lần chạy
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+if __name__ == "__main__":
+    # Đo so sánh trên các trang đã lưu:
+    #   python fbref_tables.py <trang.html> <table_id> [<trang.html> <table_id> ...]
+    if len(sys.argv) < 3 or len(sys.argv) % 2 == 0:
+        print("Cách dùng: python fbref_tables.py <trang.html> <table_id> [<trang.html> <table_id> ...]")
+        sys.exit(1)
+
+    for page_path, table_id in zip(sys.argv[1::2], sys.argv[2::2]):
+        with open(page_path, "r", encoding="utf-8") as f:
+            page_source = f.read()
+
+        old_table, old_time, old_peak = _measure(find_table_in_comments, page_source, table_id)
+        new_table, new_time, new_peak = _measure(find_table, page_source, table_id)
+        same = old_table is not None and new_table is not None and str(old_table) == str(new_table)
+
+        print(f"📄 {page_path} ({len(page_source) / 1e6:.1f} MB) - {table_id}")
+        print(f"   Duyệt comment : {old_time * 1000:9.1f} ms, bộ nhớ đỉnh {old_peak / 1e6:7.1f} MB")
+        print(f"   Quét một lượt : {new_time * 1000:9.1f} ms, bộ nhớ đỉnh {new_peak / 1e6:7.1f} MB")
+        print(f"   Nhanh hơn {old_time / new_time:.1f} lần, bảng giống hệt nhau: {'có' if same else 'KHÔNG'}")
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+
+class HostRateLimiter:
+    """Giới hạn số yêu cầu đồng thời và khoảng cách tối thiểu giữa hai yêu cầu trên cùng một host."""
+
+    def __init__(self, per_host_concurrency=4, min_interval=1.0):
+        self.per_host_concurrency = max(1, per_host_concurrency)
+        self.min_interval = max(0.0, min_interval)
+        self._semaphores = {}
+        self._locks = {}
+        self._next_start = {}
+
+    def _host_state(self, host):
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+            self._locks[host] = asyncio.Lock()
+            self._next_start[host] = 0.0
+        return self._semaphores[host], self._locks[host]
+
+    async def run(self, url, func):
+        """Chạy func(url) trong một luồng phụ khi host còn "suất" và đã đủ khoảng cách thời gian."""
+        host = urlsplit(url).netloc
+        semaphore, lock = self._host_state(host)
+        async with semaphore:
+            # Xếp lịch thời điểm bắt đầu để các yêu cầu cùng host cách nhau ít nhất min_interval giây
+            async with lock:
+                now = time.monotonic()
+                start_at = max(now, self._next_start[host])
+                self._next_start[host] = start_at + self.min_interval
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+            return await asyncio.to_thread(func, url)
+
+
+async def _fetch_all_async(urls, fetch_func, on_page, on_error, limiter, cached_func):
+    async def fetch_one(url):
+        try:
+            # Trang đã có sẵn trong bộ nhớ đệm không chiếm "suất" của host và không phải chờ
+            if cached_func is not None:
+                page_source = await asyncio.to_thread(cached_func, url)
+                if page_source is not None:
+                    return url, page_source, None
+            return url, await limiter.run(url, fetch_func), None
+        except Exception as e:
+            return url, None, e
+
+    tasks = [asyncio.create_task(fetch_one(url)) for url in urls]
+    # Giao từng trang cho bước phân tích ngay khi trang đó tải xong, không đợi cả lô
+    for finished in asyncio.as_completed(tasks):
+        url, page_source, error = await finished
+        if error is not None:
+            if on_error is not None:
+                on_error(url, error)
+            else:
+                print(f"❌ Lỗi khi tải trang {url}: {error}")
+            continue
+        on_page(url, page_source)
+
+
+def fetch_all(urls, fetch_func, on_page, per_host_concurrency=4, min_interval=1.0, on_error=None, cached_func=None):
+    """Tải đồng thời danh sách URL và gọi on_page(url, page_source) theo thứ tự trang nào xong trước.
+
+    fetch_func là hàm đồng bộ nhận URL và trả về HTML (ví dụ HttpFetcher.get_page_source);
+    nó được chạy trong luồng phụ nên có thể dùng chung một requests.Session.
+    cached_func (tùy chọn, ví dụ HttpFetcher.get_cached_page_source) trả về HTML đã lưu hoặc None;
+    trang có sẵn trong bộ nhớ đệm được giao ngay, không bị giới hạn tốc độ.
+    """
+    limiter = HostRateLimiter(per_host_concurrency, min_interval)
+    asyncio.run(_fetch_all_async(list(urls), fetch_func, on_page, on_error, limiter, cached_func))
@@ -0,0 +1,308 @@
+import random
+import re
+import sys
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup
+from benchmark_utils import best_time
+
+# lxml (parser viết bằng C) là phụ thuộc tùy chọn; không có thì dùng html.parser của BeautifulSoup
+try:
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
+
+# Giá trị tiền trên footballtransfers, ví dụ "€20M", "£500K", "€1.5M" (sau khi bỏ ký hiệu tiền tệ và viết hoa)
+MONEY_PATTERN = r"^(\d*\.?\d+)\s*([KM]?)$"
+MONEY_MULTIPLIERS = {"": 1, "K": 1_000, "M": 1_000_000}
+
+
+def _find_table_lxml(document, table_class):
+    # Tương đương soup.find(class_=table_class): phần tử đầu tiên có class chứa table_class
+    matches = document.xpath(
+        "descendant-or-self::*[contains(concat(' ', normalize-space(@class), ' '), $cls)]",
+        cls=f" {table_class} ",
+    )
+    return matches[0] if matches else None
+
+
+# Phần tử khối: .text của Selenium xuống dòng trước và sau các phần tử này (và tại <br>); văn bản của phần tử
+# nội tuyến (<a>, <span>, <b>...) được nối liền, khoảng trắng liên tiếp gộp thành một dấu cách
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "fieldset", "figcaption", "figure",
+    "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre",
+    "section", "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+}
+# Văn bản không hiển thị (get_text của BeautifulSoup cũng bỏ qua)
+HIDDEN_TAGS = {"script", "style", "template", "noscript"}
+
+
+def _visible_text(pieces):
+    # Nối các mảnh văn bản ("\n" là chỗ xuống dòng của phần tử khối / <br>) theo cách của .text trong Selenium:
+    # khoảng trắng trong văn bản (kể cả xuống dòng, &nbsp;) gộp thành một dấu cách, bỏ khoảng trắng đầu/cuối dòng
+    # và các dòng trống
+    text = "".join(piece if piece == "\n" else re.sub(r"\s+", " ", piece) for piece in pieces)
+    return "\n".join(line.strip() for line in text.split("\n") if line.strip())
+
+
+def _pieces_lxml(element, pieces):
+    # Comment / processing instruction có tag không phải chuỗi: chỉ lấy phần văn bản phía sau (tail)
+    tag = element.tag.lower() if isinstance(element.tag, str) else None
+    if tag is not None and tag not in HIDDEN_TAGS:
+        if tag == "br":
+            pieces.append("\n")
+        block = tag in BLOCK_TAGS
+        if block:
+            pieces.append("\n")
+        if element.text:
+            pieces.append(element.text)
+        for child in element:
+            _pieces_lxml(child, pieces)
+        if block:
+            pieces.append("\n")
+    if element.tail:
+        pieces.append(element.tail)
+
+
+def _cell_text_lxml(td):
+    pieces = []
+    if td.text:
+        pieces.append(td.text)
+    for child in td:
+        _pieces_lxml(child, pieces)
+    return _visible_text(pieces)
+
+
+def _rows_lxml(table):
+    return [[_cell_text_lxml(td) for td in tr.iter("td")] for tr in table.iter("tr")]
+
+
+def _pieces_bs4(tag, pieces):
+    from bs4 import NavigableString
+    from bs4.element import PreformattedString
+    for child in tag.children:
+        if isinstance(child, NavigableString):
+            # Comment, CDATA, doctype... là PreformattedString: không hiển thị
+            if not isinstance(child, PreformattedString):
+                pieces.append(str(child))
+        elif child.name == "br":
+            pieces.append("\n")
+        elif child.name not in HIDDEN_TAGS:
+            block = child.name in BLOCK_TAGS
+            if block:
+                pieces.append("\n")
+            _pieces_bs4(child, pieces)
+            if block:
+                pieces.append("\n")
+
+
+def _cell_text_bs4(td):
+    pieces = []
+    _pieces_bs4(td, pieces)
+    return _visible_text(pieces)
+
+
+def _parse_rows_bs4(page_source, table_class):
+    soup = BeautifulSoup(page_source, "html.parser")
+    table = soup.find(class_=table_class)
+    if table is None:
+        return None
+    return [[_cell_text_bs4(td) for td in tr.find_all("td")] for tr in table.find_all("tr")]
+
+
+def parse_table_rows(page_source, table_class):
+    """Đọc bảng có class table_class trong HTML và trả về danh sách các dòng, mỗi dòng là danh sách văn bản của các ô <td>.
+
+    Văn bản của mỗi ô giống thuộc tính .text của Selenium: văn bản nội tuyến được nối liền (khoảng trắng gộp
+    thành một dấu cách), chỉ xuống dòng tại phần tử khối (BLOCK_TAGS) và <br>, nên mã xử lý cũ
+    (ví dụ .split("\\n")[0]) vẫn dùng được. Trả về None nếu không tìm thấy bảng.
+    page_source có thể là cả trang hoặc chỉ outerHTML của bảng; dùng lxml nếu đã cài.
+    """
+    if lxml_html is None:
+        return _parse_rows_bs4(page_source, table_class)
+    if not page_source or not page_source.strip():
+        return None
+    table = _find_table_lxml(lxml_html.fromstring(page_source), table_class)
+    if table is None:
+        return None
+    return _rows_lxml(table)
+
+
+def get_table_rows(driver, table_element, table_class):
+    """Lấy toàn bộ bảng đã hiển thị trong Selenium bằng một lần gọi outerHTML rồi đọc các dòng ngay trong Python.
+
+    Thay cho việc gọi find_elements(By.TAG_NAME, "td") và .text cho từng dòng, từng ô
+    (mỗi lần gọi là một lượt trao đổi với WebDriver).
+    """
+    table_html = table_element.get_attribute("outerHTML")
+    rows = parse_table_rows(table_html, table_class)
+    if rows is None:
+        # Dự phòng: đọc từ toàn bộ page_source (vẫn chỉ một lần gọi WebDriver)
+        rows = parse_table_rows(driver.page_source, table_class)
+    return rows or []
+
+
+def selenium_table_rows(table_element):
+    """Cách đọc bảng cũ: find_elements("tr"), rồi find_elements("td") và .text cho từng ô (mỗi lần là một lượt
+    gọi WebDriver). Chỉ dùng để ghi lại kết quả tham chiếu của Selenium cho phép so sánh trong __main__."""
+    from selenium.webdriver.common.by import By
+    return [[td.text for td in tr.find_elements(By.TAG_NAME, "td")]
+            for tr in table_element.find_elements(By.TAG_NAME, "tr")]
+
+
+def parse_money(text):
+    """Phân tích một chuỗi giá trị (ví dụ: '€20M', '£500K') thành số; NaN nếu không đọc được."""
+    if pd.isna(text) or text in ["N/A", ""]:
+        return np.nan
+    try:
+        # Loại bỏ ký hiệu tiền tệ và khoảng trắng, chuyển thành chữ hoa
+        text = re.sub(r'[€£]', '', text).strip().upper()
+        # Xác định hệ số nhân (triệu, nghìn)
+        multiplier = 1000000 if 'M' in text else 1000 if 'K' in text else 1
+        # Loại bỏ ký hiệu 'M', 'K' và chuyển thành số thực, sau đó nhân với hệ số
+        return float(re.sub(r'[MK]', '', text)) * multiplier
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def parse_money_series(values):
+    """Phân tích cả cột giá trị tiền (€/£, hậu tố K/M) thành float64 bằng một phép regex cho toàn cột.
+
+    Cùng kết quả với parse_money cho các giá trị đúng định dạng; giá trị thiếu, "N/A"
+    hoặc không phải chuỗi thành NaN.
+    """
+    values = pd.Series(values, dtype=object)
+    # Giá trị lặp lại nhiều (ví dụ "€20M"): chỉ phân tích các giá trị khác nhau rồi trải lại theo mã của từng dòng
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    text = uniques.where(uniques.map(type) == str)
+    text = text.str.replace(r"[€£]", "", regex=True).str.strip().str.upper()
+    parts = text.str.extract(MONEY_PATTERN)
+    parsed = (pd.to_numeric(parts[0], errors="coerce") * parts[1].map(MONEY_MULTIPLIERS)).to_numpy(dtype="float64")
+    # Mã -1 (giá trị thiếu) lấy NaN ở cuối mảng
+    return pd.Series(np.append(parsed, np.nan)[codes], index=values.index, dtype="float64")
+
+
+def _synthetic_money(n, seed=0):
+    rng = random.Random(seed)
+    values = []
+    for _ in range(n):
+        choice = rng.random()
+        if choice < 0.6:
+            values.append(f"€{rng.randint(0, 180)}.{rng.randint(0, 9)}M")
+        elif choice < 0.8:
+            values.append(f"£{rng.randint(1, 999)}K")
+        elif choice < 0.9:
+            values.append(f"€{rng.randint(1, 120)}M")
+        else:
+            values.append(rng.choice(["N/A", "", None, "€-", "1.2.3M"]))
+    return values
+
+
+# Ô mẫu và văn bản .text tương ứng của Selenium (kiểm tra nhanh khi chưa có trang tham chiếu đã lưu)
+SELENIUM_TEXT_SAMPLES = [
+    ("<td><a>Bruno <span>Fernandes</span></a></td>", "Bruno Fernandes"),
+    ("<td><span>€</span>20M</td>", "€20M"),
+    ("<td>\n  <a href='#'>Erling\n   Haaland</a>\n</td>", "Erling Haaland"),
+    ("<td><div>Bukayo Saka</div><div>Arsenal</div></td>", "Bukayo Saka\nArsenal"),
+    ("<td>Cole Palmer<br>Chelsea</td>", "Cole Palmer\nChelsea"),
+    ("<td>€1.5M<script>var x = 1;</script><!-- ghi chú --></td>", "€1.5M"),
+    ("<td>&nbsp;N/A&nbsp;</td>", "N/A"),
+]
+
+
+def selenium_reference_path(page_path):
+    """Tệp JSON chứa các dòng Selenium .text của trang đã lưu (tạo bằng chế độ capture trong __main__)."""
+    return page_path + ".selenium.json"
+
+
+def _capture_page(table_class, url, page_path):
+    # Mở trang bằng Chrome, lưu page_source và kết quả đọc bảng theo cách cũ của Selenium làm tham chiếu
+    import json
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    driver = webdriver.Chrome(options=options)
+    try:
+        driver.get(url)
+        table = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CLASS_NAME, table_class)))
+        rows = selenium_table_rows(table)
+        with open(page_path, "w", encoding="utf-8") as f:
+            f.write(driver.page_source)
+        with open(selenium_reference_path(page_path), "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=1)
+    finally:
+        driver.quit()
+    print(f"💾 Đã lưu {page_path} và {len(rows)} dòng Selenium vào {selenium_reference_path(page_path)}")
+
+
+if __name__ == "__main__":
+    # Đo so sánh trên các trang đã lưu:
+    #   python footballtransfers.py <table_class> <trang.html> [<trang.html> ...]
+    # ví dụ table_class: transfer-table (Bai4_1.py) hoặc similar-players-table (estimating_transfer_value.py)
+    # Lưu một trang cùng kết quả .text của Selenium để so sánh (trang.html.selenium.json):
+    #   python footballtransfers.py capture <table_class> <url> <trang.html>
+    # Đo so sánh phân tích giá trị tiền: python footballtransfers.py money [số giá trị]  (mặc định 1M)
+    if sys.argv[1:2] == ["money"]:
+        n_values = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+        values = pd.Series(_synthetic_money(n_values), dtype=object)
+        expected, row_time = best_time(lambda: values.map(parse_money), repeat=1)
+        actual, vector_time = best_time(lambda: parse_money_series(values), repeat=3)
+        print(f"💶 {n_values:,} giá trị: parse_money từng dòng {row_time * 1000:8.1f} ms | "
+              f"vector hóa {vector_time * 1000:8.1f} ms | nhanh hơn {row_time / vector_time:5.1f} lần | "
+              f"giống hệt: {'có' if expected.astype('float64').equals(actual) else 'KHÔNG'}")
+        sys.exit(0)
+    if sys.argv[1:2] == ["capture"] and len(sys.argv) == 5:
+        _capture_page(*sys.argv[2:5])
+        sys.exit(0)
+    if len(sys.argv) < 3:
+        print("Cách dùng: python footballtransfers.py <table_class> <trang.html> [<trang.html> ...]")
+        sys.exit(1)
+
+    import json
+    import os
+    table_class = sys.argv[1]
+    for cell, expected_text in SELENIUM_TEXT_SAMPLES:
+        sample = f"<table class='{table_class}'><tr>{cell}</tr></table>"
+        texts = {"lxml": parse_table_rows(sample, table_class)[0][0], "html.parser": _parse_rows_bs4(sample, table_class)[0][0]}
+        wrong = {parser: text for parser, text in texts.items() if text != expected_text}
+        if wrong:
+            print(f"⚠️ Ô mẫu {cell!r}: Selenium {expected_text!r}, nhận được {wrong}")
+    for page_path in sys.argv[2:]:
+        with open(page_path, "r", encoding="utf-8") as f:
+            page_source = f.read()
+
+        old_rows, old_time = best_time(_parse_rows_bs4, page_source, table_class, repeat=5)
+        new_rows, new_time = best_time(parse_table_rows, page_source, table_class, repeat=5)
+        if new_rows is None:
+            print(f"⚠️ Không tìm thấy bảng {table_class} trong {page_path}")
+            continue
+        # Cách cũ trên Selenium: 1 lần tìm bảng + 1 lần find_elements("tr") + mỗi dòng 1 lần find_elements("td")
+        # + mỗi ô 1 lần .text; cách mới: 1 lần tìm bảng + 1 lần get_attribute("outerHTML")
+        webdriver_calls = 2 + len(new_rows) + sum(len(row) for row in new_rows)
+        table_match = re.search(r"<table\b[^>]*\b%s\b.*?</table>" % re.escape(table_class), page_source, re.DOTALL)
+        _, fragment_time = best_time(parse_table_rows, table_match.group(0), table_class, repeat=5) if table_match else (None, 0.0)
+
+        print(f"📄 {page_path} ({len(page_source) / 1e3:.0f} KB, {len(new_rows)} dòng)")
+        print(f"   BeautifulSoup html.parser, cả trang : {old_time * 1000:8.2f} ms")
+        print(f"   lxml, cả trang (page_source)        : {new_time * 1000:8.2f} ms (nhanh hơn {old_time / new_time:.1f} lần)")
+        if table_match:
+            print(f"   lxml, chỉ outerHTML của bảng        : {fragment_time * 1000:8.2f} ms")
+        print(f"   Số lần gọi WebDriver mỗi trang       : {webdriver_calls} -> 2")
+        print(f"   lxml và html.parser giống hệt        : {'có' if old_rows == new_rows else 'KHÔNG'}")
+        reference_path = selenium_reference_path(page_path)
+        if os.path.exists(reference_path):
+            with open(reference_path, "r", encoding="utf-8") as f:
+                selenium_rows = json.load(f)
+            # Selenium chỉ trả văn bản của các ô đang hiển thị; so sánh các dòng có dữ liệu
+            differences = sum(old != new for old, new in zip(selenium_rows, new_rows)) + abs(len(selenium_rows) - len(new_rows))
+            print(f"   Giống .text của Selenium đã lưu      : {'có' if differences == 0 else f'KHÔNG ({differences} dòng khác)'}")
+        else:
+            print(f"   (chưa có {reference_path}; tạo bằng: python footballtransfers.py capture ...)")
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from process_pool import pool_context
+
+# Một ảnh histogram cần vẽ: số đếm và mép các khoảng đã tính sẵn, cùng các thông tin trình bày
+# - path: đường dẫn tệp PNG, edges: mép các khoảng (bins + 1), counts: số cầu thủ trong từng khoảng
+# - alpha: độ trong suốt của cột (None: mặc định của matplotlib), figsize: kích thước hình (inch)
+HistogramJob = namedtuple("HistogramJob", ["path", "edges", "counts", "title", "xlabel", "ylabel",
+                                           "color", "alpha", "figsize"])
+
+# Tệp ghi dấu vân tay của từng ảnh đã vẽ, nằm trong thư mục histograms
+HISTOGRAM_MANIFEST = "manifest.json"
+# Tăng khi thay đổi cách vẽ để mọi ảnh cũ được vẽ lại
+RENDER_VERSION = 1
+
+
+def grouped_histograms(values, codes, n_groups, bins):
+    """Histogram của từng cột trong values cho từng nhóm, tính trong một lần trên toàn bộ dữ liệu.
+
+    values có dạng (n,) hoặc (n, m), codes là mã nhóm 0..n_groups-1 của từng dòng (-1: bỏ qua).
+    Trả về (edges, counts) dạng (m, n_groups, bins + 1) và (m, n_groups, bins) (bỏ chiều m nếu values
+    là mảng một chiều). Kết quả giống hệt np.histogram(values[codes == g, j], bins) - cũng là cách plt.hist
+    chia khoảng: bins khoảng đều từ min đến max của nhóm, khoảng cuối lấy cả mép phải. NaN bị bỏ qua.
+    """
+    values = np.asarray(values, dtype="float64")
+    squeeze = values.ndim == 1
+    values = values.reshape(len(values), -1)
+    n_rows, n_columns = values.shape
+    codes = np.asarray(codes)
+
+    # Mỗi giá trị thuộc một ô (cột, nhóm); giá trị NaN hoặc không có nhóm không được đếm
+    cells = (np.arange(n_columns) * n_groups)[None, :] + codes[:, None]
+    keep = ~np.isnan(values) & (codes >= 0)[:, None]
+    cells, flat = cells[keep], values[keep]
+
+    n_cells = n_columns * n_groups
+    first = np.full(n_cells, np.inf)
+    last = np.full(n_cells, -np.inf)
+    np.minimum.at(first, cells, flat)
+    np.maximum.at(last, cells, flat)
+    # Như np.histogram: nhóm rỗng dùng khoảng [0, 1], nhóm chỉ có một giá trị thì nới thêm 0.5 mỗi phía
+    empty = np.isinf(first)
+    first[empty], last[empty] = 0.0, 1.0
+    flat_range = first == last
+    first[flat_range] -= 0.5
+    last[flat_range] += 0.5
+    edges = np.linspace(first, last, bins + 1, axis=1)
+
+    # Cùng công thức chỉ số khoảng của np.histogram (kể cả hai bước chỉnh sai số ở sát mép)
+    indices = ((flat - first[cells]) / (last[cells] - first[cells]) * bins).astype(np.intp)
+    indices[indices == bins] -= 1
+    indices[flat < edges[cells, indices]] -= 1
+    indices[(flat >= edges[cells, indices + 1]) & (indices != bins - 1)] += 1
+    counts = np.bincount(cells * bins + indices, minlength=n_cells * bins).reshape(n_columns, n_groups, bins)
+
+    edges = edges.reshape(n_columns, n_groups, bins + 1)
+    if squeeze:
+        return edges[0], counts[0]
+    return edges, counts
+
+
+def job_digest(job):
+    """Dấu vân tay của mọi dữ liệu đầu vào của một ảnh; ảnh chỉ cần vẽ lại khi dấu vân tay thay đổi."""
+    digest = hashlib.sha1(repr((RENDER_VERSION, job.title, job.xlabel, job.ylabel, job.color, job.alpha,
+                                tuple(job.figsize))).encode("utf-8"))
+    digest.update(np.ascontiguousarray(job.edges, dtype="float64").tobytes())
+    digest.update(np.ascontiguousarray(job.counts, dtype="int64").tobytes())
+    return digest.hexdigest()
+
+
+def _load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_manifest(path, manifest):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+# Mỗi tiến trình vẽ giữ một hình cho mỗi kích thước và dùng lại cho mọi ảnh cùng kích thước
+_worker_figures = {}
+
+
+def _figure(figsize):
+    figure = _worker_figures.get(figsize)
+    if figure is None:
+        # Vẽ thẳng bằng Agg (không qua pyplot): không cần màn hình, không có trạng thái toàn cục
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        figure = Figure(figsize=figsize)
+        FigureCanvasAgg(figure)
+        figure.add_subplot()
+        _worker_figures[figsize] = figure
+    return figure, figure.axes[0]
+
+
+def _render_chunk(jobs):
+    for job in jobs:
+        figure, ax = _figure(tuple(job.figsize))
+        ax.clear()
+        # Vẽ lại đúng các cột của plt.hist(dữ liệu, bins) từ số đếm: mỗi khoảng một giá trị có trọng số bằng số đếm
+        ax.hist(job.edges[:-1], bins=job.edges, weights=job.counts, color=job.color,
+                edgecolor="black", alpha=job.alpha)
+        ax.set_title(job.title)
+        ax.set_xlabel(job.xlabel)
+        ax.set_ylabel(job.ylabel)
+        ax.grid(True, alpha=0.3)
+        figure.savefig(job.path, bbox_inches="tight")
+    return len(jobs)
+
+
+def render_histograms(jobs, manifest_path, workers=None, force=False):
+    """Vẽ các HistogramJob ra PNG, chia cho workers tiến trình (mặc định: số nhân CPU).
+
+    Ảnh đã có trên đĩa với cùng dấu vân tay trong manifest_path được bỏ qua (trừ khi force=True);
+    manifest được cập nhật sau khi vẽ. Trả về (số ảnh đã vẽ, số ảnh bỏ qua).
+    """
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    manifest = _load_manifest(manifest_path)
+    pending = []
+    for job in jobs:
+        key = os.path.relpath(os.path.abspath(job.path), manifest_dir)
+        digest = job_digest(job)
+        if force or manifest.get(key) != digest or not os.path.exists(job.path):
+            pending.append((key, digest, job))
+    if not pending:
+        return 0, len(jobs)
+
+    pending_jobs = [job for _, _, job in pending]
+    workers = min(workers or os.cpu_count() or 1, len(pending_jobs))
+    if workers <= 1:
+        _render_chunk(pending_jobs)
+    else:
+        # Mỗi tiến trình nhận vài khối ảnh liên tiếp (cùng kích thước hình) để dùng lại hình đã tạo
+        chunk_size = max(1, -(-len(pending_jobs) // (workers * 4)))
+        chunks = [pending_jobs[start:start + chunk_size] for start in range(0, len(pending_jobs), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as executor:
+            list(executor.map(_render_chunk, chunks))
+
+    for key, digest, _ in pending:
+        manifest[key] = digest
+    _save_manifest(manifest_path, manifest)
+    return len(pending), len(jobs) - len(pending)
+
+
+def _pyplot_render(jobs, values_by_job):
+    # Cách cũ của Bai2.py: mỗi ảnh một plt.figure() mới, plt.hist tự chia khoảng từ dữ liệu
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    for job, values in zip(jobs, values_by_job):
+        plt.figure(figsize=job.figsize)
+        plt.hist(values, bins=len(job.counts), color=job.color, edgecolor="black", alpha=job.alpha)
+        plt.title(job.title)
+        plt.xlabel(job.xlabel)
+        plt.ylabel(job.ylabel)
+        plt.grid(True, alpha=0.3)
+        plt.savefig(job.path, bbox_inches="tight")
+        plt.close()
+
+
+if __name__ == "__main__":
+    # Đo so sánh vẽ histogram: python histogram_renderer.py [số đội] [số thống kê]  (mặc định 20 đội x 6 thống kê)
+    n_teams = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    n_stats = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    rng = np.random.default_rng(0)
+    n_rows = n_teams * 28
+    values = rng.exponential(2.0, (n_rows, n_stats)).round(2)
+    codes = rng.integers(0, n_teams, n_rows)
+
+    start = time.perf_counter()
+    edges, counts = grouped_histograms(values, codes, n_teams, bins=10)
+    count_time = time.perf_counter() - start
+    same = all(np.array_equal(np.histogram(values[codes == g, j], 10)[0], counts[j, g]) and
+               np.array_equal(np.histogram(values[codes == g, j], 10)[1], edges[j, g])
+               for j in range(n_stats) for g in range(n_teams))
+    print(f"📊 {n_stats} thống kê x {n_teams} đội: đếm theo nhóm {count_time * 1000:.1f} ms, "
+          f"giống hệt np.histogram: {'có' if same else 'KHÔNG'}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs, values_by_job = [], []
+        for j in range(n_stats):
+            for g in range(n_teams):
+                jobs.append(HistogramJob(os.path.join(tmp_dir, f"{g}_{j}.png"), edges[j, g], counts[j, g],
+                                         f"Team {g} - Stat {j}", f"Stat {j}", "Số lượng cầu thủ",
+                                         "skyblue", 0.7, (8, 6)))
+                values_by_job.append(values[codes == g, j])
+        start = time.perf_counter()
+        _pyplot_render(jobs, values_by_job)
+        pyplot_time = time.perf_counter() - start
+
+        manifest_path = os.path.join(tmp_dir, HISTOGRAM_MANIFEST)
+        start = time.perf_counter()
+        rendered, _ = render_histograms(jobs, manifest_path, force=True)
+        render_time = time.perf_counter() - start
+        start = time.perf_counter()
+        _, skipped = render_histograms(jobs, manifest_path)
+        skip_time = time.perf_counter() - start
+        print(f"   {len(jobs)} ảnh: pyplot từng ảnh {pyplot_time:6.2f} s | Agg, dùng lại hình, "
+              f"{os.cpu_count()} tiến trình {render_time:6.2f} s ({rendered} ảnh) | "
+              f"không đổi {skip_time * 1000:6.1f} ms ({skipped} ảnh bỏ qua)")
@@ -0,0 +1,144 @@
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Header mặc định cho mọi yêu cầu HTTP
+# Accept-Encoding yêu cầu máy chủ nén gzip, requests sẽ tự giải nén
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Connection": "keep-alive",
+}
+
+
+class HttpFetcher:
+    """Tải HTML tĩnh qua một requests.Session dùng chung (connection pool, keep-alive, gzip).
+
+    Nếu truyền vào một PageCache, trang còn mới được đọc thẳng từ đĩa và trang đã cũ
+    được xác thực lại bằng yêu cầu có điều kiện (máy chủ trả 304 nếu không đổi).
+    """
+
+    def __init__(self, pool_size=8, timeout=30, retries=3, headers=None, cache=None):
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+
+        # Tự động thử lại khi gặp lỗi tạm thời hoặc bị giới hạn tốc độ (429), tôn trọng Retry-After
+        retry = Retry(
+            total=retries,
+            backoff_factor=1.0,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, headers=None):
+        """Gửi yêu cầu GET và trả về đối tượng Response (đã kiểm tra mã lỗi 4xx/5xx)."""
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    @staticmethod
+    def decode(response):
+        """Giải mã nội dung HTML; mặc định UTF-8 khi máy chủ không khai báo charset."""
+        if "charset" not in response.headers.get("Content-Type", "").lower():
+            response.encoding = "utf-8"
+        return response.text
+
+    def get_cached_page_source(self, url):
+        """Trả về HTML từ bộ nhớ đệm nếu dùng được ngay mà không cần mạng, ngược lại trả về None."""
+        if self.cache is None:
+            return None
+        entry = self.cache.lookup(url)
+        if entry is not None and (self.cache.offline or self.cache.is_fresh(entry)):
+            return self.cache.read(url, entry)
+        return None
+
+    def get_page_source(self, url):
+        """Trả về HTML của trang, tương đương driver.page_source của Selenium."""
+        if self.cache is None:
+            return self.decode(self.get(url))
+
+        cached = self.get_cached_page_source(url)
+        if cached is not None:
+            return cached
+        entry = self.cache.lookup(url)
+        if self.cache.offline:
+            raise LookupError(f"Chế độ offline: trang chưa có trong bộ nhớ đệm: {url}")
+
+        headers = self.cache.conditional_headers(entry) if entry is not None else None
+        response = self.get(url, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            # Nội dung không đổi kể từ lần tải trước
+            self.cache.mark_revalidated(url)
+            return self.cache.read(url, entry)
+
+        html = self.decode(response)
+        self.cache.store(url, html, etag=response.headers.get("ETag"),
+                         last_modified=response.headers.get("Last-Modified"))
+        return html
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.flush() # Ghi một lần các thời điểm truy cập / xác thực của cả lần chạy
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SeleniumFetcher:
+    """Phương án dự phòng: tải trang bằng Chrome headless khi trang cần chạy JavaScript."""
+
+    def __init__(self, wait_seconds=3):
+        # Chỉ import Selenium khi thực sự dùng tới để chế độ HTTP không phụ thuộc vào Chrome
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        options = Options()
+        options.add_argument("--headless") # Chạy trình duyệt ẩn
+        options.add_argument("--disable-gpu") # Vô hiệu hóa GPU
+        options.add_argument("--no-sandbox") # Vô hiệu hóa sandbox
+        options.add_argument("--disable-dev-shm-usage") # Không dùng /dev/shm làm bộ nhớ tạm
+        self.driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+        self.wait_seconds = wait_seconds
+
+    def get_page_source(self, url):
+        """Mở trang, đợi trang tải xong và trả về driver.page_source."""
+        self.driver.get(url)
+        time.sleep(self.wait_seconds) # Đợi trang tải xong
+        return self.driver.page_source
+
+    def close(self):
+        self.driver.quit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def create_fetcher(mode="http", **kwargs):
+    """Khởi tạo bộ tải trang theo chế độ: "http" (mặc định) hoặc "selenium" (dự phòng)."""
+    if mode == "http":
+        return HttpFetcher(**kwargs)
+    if mode == "selenium":
+        return SeleniumFetcher(**kwargs)
+    raise ValueError(f"Chế độ tải trang không hợp lệ: {mode}")
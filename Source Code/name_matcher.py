@@ -0,0 +1,365 @@
+import heapq
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+import pandas as pd
+from fuzzywuzzy import fuzz, process, utils
+from process_pool import pool_context
+
+# Tăng khi cách chuẩn hóa tên hoặc cách tính điểm thay đổi: kết quả so khớp đã lưu (player_identity.csv) được tính lại
+MATCHER_VERSION = 2
+
+def _bigrams(text):
+    return Counter(text[i:i + 2] for i in range(len(text) - 1))
+
+
+def _sort_tokens(text):
+    return " ".join(sorted(text.split())).strip()
+
+
+class NameMatcher:
+    """So khớp mờ tên cầu thủ với một danh sách tên cố định, cho kết quả giống hệt
+    process.extractOne(query, choices, scorer=fuzz.token_sort_ratio) khi chỉ quan tâm tới điểm >= score_cutoff.
+
+    Chỉ mục được xây một lần từ danh sách tên:
+    - bảng băm theo tên đã chuẩn hóa (chữ thường, bỏ ký tự đặc biệt, sắp xếp các từ) cho trường hợp khớp tuyệt đối;
+    - chỉ mục ngược theo cặp ký tự liên tiếp (bigram) và độ dài tên.
+    Điểm token_sort_ratio = round(200 * M / (la + lb)) với M <= độ dài dãy con chung dài nhất,
+    nên từ score_cutoff suy ra khoảng độ dài hợp lệ và số bigram chung tối thiểu (bổ đề q-gram);
+    chỉ các ứng viên vượt qua hai bộ lọc này mới được tính điểm đầy đủ. Khi nhiều tên cùng điểm cao nhất,
+    tên đứng trước trong danh sách được chọn như extractOne.
+    groups (tùy chọn, ví dụ tên đội) cho phép giới hạn mỗi truy vấn trong một nhóm.
+    """
+
+    def __init__(self, choices, groups=None):
+        self.choices = list(choices)
+        self.groups = list(groups) if groups is not None else None
+        self.keys = [self.choice_key(choice) if isinstance(choice, str) else "" for choice in self.choices]
+        self._lengths = np.array([len(key) for key in self.keys], dtype=np.int64)
+        self._exact = defaultdict(list)
+        postings = defaultdict(lambda: ([], []))
+        for index, key in enumerate(self.keys):
+            self._exact[key].append(index)
+            if not key:
+                continue # Tên rỗng chỉ đạt điểm (100) với truy vấn cũng rỗng, đã có trong bảng băm
+            for bigram, count in _bigrams(key).items():
+                postings[bigram][0].append(index)
+                postings[bigram][1].append(count)
+        self._postings = {bigram: (np.array(indices, dtype=np.int64), np.array(counts, dtype=np.int64))
+                          for bigram, (indices, counts) in postings.items()}
+        self._max_length = int(self._lengths.max()) if len(self.keys) else 0
+        self._thresholds = {}
+        if self.groups is not None:
+            self._group_codes, group_values = pd.factorize(pd.Series(self.groups, dtype=object))
+            self._group_index = {value: code for code, value in enumerate(group_values)}
+
+    @staticmethod
+    def query_key(query):
+        # extractOne xử lý truy vấn bằng full_process hai lần (lần sau với force_ascii=True)
+        return _sort_tokens(utils.full_process(utils.full_process(query), force_ascii=True))
+
+    @staticmethod
+    def choice_key(choice):
+        # ... nhưng mỗi lựa chọn chỉ một lần với force_ascii=True: dấu câu không phải ASCII (·, –) bị xóa
+        # thay vì thành khoảng trắng, ví dụ "Jean·Philippe" -> "jeanphilippe"
+        return _sort_tokens(utils.full_process(choice, force_ascii=True))
+
+    def _min_shared_bigrams(self, query_length, score_cutoff):
+        # Với mỗi độ dài ứng viên lb: số bigram chung tối thiểu để điểm có thể đạt score_cutoff
+        # (giá trị rất lớn nghĩa là độ dài này không bao giờ đạt ngưỡng)
+        cache_key = (query_length, score_cutoff)
+        if cache_key not in self._thresholds:
+            impossible = np.iinfo(np.int64).max
+            table = np.full(self._max_length + 1, impossible, dtype=np.int64)
+            for length in range(1, self._max_length + 1):
+                total = query_length + length
+                # Số ký tự khớp M nhỏ nhất sao cho round(200 * M / total) >= score_cutoff
+                min_matches = max(0, math.ceil((score_cutoff - 0.5) * total / 200) - 1)
+                while min_matches <= min(query_length, length) and utils.intr(200 * min_matches / total) < score_cutoff:
+                    min_matches += 1
+                if min_matches > min(query_length, length):
+                    continue
+                # Khoảng cách chèn/xóa <= total - 2M, khoảng cách sửa (Levenshtein) k không vượt quá nó;
+                # hai chuỗi cách nhau k phép sửa có chung ít nhất max(la, lb) - 1 - 2k bigram
+                max_edits = total - 2 * min_matches
+                table[length] = max(query_length, length) - 1 - 2 * max_edits
+            self._thresholds[cache_key] = table
+        return self._thresholds[cache_key]
+
+    def _candidates(self, query_key, score_cutoff, group):
+        table = self._min_shared_bigrams(len(query_key), score_cutoff)
+        shared = np.zeros(len(self.keys), dtype=np.int64)
+        for bigram, count in _bigrams(query_key).items():
+            posting = self._postings.get(bigram)
+            if posting is not None:
+                shared[posting[0]] += np.minimum(posting[1], count)
+        mask = (shared >= table[self._lengths]) & (self._lengths > 0)
+        if group is not None and self.groups is not None:
+            mask &= self._group_codes == self._group_index.get(group, -2)
+        return np.flatnonzero(mask)
+
+    def extract_one(self, query, score_cutoff, group=None):
+        """Trả về (tên khớp nhất, điểm, vị trí trong danh sách) nếu điểm >= score_cutoff, ngược lại None."""
+        if score_cutoff <= 0 or not self.keys:
+            # Không lọc được khi chấp nhận mọi điểm: dùng đúng extractOne
+            match = process.extractOne(query, self.choices, scorer=fuzz.token_sort_ratio, score_cutoff=score_cutoff)
+            return None if match is None else (match[0], match[1], self.choices.index(match[0]))
+        query_key = self.query_key(query)
+
+        # Khớp tuyệt đối: điểm 100 là cao nhất; khi tổng độ dài hai tên < 200 chỉ chuỗi giống hệt mới đạt 100,
+        # nên không có tên nào đứng trước đạt cùng điểm
+        exact = [index for index in self._exact.get(query_key, ())
+                 if group is None or self.groups is None or self.groups[index] == group]
+        if exact and self._max_length + len(query_key) < 200:
+            return self.choices[exact[0]], 100, exact[0]
+        if not query_key:
+            return None # Truy vấn rỗng có điểm 0 với mọi tên khác rỗng
+
+        best = None
+        for index in self._candidates(query_key, score_cutoff, group):
+            score = fuzz.ratio(query_key, self.keys[index])
+            if score >= score_cutoff and (best is None or score > best[1]):
+                best = (self.choices[index], score, int(index))
+        return best
+
+    def extract(self, query, score_cutoff=0, limit=5, group=None):
+        """Trả về tối đa limit bộ (tên, điểm, vị trí) có điểm >= score_cutoff, điểm giảm dần;
+        cùng điểm thì tên đứng trước trong danh sách xếp trước (giống process.extract)."""
+        query_key = self.query_key(query)
+        if score_cutoff <= 0:
+            indices = range(len(self.keys)) # Mọi tên đều có thể được chọn: chấm điểm tất cả
+        elif not query_key:
+            indices = self._exact.get("", []) # Truy vấn rỗng chỉ đạt điểm với tên cũng rỗng
+        else:
+            indices = self._candidates(query_key, score_cutoff, group)
+        scored = []
+        for index in indices:
+            if group is not None and self.groups is not None and self.groups[index] != group:
+                continue
+            score = fuzz.ratio(query_key, self.keys[index])
+            if score >= score_cutoff:
+                scored.append((score, int(index)))
+        best = heapq.nsmallest(limit, scored, key=lambda item: (-item[0], item[1]))
+        return [(self.choices[index], score, index) for score, index in best]
+
+
+# --- So khớp theo lô: hai danh sách tên, chia khối để bộ nhớ không phụ thuộc N x M ---
+
+# Số truy vấn trong một khối; với rapidfuzz, mỗi khối là một ma trận điểm chunk_size x len(choices)
+DEFAULT_CHUNK_SIZE = 256
+# Cách tính điểm của match_batch: fuzzywuzzy (mặc định, cùng kết quả với extractOne) hoặc rapidfuzz (tùy chọn)
+MATCH_BACKENDS = ["fuzzywuzzy", "rapidfuzz"]
+
+_worker_matcher = None
+
+
+def _import_rapidfuzz():
+    # rapidfuzz (C++, đa luồng) là phụ thuộc tùy chọn: không có thì dùng NameMatcher trong nhiều tiến trình
+    try:
+        from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+        return rf_fuzz, rf_process
+    except ImportError:
+        return None
+
+
+def _init_worker(choices):
+    global _worker_matcher
+    _worker_matcher = NameMatcher(choices)
+
+
+def _match_chunk(queries, score_cutoff, top_k):
+    return [_worker_matcher.extract(query, score_cutoff, top_k) for query in queries]
+
+
+def _top_k_rows(scores, choices, score_cutoff, top_k):
+    # Chọn top_k mỗi hàng bằng argpartition trên khóa (điểm, -vị trí): điểm cao trước, cùng điểm thì vị trí nhỏ trước
+    n_choices = scores.shape[1]
+    k = min(top_k, n_choices)
+    composite = scores.astype(np.int64) * n_choices + (n_choices - 1 - np.arange(n_choices))
+    top = np.argpartition(composite, n_choices - k, axis=1)[:, n_choices - k:]
+    order = np.argsort(-np.take_along_axis(composite, top, axis=1), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    return [[(choices[index], int(score), int(index)) for index, score in zip(row, row_scores) if score >= score_cutoff]
+            for row, row_scores in zip(top, top_scores)]
+
+
+def _match_rapidfuzz(queries, choices, score_cutoff, top_k, chunk_size, workers, rapidfuzz):
+    rf_fuzz, rf_process = rapidfuzz
+    # Cùng cách chuẩn hóa như NameMatcher, sau đó chỉ còn phép ratio trên chuỗi đã sắp xếp các từ
+    choice_keys = [NameMatcher.choice_key(choice) if isinstance(choice, str) else "" for choice in choices]
+    results = []
+    for start in range(0, len(queries), chunk_size):
+        query_keys = [NameMatcher.query_key(query) for query in queries[start:start + chunk_size]]
+        scores = rf_process.cdist(query_keys, choice_keys, scorer=rf_fuzz.ratio, dtype=np.uint8,
+                                  score_cutoff=max(score_cutoff, 0), workers=workers or -1)
+        results.extend(_top_k_rows(scores, choices, score_cutoff, top_k))
+    return results
+
+
+def match_batch(queries, choices, score_cutoff=0, top_k=1, chunk_size=DEFAULT_CHUNK_SIZE, workers=None,
+                backend="fuzzywuzzy"):
+    """So khớp mờ mọi tên trong queries với danh sách choices theo token_sort_ratio.
+
+    Trả về danh sách cùng thứ tự với queries; mỗi phần tử là danh sách tối đa top_k bộ (tên, điểm, vị trí)
+    có điểm >= score_cutoff, điểm giảm dần (rỗng nếu không có tên nào đạt ngưỡng).
+    Các truy vấn được xử lý theo khối chunk_size nên bộ nhớ tỉ lệ với chunk_size x len(choices), không phải N x M.
+    backend (MATCH_BACKENDS):
+    - "fuzzywuzzy" (mặc định): các khối được chia cho workers tiến trình, mỗi tiến trình dùng NameMatcher
+      (cùng kết quả với process.extract của fuzzywuzzy). Với spawn (Windows), script gọi hàm này phải
+      đặt mã chạy chính dưới if __name__ == "__main__": (xem process_pool.pool_context);
+    - "rapidfuzz" (phải chọn rõ): ma trận điểm của từng khối được tính bằng rapidfuzz.process.cdist
+      (C++, workers luồng). Điểm dựa trên khoảng cách Levenshtein, luôn >= điểm difflib.SequenceMatcher
+      của fuzzywuzzy, nên ở cùng ngưỡng có thể khớp thêm tên mà fuzzywuzzy không khớp.
+    """
+    if backend not in MATCH_BACKENDS:
+        raise ValueError(f"Cách tính điểm không hỗ trợ: {backend} (hỗ trợ: {', '.join(MATCH_BACKENDS)})")
+    queries = list(queries)
+    choices = list(choices)
+    if not queries or not choices:
+        return [[] for _ in queries]
+    if backend == "rapidfuzz":
+        rapidfuzz = _import_rapidfuzz()
+        if rapidfuzz is None:
+            raise ImportError("Chưa cài rapidfuzz (pip install rapidfuzz)")
+        return _match_rapidfuzz(queries, choices, score_cutoff, top_k, chunk_size, workers, rapidfuzz)
+
+    chunks = [queries[start:start + chunk_size] for start in range(0, len(queries), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        _init_worker(choices)
+        return [match for chunk in chunks for match in _match_chunk(chunk, score_cutoff, top_k)]
+    # Mỗi tiến trình xây chỉ mục một lần rồi nhận lần lượt các khối truy vấn
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(),
+                             initializer=_init_worker, initargs=(choices,)) as executor:
+        chunk_results = executor.map(_match_chunk, chunks, repeat(score_cutoff), repeat(top_k))
+        return [match for result in chunk_results for match in result]
+
+
+def _synthetic_names(n, rng):
+    syllables = ["ka", "lo", "mi", "ran", "de", "son", "vi", "an", "ber", "to", "ma", "ri", "el", "go", "ne", "sa",
+                 "tho", "mas", "jo", "ão", "ez", "ić", "ov", "sch", "mül", "ler", "ø", "gaard", "van", "dijk"]
+    first = ["Bukayo", "Virgil", "Martin", "Erling", "Son", "João", "Kai", "Mohamed", "Luis", "Bruno", "Alexis",
+             "Pedro", "Gabriel", "Diogo", "Ollie", "James", "Jack", "Lucas", "Thiago", "Marc", "Jordan", "Ben"]
+    names = []
+    for _ in range(n):
+        last = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).capitalize()
+        names.append(f"{rng.choice(first)} {last}")
+    return names
+
+
+def _perturb(name, rng):
+    # Biến thể hay gặp giữa hai nguồn: đảo thứ tự từ, sai/thiếu một ký tự, khác dấu
+    choice = rng.random()
+    if choice < 0.3:
+        return " ".join(reversed(name.split()))
+    if choice < 0.6 and len(name) > 4:
+        i = rng.randrange(1, len(name) - 1)
+        return name[:i] + name[i + 1:]
+    if choice < 0.8:
+        return name.replace("o", "ó", 1)
+    return name
+
+
+# Tên có dấu câu không phải ASCII: truy vấn và lựa chọn được chuẩn hóa khác nhau (query_key / choice_key)
+_PUNCTUATION_CHOICES = ["Jean·Philippe Mateta", "JeanPhilippe Mateta", "Pierre–Emile Højbjerg", "Pierre Emile Hojbjerg",
+                        "Martin Ødegaard", "Martin Odegaard", "Ørjan Nyland", "Jean-Philippe Gbamin"]
+_PUNCTUATION_QUERIES = ["JeanPhilippe Mateta", "Jean·Philippe Mateta", "Jean Philippe Mateta", "Pierre-Emile Hojbjerg",
+                        "PierreEmile Højbjerg", "Pierre–Emile Højbjerg", "Ødegaard Martin", "Orjan Nyland", "Jean–Philippe Gbamin"]
+
+
+def _brute_force(queries, choices, score_cutoff):
+    results = []
+    for query in queries:
+        match = process.extractOne(query, choices, scorer=fuzz.token_sort_ratio)
+        results.append(match[0] if match and match[1] >= score_cutoff else None)
+    return results
+
+
+def _benchmark_batch(sizes, rng, score_cutoff=85, top_k=3):
+    # So khớp theo lô: vòng lặp extract_one tuần tự, match_batch nhiều tiến trình và (nếu có) rapidfuzz
+    workers = os.cpu_count() or 1
+    backends = [backend for backend in MATCH_BACKENDS if backend != "rapidfuzz" or _import_rapidfuzz() is not None]
+    for backend in backends:
+        same = all(_brute_force(_PUNCTUATION_QUERIES, _PUNCTUATION_CHOICES, cutoff) ==
+                   [m[0][0] if m else None for m in match_batch(_PUNCTUATION_QUERIES, _PUNCTUATION_CHOICES, cutoff,
+                                                                workers=1, backend=backend)]
+                   for cutoff in (80, 85, 90))
+        print(f"🔤 match_batch ({backend}), tên có dấu câu không phải ASCII (·, –, Ø), ngưỡng 80 / 85 / 90: "
+              f"giống extractOne: {'có' if same else 'KHÔNG'}")
+    for size in sizes:
+        choices = _synthetic_names(size, rng)
+        queries = [_perturb(rng.choice(choices), rng) if rng.random() < 0.7 else name
+                   for name in _synthetic_names(size, rng)]
+        print(f"\n📊 Theo lô: {size:,} truy vấn x {size:,} tên, ngưỡng {score_cutoff}, top {top_k}, {workers} nhân")
+
+        start = time.perf_counter()
+        matcher = NameMatcher(choices)
+        sequential = [matcher.extract_one(query, score_cutoff) for query in queries]
+        sequential_time = time.perf_counter() - start
+        print(f"   extract_one tuần tự        : {sequential_time:8.2f} s")
+
+        start = time.perf_counter()
+        batch = match_batch(queries, choices, score_cutoff, top_k=top_k, workers=workers, backend="fuzzywuzzy")
+        batch_time = time.perf_counter() - start
+        same = [m[0] if m else None for m in batch] == [m for m in sequential]
+        sample = queries[:50]
+        expected = [[(c, sc) for c, sc in process.extract(q, choices, scorer=fuzz.token_sort_ratio, limit=top_k)
+                     if sc >= score_cutoff] for q in sample]
+        same_top_k = expected == [[(c, sc) for c, sc, _ in m] for m in batch[:len(sample)]]
+        print(f"   match_batch (fuzzywuzzy)   : {batch_time:8.2f} s | nhanh hơn {sequential_time / batch_time:5.1f} lần | "
+              f"top 1 giống extract_one: {'có' if same else 'KHÔNG'} | top {top_k} giống process.extract "
+              f"({len(sample)} truy vấn): {'có' if same_top_k else 'KHÔNG'}")
+
+        if _import_rapidfuzz() is not None:
+            start = time.perf_counter()
+            vectorized = match_batch(queries, choices, score_cutoff, top_k=top_k, workers=workers, backend="rapidfuzz")
+            vectorized_time = time.perf_counter() - start
+            agree = sum((a[0][0] if a else None) == (b[0][0] if b else None) for a, b in zip(vectorized, batch))
+            print(f"   match_batch (rapidfuzz)    : {vectorized_time:8.2f} s | nhanh hơn {sequential_time / vectorized_time:5.1f} lần | "
+                  f"ma trận mỗi khối {DEFAULT_CHUNK_SIZE * size / 1e6:.1f} MB | top 1 trùng difflib: {agree / size:.1%}")
+
+
+if __name__ == "__main__":
+    # Đo so sánh: python name_matcher.py [số tên ...]  (mặc định 500 và 50000; truy vấn x danh sách cùng kích thước)
+    # Với danh sách lớn, cách cũ chỉ chạy trên một mẫu truy vấn rồi ngoại suy thời gian cho toàn bộ
+    # So khớp theo lô: python name_matcher.py batch [số tên ...]  (mặc định 5000 và 50000)
+    rng = random.Random(0)
+    if sys.argv[1:2] == ["batch"]:
+        _benchmark_batch([int(arg) for arg in sys.argv[2:]] or [5_000, 50_000], rng)
+        sys.exit(0)
+    sizes = [int(arg) for arg in sys.argv[1:]] or [500, 50_000]
+    matcher = NameMatcher(_PUNCTUATION_CHOICES)
+    same = all(_brute_force(_PUNCTUATION_QUERIES, _PUNCTUATION_CHOICES, score_cutoff) ==
+               [match[0] if match else None for match in (matcher.extract_one(query, score_cutoff) for query in _PUNCTUATION_QUERIES)]
+               for score_cutoff in (80, 85, 90))
+    print(f"🔤 Tên có dấu câu không phải ASCII (·, –, Ø), ngưỡng 80 / 85 / 90: giống extractOne: {'có' if same else 'KHÔNG'}")
+    for size in sizes:
+        choices = _synthetic_names(size, rng)
+        queries = [_perturb(rng.choice(choices), rng) if rng.random() < 0.7 else name
+                   for name in _synthetic_names(size, rng)]
+        sample = queries if size <= 1_000 else queries[:100]
+
+        start = time.perf_counter()
+        matcher = NameMatcher(choices)
+        build_time = time.perf_counter() - start
+        print(f"\n📊 {size:,} truy vấn x {size:,} tên (xây chỉ mục {build_time * 1000:.0f} ms)")
+        for score_cutoff in (80, 85, 90):
+            start = time.perf_counter()
+            indexed = [matcher.extract_one(query, score_cutoff) for query in queries]
+            indexed_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            expected = _brute_force(sample, choices, score_cutoff)
+            brute_time = (time.perf_counter() - start) * len(queries) / len(sample)
+            same = expected == [match[0] if match else None for match in indexed[:len(sample)]]
+            estimate = "" if len(sample) == len(queries) else " (ngoại suy)"
+            print(f"   ngưỡng {score_cutoff}: extractOne {brute_time:9.2f} s{estimate} | chỉ mục {indexed_time:7.2f} s | "
+                  f"nhanh hơn {brute_time / indexed_time:7.1f} lần | khớp {sum(m is not None for m in indexed):,} | "
+                  f"giống hệt trên {len(sample)} truy vấn: {'có' if same else 'KHÔNG'}")
@@ -0,0 +1,160 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Cấu hình mặc định của bộ nhớ đệm trang
+DEFAULT_TTL = 3600 # Thời gian (giây) một trang được coi là còn mới, không cần hỏi lại máy chủ
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024 # Dung lượng tối đa (byte, sau nén) trước khi xóa bớt trang ít dùng nhất
+
+
+class PageCache:
+    """Bộ nhớ đệm HTML trên đĩa, tra cứu theo URL, nội dung lưu nén gzip và đặt tên theo mã băm SHA-256.
+
+    Mỗi URL ghi lại ETag và Last-Modified để gửi yêu cầu có điều kiện (If-None-Match / If-Modified-Since);
+    trang còn trong TTL được trả về ngay không cần mạng, trang quá TTL được xác thực lại và chỉ tải
+    lại khi máy chủ trả về nội dung mới. Khi tổng dung lượng vượt max_bytes, các URL truy cập lâu nhất
+    bị xóa trước (LRU). Các trang có nội dung giống hệt nhau dùng chung một tệp.
+    Thời điểm truy cập / xác thực chỉ được cập nhật trong bộ nhớ; chỉ mục được ghi khi lưu trang mới
+    (store) và khi flush() (bộ tải trang gọi lúc đóng).
+    """
+
+    def __init__(self, cache_dir, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, offline=False):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline # Chỉ đọc từ bộ nhớ đệm, không bao giờ truy cập mạng
+        self._lock = threading.Lock()
+        self._dirty = False # Chỉ mục trong bộ nhớ có thay đổi chưa ghi ra đĩa
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self):
+        # Ghi ra tệp tạm rồi đổi tên để chỉ mục không bị hỏng nếu chương trình dừng giữa chừng
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = False
+
+    def flush(self):
+        """Ghi chỉ mục ra đĩa nếu có thay đổi chưa ghi (thời điểm truy cập, xác thực lại)."""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest + ".html.gz")
+
+    def lookup(self, url):
+        """Trả về bản ghi của URL (dict) hoặc None nếu chưa có hoặc tệp nội dung đã mất."""
+        with self._lock:
+            entry = self._index.get(url)
+        if entry is None or not os.path.exists(self._object_path(entry["digest"])):
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry["fetched_at"] < self.ttl
+
+    def conditional_headers(self, entry):
+        """Header cho yêu cầu có điều kiện dựa trên ETag / Last-Modified đã lưu."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read(self, url, entry):
+        """Đọc nội dung HTML đã lưu và cập nhật thời điểm truy cập (phục vụ LRU)."""
+        with gzip.open(self._object_path(entry["digest"]), "rt", encoding="utf-8") as f:
+            html = f.read()
+        with self._lock:
+            if url in self._index:
+                self._index[url]["last_access"] = time.time()
+                self._dirty = True
+        return html
+
+    def mark_revalidated(self, url):
+        """Máy chủ trả về 304: nội dung không đổi, chỉ làm mới thời điểm xác thực."""
+        with self._lock:
+            if url in self._index:
+                now = time.time()
+                self._index[url]["fetched_at"] = now
+                self._index[url]["last_access"] = now
+                self._dirty = True
+
+    def store(self, url, html, etag=None, last_modified=None):
+        """Lưu nội dung mới của URL, sau đó xóa bớt trang cũ nếu vượt dung lượng tối đa."""
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            self._index[url] = {
+                "digest": digest,
+                "size": os.path.getsize(path),
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": now,
+                "last_access": now,
+            }
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        # Tính dung lượng theo tệp nội dung (các URL trùng nội dung chỉ tính một lần)
+        sizes = {entry["digest"]: entry["size"] for entry in self._index.values()}
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        for url, entry in sorted(self._index.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            del self._index[url]
+            digest = entry["digest"]
+            # Chỉ xóa tệp khi không còn URL nào dùng chung nội dung này
+            if all(other["digest"] != digest for other in self._index.values()):
+                total -= sizes[digest]
+                try:
+                    os.remove(self._object_path(digest))
+                except FileNotFoundError:
+                    pass
+
+
+def add_cache_arguments(parser, default_dir):
+    """Thêm các tham số dòng lệnh của bộ nhớ đệm trang vào argparse parser."""
+    parser.add_argument("--cache-dir", default=default_dir, help="Thư mục lưu bộ nhớ đệm các trang HTML")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL,
+                        help="Số giây một trang đã lưu được dùng lại mà không hỏi lại máy chủ")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Dung lượng tối đa của bộ nhớ đệm (MB), vượt quá sẽ xóa trang ít dùng nhất")
+    parser.add_argument("--offline", action="store_true",
+                        help="Chỉ dùng các trang đã lưu, không truy cập mạng (phục vụ phát triển mã phân tích)")
+    parser.add_argument("--no-cache", action="store_true", help="Tắt bộ nhớ đệm, luôn tải lại toàn bộ trang")
+
+
+def cache_from_args(args):
+    """Khởi tạo PageCache từ các tham số dòng lệnh (None nếu bộ nhớ đệm bị tắt)."""
+    if args.no_cache:
+        return None
+    return PageCache(args.cache_dir, ttl=args.cache_ttl,
+                     max_bytes=int(args.cache_max_mb * 1024 * 1024), offline=args.offline)
@@ -0,0 +1,181 @@
+import sys
+import numpy as np
+import pandas as pd
+from benchmark_utils import best_time
+
+# Các mẫu regex dùng cho phiên bản vector hóa
+AGE_YEARS_DAYS_PATTERN = r"^\+?(\d+)\s*-\s*\+?(\d+)$" # Định dạng "năm-ngày" của fbref, ví dụ "26-358"
+TWO_PART_NAME_PATTERN = r"^([^,]*?)\s*,\s*([^,]*)$" # Tên dạng "Họ, Tên" có đúng một dấu phẩy
+LAST_TOKEN_PATTERN = r"(\S+)\s*$" # Từ cuối cùng, ví dụ "ENG" trong "eng ENG"
+
+
+# --- Phiên bản xử lý từng giá trị (dùng làm chuẩn để đối chiếu) ---
+
+# Hàm chuyển đổi tuổi sang định dạng số thập phân
+def convert_age_to_decimal(age_str):
+    try:
+        if pd.isna(age_str) or age_str == "N/A":
+            return "N/A"
+        age_str = str(age_str).strip()
+        if "-" in age_str:
+            years, days = map(int, age_str.split("-"))
+            decimal_age = years + (days / 365)
+            return round(decimal_age, 2)
+        if "." in age_str:
+            return round(float(age_str), 2)
+        if age_str.isdigit():
+            return round(float(age_str), 2)
+        return "N/A"
+    except (ValueError, AttributeError) as e:
+        print(f"⚠️ Lỗi chuyển đổi tuổi cho '{age_str}': {e}")
+        return "N/A"
+
+# Hàm trích xuất mã quốc gia từ cột "Nation"
+def extract_country_code(nation_str):
+    try:
+        if pd.isna(nation_str) or nation_str == "N/A":
+            return "N/A"
+        return nation_str.split()[-1]
+    except (AttributeError, IndexError):
+        return "N/A"
+
+# Hàm làm sạch tên cầu thủ
+def clean_player_name(name):
+    try:
+        if pd.isna(name) or name == "N/A":
+            return "N/A"
+        if "," in name:
+            parts = [part.strip() for part in name.split(",")]
+            if len(parts) >= 2:
+                return " ".join(parts[::-1])
+        return " ".join(name.split()).strip()
+    except (AttributeError, TypeError):
+        return "N/A"
+
+
+# --- Phiên bản vector hóa cho cả cột ---
+# Mỗi cột được mã hóa bằng pd.factorize (băm ở tầng C), các phép regex / chuỗi chỉ chạy trên
+# các giá trị khác nhau rồi được trải lại cho toàn cột bằng chỉ số; tên cầu thủ, quốc tịch và tuổi
+# lặp lại rất nhiều giữa các bảng, các mùa và các giải nên số giá trị khác nhau nhỏ hơn nhiều so với số dòng.
+
+def _factorize(values):
+    # Trả về chỉ mục, mã của từng dòng (-1 cho NaN) và các giá trị khác nhau (chỉ giữ chuỗi, còn lại thành NaN)
+    values = pd.Series(values, dtype=object)
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    return values.index, codes, uniques.where(uniques.map(type) == str)
+
+
+def _expand(index, codes, unique_results, missing, dtype=object):
+    # Trải kết quả của các giá trị khác nhau về từng dòng; mã -1 (NaN) lấy giá trị missing ở cuối mảng
+    lookup = np.append(np.asarray(unique_results, dtype=dtype), np.array([missing], dtype=dtype))
+    return pd.Series(lookup[codes], index=index, dtype=dtype)
+
+
+def _convert_unique_ages(ages):
+    text = ages.str.strip()
+    result = pd.Series(np.nan, index=ages.index, dtype="float64")
+
+    # Định dạng "năm-ngày": số năm + số ngày / 365
+    years_days = text.str.extract(AGE_YEARS_DAYS_PATTERN).dropna()
+    years = years_days[0].astype("int64")
+    days = years_days[1].astype("int64")
+    result.loc[years_days.index] = (years + days / 365).round(2)
+
+    # Số nguyên thuần (ví dụ "26")
+    has_dash = text.str.contains("-", regex=False).fillna(False).astype(bool)
+    has_dot = text.str.contains(".", regex=False).fillna(False).astype(bool)
+    is_digit = ~has_dash & ~has_dot & text.str.isdigit().fillna(False).astype(bool)
+    result.loc[is_digit] = pd.to_numeric(text[is_digit], errors="coerce").round(2)
+
+    # Số thập phân (ví dụ "26.5") hiếm gặp nên làm tròn bằng round() của Python để khớp tuyệt đối
+    decimals = pd.to_numeric(text[~has_dash & has_dot], errors="coerce").dropna()
+    result.loc[decimals.index] = [round(value, 2) for value in decimals]
+    return result
+
+
+def convert_age_series(ages):
+    """Chuyển cả cột tuổi sang số thập phân (float64, NaN thay cho "N/A").
+
+    Kết quả giống pd.to_numeric(ages.apply(convert_age_to_decimal), errors="coerce").
+    Số (không phải chuỗi) được đọc qua str() như bản gốc.
+    """
+    ages = pd.Series(ages, dtype=object)
+    codes, uniques = pd.factorize(ages)
+    uniques = pd.Series(uniques, dtype=object).map(str) # Sau factorize không còn NaN
+    return _expand(ages.index, codes, _convert_unique_ages(uniques), np.nan, dtype="float64")
+
+
+def clean_player_name_series(names):
+    """Làm sạch cả cột tên cầu thủ, cùng kết quả với clean_player_name.
+
+    "Họ, Tên" được đảo thành "Tên Họ"; các tên khác được gộp khoảng trắng thừa.
+    Giá trị thiếu hoặc không phải chuỗi thành "N/A".
+    """
+    index, codes, uniques = _factorize(names)
+    has_comma = uniques.str.contains(",", regex=False).fillna(False).astype(bool)
+    result = uniques.str.replace(r"\s+", " ", regex=True).str.strip()
+
+    with_comma = uniques[has_comma].str.strip()
+    comma_count = with_comma.str.count(",")
+    # Trường hợp phổ biến: đúng một dấu phẩy, đảo hai phần bằng một phép thay thế regex
+    two_parts = with_comma[comma_count == 1].str.replace(TWO_PART_NAME_PATTERN, r"\2 \1", regex=True)
+    # Trường hợp nhiều dấu phẩy: tách, đảo thứ tự các phần rồi nối lại
+    many_parts = with_comma[comma_count > 1].str.split(r"\s*,\s*", regex=True).str[::-1].str.join(" ")
+    result.loc[two_parts.index] = two_parts
+    result.loc[many_parts.index] = many_parts
+    return _expand(index, codes, result.fillna("N/A"), "N/A")
+
+
+def extract_country_code_series(nations):
+    """Lấy mã quốc gia (từ cuối cùng, ví dụ "ENG" trong "eng ENG") cho cả cột, cùng kết quả với extract_country_code."""
+    index, codes, uniques = _factorize(nations)
+    return _expand(index, codes, uniques.str.extract(LAST_TOKEN_PATTERN)[0].fillna("N/A"), "N/A")
+
+
+# --- Đo so sánh trên dữ liệu tổng hợp ---
+
+def _synthetic_frame(n_rows, seed=0):
+    # Mỗi cầu thủ xuất hiện trung bình 10 lần (nhiều bảng thống kê, nhiều mùa) như dữ liệu thật sau khi gộp
+    rng = np.random.default_rng(seed)
+    n_players = max(1, n_rows // 10)
+    first = np.array(["Bukayo", "Virgil", "Martin", "Erling", "Son", "João", "Kai", "Mohamed"])
+    last = np.array(["Saka", "van Dijk", "Ødegaard", "Haaland", "Heung-min", "Pedro", "Havertz", "Salah"])
+    codes = np.array(["eng ENG", "nl NED", "no NOR", "kr KOR", "br BRA", "de GER", "eg EGY", "", "N/A"])
+    ids = np.arange(n_players).astype(str)
+    f = np.char.add(first[rng.integers(0, len(first), n_players)], ids)
+    l = last[rng.integers(0, len(last), n_players)]
+    style = rng.integers(0, 4, n_players)
+    names = np.where(style == 0, np.char.add(np.char.add(l, ", "), f),
+                     np.where(style == 1, np.char.add(np.char.add(f, "  "), l), np.char.add(np.char.add(f, " "), l)))
+    names = names.astype(object)
+    names[style == 3] = np.nan
+    ages = np.char.add(np.char.add(rng.integers(16, 41, n_players).astype(str), "-"),
+                       rng.integers(0, 365, n_players).astype(str)).astype(object)
+    odd = rng.random(n_players)
+    ages[odd < 0.01] = "N/A"
+    ages[(odd >= 0.01) & (odd < 0.02)] = "27.5"
+    ages[(odd >= 0.02) & (odd < 0.03)] = "31"
+    nations = codes[rng.integers(0, len(codes), n_players)].astype(object)
+    rows = rng.integers(0, n_players, n_rows)
+    return pd.DataFrame({"Player": names[rows], "Age": ages[rows], "Nation": nations[rows]})
+
+
+if __name__ == "__main__":
+    # python player_cleaning.py [số dòng ...]  (mặc định 1k, 10k, 100k, 1M dòng)
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000, 1_000_000]
+    kernels = [
+        ("Age", lambda s: pd.to_numeric(s.apply(convert_age_to_decimal), errors="coerce"), convert_age_series),
+        ("Player", lambda s: s.apply(clean_player_name), clean_player_name_series),
+        ("Nation", lambda s: s.apply(extract_country_code), extract_country_code_series),
+    ]
+    for n_rows in sizes:
+        df = _synthetic_frame(n_rows)
+        repeat = 3 if n_rows <= 100_000 else 1
+        print(f"\n📊 {n_rows:,} dòng ({df['Player'].nunique():,} cầu thủ khác nhau)")
+        for column, row_func, vector_func in kernels:
+            expected, row_time = best_time(row_func, df[column], repeat=repeat)
+            actual, vector_time = best_time(vector_func, df[column], repeat=repeat)
+            same = expected.equals(actual) if column == "Age" else expected.astype(object).equals(actual.astype(object))
+            print(f"   {column:<7} .apply: {row_time * 1000:9.1f} ms | vector hóa: {vector_time * 1000:9.1f} ms | "
+                  f"nhanh hơn {row_time / vector_time:5.1f} lần | giống hệt: {'có' if same else 'KHÔNG'}")
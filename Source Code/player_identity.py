@@ -0,0 +1,141 @@
+import hashlib
+import os
+import threading
+import pandas as pd
+from name_matcher import MATCH_BACKENDS, MATCHER_VERSION, match_batch
+
+# Các cột của bảng định danh cầu thủ (player_identity.csv)
+# - source: nguồn dữ liệu của tên, ví dụ "footballtransfers_players"
+# - source_name: tên cầu thủ đúng như trong nguồn đó
+# - canonical_name: tên chuẩn tương ứng (tên trong danh sách tham chiếu, thường là cột Player của result.csv)
+# - score: điểm so khớp (0-100), method: cách xác định (manual / fuzzy / unmatched)
+# - reference: dấu vân tay của danh sách tham chiếu, ngưỡng, cách tính điểm và phiên bản bộ so khớp lúc so khớp
+#   (trống với dòng manual)
+IDENTITY_COLUMNS = ["source", "source_name", "canonical_name", "score", "method", "reference"]
+
+METHOD_MANUAL = "manual" # Nhập tay, luôn được ưu tiên và không bao giờ bị ghi đè
+METHOD_FUZZY = "fuzzy" # Kết quả so khớp mờ đạt ngưỡng
+METHOD_UNMATCHED = "unmatched" # Đã so khớp nhưng không có tên nào đạt ngưỡng
+
+
+def reference_digest(prepared_choices, score_cutoff, backend=MATCH_BACKENDS[0]):
+    """Dấu vân tay của danh sách tên tham chiếu (đã chuẩn bị để so khớp), ngưỡng điểm, cách tính điểm
+    (backend của match_batch: hai cách có thể cho kết quả khác nhau ở cùng ngưỡng) và phiên bản bộ so khớp
+    (MATCHER_VERSION: dòng được so khớp với cách chuẩn hóa cũ sẽ được tính lại)."""
+    digest = hashlib.sha1(f"{score_cutoff}\0{backend}\0{MATCHER_VERSION}".encode("utf-8"))
+    for choice in prepared_choices:
+        digest.update(b"\0" + choice.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class IdentityTable:
+    """Bảng định danh cầu thủ trên đĩa: (nguồn, tên trong nguồn) -> tên chuẩn, kèm điểm và cách so khớp.
+
+    resolve() tra bảng trước và chỉ so khớp mờ các tên chưa gặp; kết quả được ghi lại bằng save()
+    nên các lần chạy sau gần như không phải so khớp lại. Dòng fuzzy / unmatched chỉ được dùng lại khi
+    danh sách tham chiếu, ngưỡng, cách tính điểm và phiên bản bộ so khớp không đổi (cột reference), nên kết quả
+    luôn giống như so khớp lại từ đầu.
+    Dòng manual thay cho các trường hợp đặc biệt trước đây được viết cứng trong mã: sửa một cặp tên
+    chỉ cần thêm một dòng vào tệp CSV.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            df = pd.read_csv(self.path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+        except FileNotFoundError:
+            return
+        for column in IDENTITY_COLUMNS:
+            if column not in df.columns:
+                df[column] = ""
+        for row in df[IDENTITY_COLUMNS].to_dict("records"):
+            row["score"] = int(float(row["score"])) if row["score"] else None
+            self._entries[(row["source"], row["source_name"])] = row
+
+    def lookup(self, source, source_name):
+        with self._lock:
+            return self._entries.get((source, source_name))
+
+    def record(self, source, source_name, canonical_name, score, method, reference=""):
+        entry = {"source": source, "source_name": source_name, "canonical_name": canonical_name or "",
+                 "score": score, "method": method, "reference": reference}
+        with self._lock:
+            current = self._entries.get((source, source_name))
+            if current is not None and current["method"] == METHOD_MANUAL:
+                return # Không ghi đè dòng nhập tay
+            self._entries[(source, source_name)] = entry
+            self._dirty = True
+
+    def _cached(self, entry, canonical_set, reference):
+        # Trả về (tên chuẩn, điểm) nếu dòng còn dùng được, ngược lại None (cần so khớp lại)
+        if entry is None:
+            return None
+        if entry["method"] == METHOD_MANUAL:
+            # Tên chuẩn không có trong danh sách hiện tại (ví dụ bị lọc theo số phút) thì coi như không khớp
+            if entry["canonical_name"] in canonical_set:
+                return entry["canonical_name"], entry["score"] if entry["score"] is not None else 100
+            return None, None
+        if entry["reference"] != reference:
+            return None
+        if entry["method"] == METHOD_FUZZY:
+            return entry["canonical_name"], entry["score"]
+        return None, None
+
+    def resolve(self, source, names, canonical_names, score_cutoff, prepare=None, **match_kwargs):
+        """Tìm tên chuẩn cho từng tên trong names (đến từ nguồn source).
+
+        canonical_names là danh sách tên chuẩn để so khớp; prepare (tùy chọn) biến đổi tên trước khi so khớp mờ
+        (ví dụ shorten_name) và được áp dụng cho cả hai phía. Tên chưa có trong bảng được so khớp theo lô bằng
+        match_batch (match_kwargs: workers, backend, chunk_size). Trả về danh sách (tên chuẩn, điểm) cùng thứ tự
+        với names, (None, None) nếu không khớp hoặc tên không phải chuỗi.
+        """
+        prepare = prepare or (lambda name: name)
+        names = list(names)
+        canonical_names = list(canonical_names)
+        prepared_choices = [prepare(name) for name in canonical_names]
+        reference = reference_digest(prepared_choices, score_cutoff, match_kwargs.get("backend", MATCH_BACKENDS[0]))
+        canonical_set = set(canonical_names)
+
+        resolved = {}
+        unseen = []
+        for name in dict.fromkeys(name for name in names if isinstance(name, str)):
+            cached = self._cached(self.lookup(source, name), canonical_set, reference)
+            if cached is None:
+                unseen.append(name)
+            else:
+                resolved[name] = cached
+
+        if unseen:
+            matches = match_batch([prepare(name) for name in unseen], prepared_choices,
+                                  score_cutoff=score_cutoff, **match_kwargs)
+            for name, match in zip(unseen, matches):
+                if match:
+                    _, score, index = match[0]
+                    resolved[name] = (canonical_names[index], score)
+                    self.record(source, name, canonical_names[index], score, METHOD_FUZZY, reference)
+                else:
+                    resolved[name] = (None, None)
+                    self.record(source, name, None, None, METHOD_UNMATCHED, reference)
+        print(f"🔎 {source}: {len(resolved) - len(unseen)} tên lấy từ bảng định danh, {len(unseen)} tên so khớp mờ.")
+        return [resolved.get(name, (None, None)) if isinstance(name, str) else (None, None) for name in names]
+
+    def save(self):
+        """Ghi bảng ra CSV (ghi tệp tạm rồi đổi tên); không làm gì nếu không có thay đổi."""
+        with self._lock:
+            if not self._dirty:
+                return
+            rows = sorted(self._entries.values(), key=lambda row: (row["source"], row["source_name"]))
+            self._dirty = False
+        df = pd.DataFrame(rows, columns=IDENTITY_COLUMNS)
+        df["score"] = df["score"].astype("Int64")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        df.to_csv(tmp_path, index=False, encoding="utf-8-sig")
+        os.replace(tmp_path, self.path)
+        print(f"✅ Đã lưu bảng định danh cầu thủ vào {self.path} ({len(df)} dòng).")
@@ -0,0 +1,231 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from player_store import load_players
+from benchmark_utils import synthetic_players
+
+# Tệp bảng phân vị nằm cạnh result.csv (csv/result.csv -> csv/percentiles.npz)
+PERCENTILE_FILE = "percentiles.npz"
+# Tăng khi thay đổi cách tính hoặc định dạng tệp để bảng cũ được tính lại
+PERCENTILE_VERSION = 1
+# Chỉ cầu thủ đá ít nhất chừng này phút mới được xếp hạng (10 trận trọn vẹn)
+DEFAULT_MIN_MINUTES = 900
+NON_STAT_COLUMNS = ["Player", "Nation", "Team", "Position"]
+# Tên các cột của bảng hồ sơ trả về bởi PercentileTable.profile
+PROFILE_COLUMNS = ["Giá trị", "Phân vị toàn giải", "Phân vị theo vị trí"]
+
+
+def percentile_path_for(csv_path):
+    """Đường dẫn bảng phân vị đi kèm tệp kết quả, ví dụ csv/result.csv -> csv/percentiles.npz."""
+    return os.path.join(os.path.dirname(csv_path), PERCENTILE_FILE)
+
+
+def primary_position(positions):
+    # Vị trí chính là vị trí đầu tiên ("MF,FW" -> "MF") để mỗi cầu thủ thuộc đúng một nhóm so sánh
+    return positions.astype("string").str.split(",").str[0].str.strip()
+
+
+def percentile_ranks(values, codes):
+    """Phân vị (0, 100] của từng giá trị trong nhóm của nó, cho mọi cột và mọi cách chia nhóm.
+
+    values có dạng (n, m), NaN là không xếp hạng; codes là danh sách mảng mã nhóm (n,) - mỗi mảng là một
+    cách chia nhóm (ví dụ toàn giải: toàn 0, theo vị trí: mã vị trí), -1 là không xếp hạng. Trả về danh sách
+    mảng (n, m) tương ứng, giống rank(method="average", pct=True) * 100 của pandas trong từng nhóm.
+
+    Mỗi cột chỉ được sắp xếp theo giá trị một lần cho mọi cách chia nhóm; mỗi cách chia nhóm chỉ thêm một lần
+    sắp xếp ổn định theo mã nhóm (số nguyên nhỏ nên numpy dùng radix sort) trên thứ tự đó.
+    """
+    # Ma trận (cột x dòng): mỗi cột liền kề trong bộ nhớ nên sắp xếp và quét theo cột nhanh hơn
+    values = np.ascontiguousarray(np.asarray(values, dtype="float64").T)
+    n_columns, n_rows = values.shape
+    index = np.arange(n_rows)
+    # Thứ tự giữa các giá trị bằng nhau không quan trọng vì chúng nhận cùng hạng trung bình
+    value_order = np.argsort(values, axis=1)
+    nan_sorted = np.isnan(np.take_along_axis(values, value_order, axis=1))
+
+    results = []
+    for group_codes in codes:
+        group_codes = np.asarray(group_codes)
+        n_groups = int(group_codes.max(initial=-1)) + 1
+        code_type = np.uint8 if n_groups < 255 else np.int32
+        # Mã nhóm theo thứ tự giá trị; ô không xếp hạng (NaN hoặc thiếu nhóm) dùng mã n_groups nên nằm cuối
+        sorted_codes = np.where(group_codes < 0, n_groups, group_codes).astype(code_type)[value_order]
+        sorted_codes[nan_sorted] = n_groups
+        if np.all(sorted_codes[:, 1:] >= sorted_codes[:, :-1]):
+            # Đã theo thứ tự nhóm (ví dụ toàn giải: chỉ có các ô NaN ở cuối), không cần sắp xếp lại
+            order = value_order
+        else:
+            group_order = np.argsort(sorted_codes, axis=1, kind="stable")
+            order = np.take_along_axis(value_order, group_order, axis=1)
+            sorted_codes = np.take_along_axis(sorted_codes, group_order, axis=1)
+        sorted_values = np.take_along_axis(values, order, axis=1)
+        sorted_codes = sorted_codes.astype(np.intp)
+
+        # Số ô và vị trí bắt đầu của từng nhóm trong từng cột
+        sizes = np.bincount((np.arange(n_columns)[:, None] * (n_groups + 1) + sorted_codes).ravel(),
+                            minlength=n_columns * (n_groups + 1)).reshape(n_columns, n_groups + 1)
+        group_start = np.take_along_axis(np.cumsum(sizes, axis=1) - sizes, sorted_codes, axis=1)
+        group_size = np.take_along_axis(sizes, sorted_codes, axis=1)
+
+        # Đầu và cuối của mỗi đoạn giá trị bằng nhau trong cùng nhóm
+        boundary = np.ones((n_columns, n_rows), dtype=bool)
+        boundary[:, 1:] = (sorted_codes[:, 1:] != sorted_codes[:, :-1]) | (sorted_values[:, 1:] != sorted_values[:, :-1])
+        tie_start = np.maximum.accumulate(np.where(boundary, index, 0), axis=1)
+        last = np.ones((n_columns, n_rows), dtype=bool)
+        last[:, :-1] = boundary[:, 1:]
+        tie_end = np.minimum.accumulate(np.where(last, index, n_rows)[:, ::-1], axis=1)[:, ::-1]
+
+        # Hạng trung bình (tính từ đầu nhóm) chia cho số cầu thủ được xếp hạng trong nhóm
+        ranks = ((tie_start + tie_end) / 2 - group_start + 1) / group_size * 100
+        ranks[sorted_codes == n_groups] = np.nan
+        result = np.empty((n_columns, n_rows))
+        np.put_along_axis(result, order, ranks, axis=1)
+        results.append(result.T)
+    return results
+
+
+class PercentileTable:
+    """Bảng phân vị của mọi cầu thủ cho mọi cột số: toàn giải và trong nhóm vị trí chính.
+
+    Dữ liệu là các mảng (cầu thủ x cột) float32; chỉ mục tên cầu thủ -> dòng được tạo một lần nên tra hồ sơ
+    của một cầu thủ là O(1) (không lọc hay xếp hạng lại). Cầu thủ đá dưới min_minutes phút vẫn có giá trị
+    nhưng không được xếp hạng (phân vị NaN) và không được tính vào nhóm so sánh của người khác.
+    """
+
+    def __init__(self, players, teams, positions, columns, values, league, position, eligible, min_minutes):
+        self.players = np.asarray(players, dtype=object)
+        self.teams = np.asarray(teams, dtype=object)
+        self.positions = np.asarray(positions, dtype=object)
+        self.columns = list(columns)
+        self.values = values
+        self.league = league
+        self.position = position
+        self.eligible = eligible
+        self.min_minutes = min_minutes
+        self._rows = {}
+        for row, player in enumerate(self.players):
+            self._rows.setdefault(player, []).append(row)
+
+    def __len__(self):
+        return len(self.players)
+
+    def rows(self, player):
+        """Các dòng của cầu thủ (một cầu thủ có thể có nhiều dòng nếu đã chuyển đội), rỗng nếu không có."""
+        return self._rows.get(player, [])
+
+    def profile(self, player, team=None):
+        """Hồ sơ phân vị của một cầu thủ: DataFrame chỉ mục là các cột số, các cột theo PROFILE_COLUMNS.
+
+        Nếu tên cầu thủ có ở nhiều đội thì phải chỉ rõ team.
+        """
+        rows = [row for row in self.rows(player) if team is None or self.teams[row] == team]
+        if not rows:
+            raise KeyError(f"Không có cầu thủ {player}" + (f" ở đội {team}" if team is not None else ""))
+        if len(rows) > 1:
+            teams = ", ".join(str(self.teams[row]) for row in rows)
+            raise ValueError(f"Cầu thủ {player} có ở nhiều đội ({teams}), hãy chỉ rõ team")
+        row = rows[0]
+        return pd.DataFrame({
+            PROFILE_COLUMNS[0]: self.values[row],
+            PROFILE_COLUMNS[1]: self.league[row],
+            PROFILE_COLUMNS[2]: self.position[row],
+        }, index=pd.Index(self.columns, name=f"{player} ({self.teams[row]}, {self.positions[row]})"))
+
+    def save(self, path):
+        # Ghi ra tệp tạm rồi đổi tên; tên tệp tạm phải kết thúc bằng .npz để np.savez không thêm đuôi
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, version=PERCENTILE_VERSION, min_minutes=self.min_minutes,
+                 players=self.players.astype(str), teams=self.teams.astype(str),
+                 positions=self.positions.astype(str), columns=np.array(self.columns, dtype=str),
+                 values=self.values, league=self.league, position=self.position, eligible=self.eligible)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Đọc bảng đã lưu; trả về None nếu tệp được tạo bởi phiên bản khác."""
+        with np.load(path) as data:
+            if int(data["version"]) != PERCENTILE_VERSION:
+                return None
+            return cls(data["players"], data["teams"], data["positions"], data["columns"], data["values"],
+                       data["league"], data["position"], data["eligible"], int(data["min_minutes"]))
+
+
+def build_percentiles(df, columns=None, min_minutes=DEFAULT_MIN_MINUTES):
+    """Tính PercentileTable từ bảng cầu thủ của Bai1.py (mặc định mọi cột trừ Player, Nation, Team, Position).
+
+    Giá trị thiếu (N/A, ví dụ chỉ số thủ môn của cầu thủ đá ngoài) không được xếp hạng.
+    """
+    if columns is None:
+        columns = [col for col in df.columns if col not in NON_STAT_COLUMNS]
+    values = df[columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    eligible = (pd.to_numeric(df["Minutes"], errors="coerce") >= min_minutes).to_numpy()
+    positions = primary_position(df["Position"])
+    position_codes, _ = pd.factorize(positions)
+    ranked = np.where(eligible[:, None], values, np.nan)
+    league, position = percentile_ranks(ranked, [np.zeros(len(df), dtype=np.int64), position_codes])
+    return PercentileTable(df["Player"].to_numpy(dtype=object), df["Team"].to_numpy(dtype=object),
+                           positions.fillna("").to_numpy(dtype=object), columns, values.astype("float32"),
+                           league.astype("float32"), position.astype("float32"), eligible, min_minutes)
+
+
+def save_percentiles(df, csv_path, min_minutes=DEFAULT_MIN_MINUTES):
+    """Tính và ghi bảng phân vị cạnh tệp kết quả csv_path (bước chạy ngay sau khi Bai1.py lưu result.csv)."""
+    table = build_percentiles(df, min_minutes=min_minutes)
+    path = percentile_path_for(csv_path)
+    table.save(path)
+    print(f"✅ Đã lưu bảng phân vị vào {path} ({len(table)} cầu thủ x {len(table.columns)} cột, "
+          f"{int(table.eligible.sum())} cầu thủ đá từ {min_minutes} phút được xếp hạng).")
+    return table
+
+
+def load_percentiles(csv_path, min_minutes=DEFAULT_MIN_MINUTES):
+    """Bảng phân vị của tệp kết quả csv_path: đọc tệp đã lưu nếu không cũ hơn dữ liệu và cùng ngưỡng phút,
+    ngược lại tính lại từ result.csv (qua player_store.load_players) và ghi đè."""
+    path = percentile_path_for(csv_path)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(csv_path):
+        table = PercentileTable.load(path)
+        if table is not None and table.min_minutes == min_minutes:
+            return table
+    return save_percentiles(load_players(csv_path), csv_path, min_minutes=min_minutes)
+
+
+def _pandas_percentiles(df, columns, min_minutes):
+    # Cách làm thủ công hiện nay: rank của pandas trên các cầu thủ đủ số phút, toàn giải và theo vị trí chính
+    eligible = df[df["Minutes"] >= min_minutes]
+    league = eligible[columns].rank(pct=True) * 100
+    position = eligible[columns].groupby(primary_position(eligible["Position"])).rank(pct=True) * 100
+    return league.reindex(df.index), position.reindex(df.index)
+
+
+if __name__ == "__main__":
+    # Đo so sánh: python player_percentiles.py [số dòng]  (mặc định 100k cầu thủ x 75 cột)
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = synthetic_players(n_rows, decimals=1, nan_rate=0.05)
+    stats = [col for col in df.columns if col.startswith("Stat ")]
+
+    start = time.perf_counter()
+    expected_league, expected_position = _pandas_percentiles(df, stats, DEFAULT_MIN_MINUTES)
+    pandas_time = time.perf_counter() - start
+    start = time.perf_counter()
+    table = build_percentiles(df, stats)
+    build_time = time.perf_counter() - start
+    same = all(np.allclose(expected.to_numpy(), actual, equal_nan=True, rtol=1e-6)
+               for expected, actual in [(expected_league, table.league), (expected_position, table.position)])
+    print(f"📊 {n_rows:,} cầu thủ x {len(stats)} cột: rank của pandas (toàn giải + theo vị trí) {pandas_time * 1000:8.1f} ms | "
+          f"bảng phân vị {build_time * 1000:8.1f} ms | giống pandas: {'có' if same else 'KHÔNG'}")
+
+    players = df["Player"].sample(1000, random_state=0).tolist()
+    start = time.perf_counter()
+    for player in players:
+        table.profile(player)
+    lookup_time = (time.perf_counter() - start) / len(players)
+    start = time.perf_counter()
+    for player in players[:20]:
+        row = df[df["Player"] == player]
+        df[df["Position"] == row["Position"].iloc[0]][stats].rank(pct=True)
+    scan_time = (time.perf_counter() - start) / 20
+    size = sum(array.nbytes for array in [table.values, table.league, table.position])
+    print(f"   Tra hồ sơ một cầu thủ: bảng phân vị {lookup_time * 1e6:8.1f} µs | lọc và rank mỗi lần "
+          f"{scan_time * 1e6:10.1f} µs | mảng số {size / 1e6:.1f} MB")
@@ -0,0 +1,222 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from player_store import FILTER_OPERATORS, load_players
+from crawl_jobs import COMPETITIONS
+from benchmark_utils import synthetic_players
+
+# Cột phân loại có chỉ mục mã (mỗi giá trị -> danh sách dòng); Competition / Season chỉ có khi đọc nhiều mùa
+CATEGORY_INDEX_COLUMNS = ["Team", "Position", "Nation", "Competition", "Season"]
+# Cột số mặc định có chỉ mục sắp xếp (truy vấn khoảng bằng tìm kiếm nhị phân)
+DEFAULT_SORTED_COLUMNS = ["Minutes", "Age"]
+
+
+def load_seasons(csv_dir, columns=None, compact=False):
+    """Đọc mọi csv/<giải>/<mùa>/result.csv do chế độ nhiều giải / nhiều mùa của Bai1.py tạo ra thành một bảng,
+    thêm hai cột Competition và Season; nếu không có thì đọc csv/result.csv (một mùa, không có hai cột này).
+
+    compact=True: mỗi mùa được đọc với kiểu gọn (player_store.compact_players); các cột categorical của mọi mùa
+    cùng Competition và Season dùng chung một từ điển.
+    """
+    frames = []
+    for competition in COMPETITIONS.values():
+        competition_dir = os.path.join(csv_dir, competition)
+        if not os.path.isdir(competition_dir):
+            continue
+        for season in sorted(os.listdir(competition_dir)):
+            result_path = os.path.join(competition_dir, season, "result.csv")
+            if os.path.exists(result_path):
+                frame = load_players(result_path, columns=columns, compact=compact)
+                frames.append(frame.assign(Competition=competition, Season=season))
+    if not frames:
+        return load_players(os.path.join(csv_dir, "result.csv"), columns=columns, compact=compact)
+    if compact:
+        # Gộp từ điển của từng mùa thành một từ điển chung để pd.concat giữ nguyên kiểu categorical;
+        # các cột số có kiểu khác nhau giữa các mùa (int8 / int16...) được pd.concat nâng lên kiểu rộng hơn
+        # (một cột là categorical ở mùa này nhưng vẫn là chuỗi ở mùa khác cũng được đổi ở mọi mùa)
+        category_columns = [col for col in frames[0].columns if col in ("Competition", "Season") or (
+            any(isinstance(frame[col].dtype, pd.CategoricalDtype) for frame in frames) and
+            all(isinstance(frame[col].dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(frame[col].dtype)
+                for frame in frames))]
+        dictionary = set()
+        for frame in frames:
+            for col in category_columns:
+                dictionary.update(frame[col].dropna().unique())
+        shared = pd.CategoricalDtype(sorted(dictionary))
+        for frame in frames:
+            for col in category_columns:
+                frame[col] = frame[col].astype(object).astype(shared)
+    return pd.concat(frames, ignore_index=True)
+
+
+class PlayerQuery:
+    """Bảng cầu thủ nằm sẵn trong bộ nhớ cùng các chỉ mục để trả lời bộ lọc mà không quét toàn bảng.
+
+    - Cột phân loại (CATEGORY_INDEX_COLUMNS có trong bảng): mã pd.factorize và các dòng của từng giá trị
+      (xếp theo nhóm, liên tiếp), lấy ra bằng một lát cắt.
+    - Cột số trong sorted_columns: thứ tự dòng theo giá trị; điều kiện so sánh là một khoảng tìm bằng searchsorted.
+
+    query(filters, columns) nhận cùng bộ lọc (cột, phép so sánh, giá trị) như player_store.load_players.
+    Ước lượng số dòng của mỗi điều kiện có chỉ mục (độ dài lát cắt, không tốn bộ nhớ); điều kiện chọn lọc nhất
+    cho danh sách dòng ứng viên, các điều kiện còn lại chỉ được kiểm tra trên các ứng viên đó (giao các chỉ mục).
+    """
+
+    def __init__(self, df, sorted_columns=DEFAULT_SORTED_COLUMNS):
+        self.df = df.reset_index(drop=True)
+        self._codes = {}
+        self._labels = {}
+        self._postings = {}
+        for col in CATEGORY_INDEX_COLUMNS:
+            if col not in self.df.columns:
+                continue
+            codes, labels = pd.factorize(self.df[col])
+            order = np.argsort(codes, kind="stable")
+            starts = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+            self._codes[col] = codes
+            self._labels[col] = {label: i for i, label in enumerate(labels)}
+            self._postings[col] = (order, starts)
+        self._values = {}
+        self._sorted = {}
+        for col in sorted_columns:
+            if col not in self.df.columns:
+                continue
+            values = pd.to_numeric(self.df[col], errors="coerce")
+            # Cột float16 / float32 của bảng gọn giữ nguyên kiểu: giá trị so sánh được đổi sang cùng kiểu
+            # như khi numpy so sánh trực tiếp trên cột, ví dụ > 0.49999 trên cột float16 là > 0.5
+            dtype = values.dtype if values.dtype in (np.float16, np.float32) else np.dtype("float64")
+            values = values.to_numpy(dtype=dtype, na_value=np.nan)
+            # NaN nằm cuối và không bao giờ thỏa điều kiện: chỉ giữ phần có giá trị
+            order = np.argsort(values, kind="stable")
+            order = order[:np.count_nonzero(~np.isnan(values))]
+            self._values[col] = values
+            self._sorted[col] = (order, values[order])
+
+    def __len__(self):
+        return len(self.df)
+
+    def _category_rows(self, column, op, value):
+        # Các dòng thỏa điều kiện == / in trên cột phân loại (None nếu phải kiểm tra từng dòng)
+        if op not in ("==", "in"):
+            return None
+        order, starts = self._postings[column]
+        wanted = [value] if op == "==" else list(value)
+        codes = [self._labels[column][label] for label in wanted if label in self._labels[column]]
+        if len(codes) == 1:
+            return order[starts[codes[0]]:starts[codes[0] + 1]]
+        return np.sort(np.concatenate([order[starts[code]:starts[code + 1]] for code in codes] or [order[:0]]))
+
+    def _range_rows(self, column, op, value):
+        # Các dòng thỏa điều kiện so sánh trên cột có chỉ mục sắp xếp, theo thứ tự giá trị
+        if op not in ("==", ">", ">=", "<", "<="):
+            return None
+        order, sorted_values = self._sorted[column]
+        lower = {">": "right", ">=": "left"}.get(op)
+        upper = {"<": "left", "<=": "right"}.get(op)
+        if op == "==":
+            lower, upper = "left", "right"
+        value = sorted_values.dtype.type(value)
+        start = np.searchsorted(sorted_values, value, side=lower) if lower else 0
+        stop = np.searchsorted(sorted_values, value, side=upper) if upper else len(sorted_values)
+        return order[start:stop]
+
+    def _check(self, rows, column, op, value):
+        # Kiểm tra một điều kiện trên các dòng ứng viên: so sánh mã / giá trị đã có sẵn, không chạm tới DataFrame
+        if column in self._codes:
+            codes = self._codes[column][rows]
+            if op in ("in", "not in"):
+                wanted = np.array([self._labels[column][label] for label in value if label in self._labels[column]], dtype=np.intp)
+                condition = np.isin(codes, wanted)
+                return condition if op == "in" else ~condition & (codes >= 0)
+            code = self._labels[column].get(value, -2)
+            if op in ("==", "!="):
+                return FILTER_OPERATORS[op](codes, code) & (codes >= 0)
+        values = self._values[column][rows] if column in self._values else self.df[column].to_numpy()[rows]
+        if op in ("in", "not in"):
+            condition = pd.Series(values).isin(list(value)).to_numpy()
+            condition = ~condition if op == "not in" else condition
+        elif values.dtype.kind in "biuf":
+            condition = FILTER_OPERATORS[op](values, value)
+        else:
+            condition = np.asarray(FILTER_OPERATORS[op](pd.Series(values), value).fillna(False), dtype=bool)
+        # Giá trị thiếu không thỏa điều kiện nào (giống load_players)
+        return condition & pd.notna(values)
+
+    def query_rows(self, filters):
+        """Vị trí các dòng (theo thứ tự trong bảng) thỏa mọi điều kiện trong filters."""
+        indexed, rest = [], []
+        for column, op, value in filters:
+            if op not in FILTER_OPERATORS and op not in ("in", "not in"):
+                raise ValueError(f"Phép so sánh không hợp lệ trong bộ lọc cột {column}: {op}")
+            if column not in self.df.columns:
+                raise KeyError(f"Không có cột {column}")
+            rows = None
+            if column in self._postings:
+                rows = self._category_rows(column, op, value)
+            elif column in self._sorted:
+                rows = self._range_rows(column, op, value)
+            if rows is None:
+                rest.append((column, op, value))
+            else:
+                indexed.append((len(rows), rows, (column, op, value)))
+        if indexed:
+            indexed.sort(key=lambda item: item[0])
+            rows = np.sort(indexed[0][1])
+            rest = [condition for _, _, condition in indexed[1:]] + rest
+        else:
+            rows = np.arange(len(self.df))
+        for column, op, value in rest:
+            if not len(rows):
+                break
+            rows = rows[self._check(rows, column, op, value)]
+        return rows
+
+    def query(self, filters, columns=None):
+        """Các dòng thỏa mọi điều kiện (AND), chỉ gồm columns nếu có; chỉ mục 0..k-1 như load_players.
+
+        Ví dụ: query([("Team", "==", "Arsenal"), ("Position", "==", "DF"), ("Minutes", ">", 900), ("Tkl", ">", 40)],
+                     columns=["Player", "Minutes", "Tkl"])
+        """
+        rows = self.query_rows(filters)
+        df = self.df if columns is None else self.df[list(columns)]
+        return df.take(rows).reset_index(drop=True)
+
+
+def _scan(df, filters, columns):
+    # Cách cũ: quét toàn bảng bằng mặt nạ boolean cho mỗi câu hỏi
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        mask &= FILTER_OPERATORS[op](df[column], value).fillna(False).astype(bool)
+    return df.loc[mask, columns].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    # Đo so sánh: python player_query.py [số dòng]  (mặc định 500k cầu thủ)
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    df = synthetic_players(n_rows, n_stats=20, distribution="uniform", nan_rate=0.05)
+    start = time.perf_counter()
+    query = PlayerQuery(df, sorted_columns=["Minutes", "Stat 0"])
+    build_time = time.perf_counter() - start
+    print(f"🔎 {n_rows:,} cầu thủ: tạo chỉ mục {build_time * 1000:.1f} ms")
+
+    questions = [
+        [("Team", "==", "Team 07"), ("Position", "==", "DF"), ("Minutes", ">", 900), ("Stat 1", ">", 0.5)],
+        [("Minutes", ">=", 3400), ("Nation", "==", "ENG")],
+        [("Stat 0", ">", 0.99), ("Team", "==", "Team 03")],
+    ]
+    projection = ["Player", "Team", "Minutes", "Stat 1"]
+    for filters in questions:
+        expected = _scan(df, filters, projection)
+        repeat = 200
+        start = time.perf_counter()
+        for _ in range(repeat):
+            actual = query.query(filters, columns=projection)
+        index_time = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(5):
+            _scan(df, filters, projection)
+        scan_time = (time.perf_counter() - start) / 5
+        conditions = " AND ".join(f"{column} {op} {value}" for column, op, value in filters)
+        print(f"   {conditions}: {len(actual)} dòng | quét toàn bảng {scan_time * 1000:7.2f} ms | "
+              f"chỉ mục {index_time * 1000:6.3f} ms | giống hệt: {'có' if expected.equals(actual) else 'KHÔNG'}")
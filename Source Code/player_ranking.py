@@ -0,0 +1,154 @@
+import sys
+import numpy as np
+import pandas as pd
+from benchmark_utils import best_time, synthetic_players
+
+# Các cột của bảng xếp hạng dạng dài do rank_extremes trả về (đứng sau các cột nhóm, nếu có)
+# - Stat: tên cột thống kê, Side: "Highest" (cao nhất) hoặc "Lowest" (thấp nhất)
+# - Rank: thứ hạng 1..k, Row: vị trí dòng (0..n-1) của cầu thủ trong DataFrame đầu vào, Value: giá trị
+RANKING_COLUMNS = ["Stat", "Side", "Rank", "Row", "Value"]
+SIDES = ["Highest", "Lowest"]
+
+
+def ordinal(rank):
+    """Nhãn thứ hạng tiếng Anh: 1 -> "1st", 2 -> "2nd", 11 -> "11th"."""
+    if 10 <= rank % 100 <= 20:
+        return f"{rank}th"
+    return f"{rank}" + {1: "st", 2: "nd", 3: "rd"}.get(rank % 10, "th")
+
+
+def _select_top(keys, k):
+    """Chọn k phần tử có khóa lớn nhất trên từng hàng của khối keys (m cột thống kê x n dòng) mà không sắp xếp cả khối.
+
+    np.partition tìm giá trị thứ k của mỗi hàng (ngưỡng); các dòng lớn hơn ngưỡng luôn được chọn, các dòng
+    bằng ngưỡng được lấy theo thứ tự dòng cho đủ k. Chỉ k dòng được chọn mới được sắp xếp: khóa giảm dần,
+    bằng nhau thì dòng đứng trước xếp trước. Trả về vị trí dòng trong khối, dạng (m, k).
+    """
+    n_columns, n_rows = keys.shape
+    k = min(k, n_rows)
+    if k == 0:
+        return np.empty((n_columns, 0), dtype=np.intp)
+    threshold = np.partition(keys, n_rows - k, axis=1)[:, n_rows - k, None]
+    selected = keys > threshold
+    needed = k - selected.sum(axis=1)
+    ties = keys == threshold
+    # Chỉ các cột có nhiều giá trị bằng ngưỡng hơn số chỗ còn lại mới cần đếm tích lũy để chọn dòng đứng trước
+    crowded = ties.sum(axis=1) > needed
+    ties[crowded] &= np.cumsum(ties[crowded], axis=1, dtype=np.int32) <= needed[crowded, None]
+    selected |= ties
+    # Đúng k dòng mỗi cột; nonzero trả về (cột, dòng) theo thứ tự cột rồi dòng
+    column_index, row_index = np.nonzero(selected)
+    row_index = row_index.reshape(n_columns, k)
+    chosen = keys[column_index.reshape(n_columns, k), row_index]
+    order = np.argsort(-chosen, axis=1, kind="stable")
+    return np.take_along_axis(row_index, order, axis=1)
+
+
+def _block_extremes(values, bottom_nonzero):
+    # Khóa và mặt nạ hợp lệ cho hai phía của một khối dòng; giá trị thiếu (NaN) không được xếp hạng
+    present = ~np.isnan(values)
+    bottom_mask = present
+    if bottom_nonzero:
+        # Thấp nhất chỉ xét giá trị > 0; cột không có giá trị dương nào thì xét mọi giá trị
+        positive = present & (values > 0)
+        bottom_mask = np.where(positive.any(axis=1, keepdims=True), positive, present)
+    # Phía thấp nhất là phía cao nhất của -values; dòng không hợp lệ nhận khóa -inf để xếp cuối
+    return [
+        (np.where(present, values, -np.inf), present),
+        (np.where(bottom_mask, -values, -np.inf), bottom_mask),
+    ]
+
+
+def _group_blocks(df, by):
+    # Chia các dòng thành từng nhóm liên tiếp (vị trí dòng tăng dần trong mỗi nhóm); dòng thiếu khóa nhóm bị bỏ
+    codes = df.groupby(by, sort=True, dropna=True).ngroup().to_numpy()
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0]) if len(order) else np.array([], dtype=np.intp)
+    ends = np.r_[starts[1:], len(order)]
+    return [order[start:end] for start, end in zip(starts, ends)]
+
+
+def rank_extremes(df, columns, k=3, by=None, bottom_nonzero=True):
+    """Top-k cao nhất và thấp nhất của mọi cột trong columns, tính cùng lúc trên ma trận số.
+
+    Mỗi phía chỉ cần một lần np.partition trên cả ma trận (không sắp xếp lại cả bảng cho từng cột).
+    Thứ tự xác định: cao nhất theo giá trị giảm dần, thấp nhất theo giá trị tăng dần, bằng nhau thì dòng
+    đứng trước trong df xếp trước. bottom_nonzero: phía thấp nhất chỉ xét giá trị > 0 (như top_3.txt),
+    trừ khi cột không có giá trị dương nào. by: tên cột (hoặc danh sách cột) để xếp hạng riêng trong từng
+    nhóm, ví dụ "Team" hoặc ["Team", "Position"]. NaN không được xếp hạng nên một cột có thể có ít hơn k dòng.
+
+    Trả về DataFrame dạng dài với các cột by (nếu có) + RANKING_COLUMNS, sắp theo nhóm, thứ tự cột trong
+    columns, Highest trước Lowest, rồi Rank.
+    """
+    columns = list(columns)
+    by = [by] if isinstance(by, str) else list(by or [])
+    # Mỗi cột thống kê là một hàng liên tục trong bộ nhớ (m x n) để partition / cumsum chạy trên dữ liệu liền kề
+    values = np.ascontiguousarray(df[columns].to_numpy(dtype="float64", na_value=np.nan).T)
+    blocks = _group_blocks(df, by) if by else [np.arange(len(df))]
+
+    parts = {name: [] for name in ["block", "stat", "side", "rank", "row"]}
+    for block_index, rows in enumerate(blocks):
+        block = values[:, rows]
+        for side_index, (keys, valid) in enumerate(_block_extremes(block, bottom_nonzero)):
+            local = _select_top(keys, k)
+            n_columns, n_ranks = local.shape
+            stat = np.repeat(np.arange(n_columns), n_ranks)
+            local = local.ravel()
+            # Dòng không hợp lệ luôn nằm cuối mỗi cột nên Rank của các dòng còn lại vẫn là 1, 2, ...
+            keep = valid[stat, local]
+            parts["block"].append(np.full(keep.sum(), block_index))
+            parts["stat"].append(stat[keep])
+            parts["side"].append(np.full(keep.sum(), side_index))
+            parts["rank"].append(np.tile(np.arange(1, n_ranks + 1), n_columns)[keep])
+            parts["row"].append(rows[local[keep]])
+
+    arrays = {name: np.concatenate(chunks) if chunks else np.array([], dtype=np.intp) for name, chunks in parts.items()}
+    order = np.lexsort((arrays["rank"], arrays["side"], arrays["stat"], arrays["block"]))
+    arrays = {name: array[order] for name, array in arrays.items()}
+
+    result = pd.DataFrame({
+        "Stat": np.array(columns, dtype=object)[arrays["stat"]],
+        "Side": np.array(SIDES, dtype=object)[arrays["side"]],
+        "Rank": arrays["rank"].astype(np.int64),
+        "Row": arrays["row"].astype(np.int64),
+        "Value": values[arrays["stat"], arrays["row"]],
+    })
+    if by:
+        # Nhãn nhóm lấy từ dòng được xếp hạng (mọi dòng trong một khối có cùng khóa nhóm)
+        labels = df[by].iloc[arrays["row"]].reset_index(drop=True)
+        result = pd.concat([labels, result], axis=1)
+    return result
+
+
+def _naive_extremes(df, columns, k):
+    # Cách cũ của Bai2.py: sắp xếp cả bảng hai lần cho mỗi cột (dùng để đo so sánh và kiểm tra kết quả)
+    rows = []
+    positions = df.reset_index(drop=True)
+    for stat in columns:
+        top = positions[stat].sort_values(ascending=False, kind="stable").head(k)
+        non_zero = positions[stat][positions[stat] > 0]
+        low = (non_zero if not non_zero.empty else positions[stat]).sort_values(kind="stable").head(k)
+        for side, ranked in zip(SIDES, [top, low]):
+            rows.extend({"Stat": stat, "Side": side, "Rank": rank, "Row": row, "Value": value}
+                        for rank, (row, value) in enumerate(ranked.items(), start=1))
+    return pd.DataFrame(rows, columns=RANKING_COLUMNS)
+
+
+if __name__ == "__main__":
+    # Đo so sánh xếp hạng: python player_ranking.py [số dòng] [k]  (mặc định 100k dòng x 75 cột, 500 đội, k=10)
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    df = synthetic_players(n_rows, n_teams=500, decimals=1, zero_rate=0.3)
+    stats = [col for col in df.columns if col.startswith("Stat ")]
+
+    expected, naive_time = best_time(lambda: _naive_extremes(df, stats, k), repeat=1)
+    actual, engine_time = best_time(lambda: rank_extremes(df, stats, k=k))
+    same = expected[["Stat", "Side", "Rank", "Row"]].equals(actual[["Stat", "Side", "Rank", "Row"]])
+    print(f"🏆 {n_rows:,} dòng x {len(stats)} cột, k={k}: sắp xếp từng cột {naive_time * 1000:8.1f} ms | "
+          f"partition {engine_time * 1000:8.1f} ms | nhanh hơn {naive_time / engine_time:5.1f} lần | "
+          f"giống hệt: {'có' if same else 'KHÔNG'}")
+
+    for by in ["Team", ["Team", "Position"]]:
+        grouped, grouped_time = best_time(lambda: rank_extremes(df, stats, k=k, by=by))
+        print(f"   Theo {by}: {grouped_time * 1000:8.1f} ms, {len(grouped):,} dòng xếp hạng")
@@ -0,0 +1,384 @@
+import json
+import operator
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+from benchmark_utils import best_time, synthetic_players
+
+# Định dạng của kho dữ liệu cột theo đuôi tệp: Arrow IPC (mặc định, đọc qua memory-map) hoặc Parquet (nén, nhỏ hơn)
+STORE_FORMATS = {"arrow": ".arrow", "parquet": ".parquet"}
+
+# Các phép so sánh được hỗ trợ trong bộ lọc (cột, phép so sánh, giá trị), ví dụ ("Minutes", ">", 900)
+FILTER_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+
+# Schema gọn đi kèm tệp kết quả (csv/result.csv -> csv/result.schema.json)
+SCHEMA_SUFFIX = ".schema.json"
+# Tăng khi quy tắc chọn kiểu gọn thay đổi: schema cũ bị bỏ qua và được tính lại từ dữ liệu
+SCHEMA_VERSION = 2
+# Các kiểu số nguyên / số thực theo thứ tự thử, từ nhỏ đến lớn
+_INT_TYPES = ["int8", "int16", "int32", "int64"]
+_FLOAT_TYPES = ["float16", "float32"]
+# Cột chuỗi chỉ thành categorical khi số giá trị khác nhau / số dòng nhỏ hơn tỉ lệ này (cột gần như duy nhất
+# như Player tốn bộ nhớ hơn khi thành categorical: mã + từ điển lớn gần bằng chính cột chuỗi)
+CATEGORY_MAX_RATIO = 0.5
+
+
+def _import_pyarrow():
+    # pyarrow là phụ thuộc tùy chọn: không có thì vẫn đọc/ghi CSV như cũ
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def store_path_for(csv_path, store_format="arrow"):
+    """Đường dẫn kho dữ liệu cột đi kèm tệp CSV, ví dụ csv/result.csv -> csv/result.arrow."""
+    return os.path.splitext(csv_path)[0] + STORE_FORMATS[store_format]
+
+
+def save_store(df, path, string_columns=(), na_rep="N/A"):
+    """Ghi DataFrame ra tệp cột có kiểu dữ liệu, schema được nhúng trong tệp.
+
+    Tệp .arrow là Arrow IPC không nén nên có thể memory-map và đọc không cần sao chép;
+    tệp .parquet được nén. Trong các cột string_columns, giá trị na_rep được ghi là null
+    (giống cách các script đọc result.csv với na_values=["N/A"]). Trả về False nếu thiếu pyarrow.
+    """
+    pa = _import_pyarrow()
+    if pa is None:
+        print("⚠️ Chưa cài pyarrow, bỏ qua việc ghi kho dữ liệu cột (chỉ có CSV).")
+        return False
+
+    df = df.copy()
+    for col in string_columns:
+        if col in df.columns:
+            df[col] = df[col].mask(df[col] == na_rep)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Chuỗi lưu dạng string (không phải large_string) cho gọn và thống nhất giữa các phiên bản pandas
+    table = table.cast(pa.schema([
+        pa.field(field.name, pa.string()) if pa.types.is_large_string(field.type) else field
+        for field in table.schema
+    ], metadata=table.schema.metadata))
+
+    # Ghi ra tệp tạm rồi đổi tên để người đọc không bao giờ thấy tệp ghi dở
+    tmp_path = path + ".tmp"
+    if path.endswith(STORE_FORMATS["parquet"]):
+        import pyarrow.parquet as pq
+        pq.write_table(table, tmp_path)
+    else:
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    os.replace(tmp_path, path)
+    print(f"✅ Đã lưu kho dữ liệu cột vào {path} ({table.num_rows} hàng, {table.num_columns} cột).")
+    return True
+
+
+def _find_store(csv_path):
+    # Dùng kho dữ liệu cột nếu có pyarrow và tệp không cũ hơn result.csv (tránh đọc dữ liệu lỗi thời)
+    if _import_pyarrow() is None:
+        return None
+    csv_mtime = os.path.getmtime(csv_path) if os.path.exists(csv_path) else None
+    for store_format in STORE_FORMATS:
+        path = store_path_for(csv_path, store_format)
+        if os.path.exists(path) and (csv_mtime is None or os.path.getmtime(path) >= csv_mtime):
+            return path
+    return None
+
+
+def _check_filters(filters):
+    for column, op, _ in filters:
+        if op not in FILTER_OPERATORS and op not in ("in", "not in"):
+            raise ValueError(f"Phép so sánh không hợp lệ trong bộ lọc cột {column}: {op}")
+
+
+def _arrow_mask(table, filters):
+    pa = _import_pyarrow()
+    import pyarrow.compute as pc
+    names = {"==": "equal", "!=": "not_equal", ">": "greater", ">=": "greater_equal", "<": "less", "<=": "less_equal"}
+    mask = None
+    for column, op, value in filters:
+        if op in ("in", "not in"):
+            value_set = pa.array(list(value), type=table.schema.field(column).type)
+            condition = pc.is_in(table[column], value_set=value_set)
+            if op == "not in":
+                condition = pc.invert(condition)
+        else:
+            condition = pc.call_function(names[op], [table[column], value])
+        # Giá trị thiếu (null) không thỏa điều kiện nào
+        condition = pc.fill_null(condition, False)
+        mask = condition if mask is None else pc.and_(mask, condition)
+    return mask
+
+
+def _read_store(path, columns, filters, memory_map):
+    pa = _import_pyarrow()
+    wanted = None if columns is None else list(dict.fromkeys(list(columns) + [f[0] for f in filters]))
+    if path.endswith(STORE_FORMATS["parquet"]):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=wanted, memory_map=memory_map)
+    else:
+        source = pa.memory_map(path, "r") if memory_map else pa.OSFile(path, "rb")
+        table = pa.ipc.open_file(source).read_all()
+        if wanted is not None:
+            table = table.select(wanted)
+    if filters:
+        table = table.filter(_arrow_mask(table, filters))
+    if columns is not None:
+        table = table.select(list(columns))
+    # Bỏ qua metadata pandas (Int64...) để kiểu dữ liệu giống hệt khi đọc CSV
+    return table.to_pandas(ignore_metadata=True)
+
+
+def _read_csv(csv_path, columns, filters):
+    usecols = None if columns is None else list(dict.fromkeys(list(columns) + [f[0] for f in filters]))
+    df = pd.read_csv(csv_path, na_values=["N/A"], encoding="utf-8-sig", usecols=usecols)
+    if filters:
+        mask = pd.Series(True, index=df.index)
+        for column, op, value in filters:
+            if op in ("in", "not in"):
+                condition = df[column].isin(list(value))
+                condition = ~condition if op == "not in" else condition
+            else:
+                condition = FILTER_OPERATORS[op](df[column], value)
+            mask &= condition.fillna(False).astype(bool) & df[column].notna()
+        df = df[mask].reset_index(drop=True)
+    if columns is not None:
+        df = df[list(columns)]
+    return df
+
+
+def load_players(csv_path, columns=None, filters=None, memory_map=True, compact=False):
+    """Đọc bảng cầu thủ do Bai1.py tạo ra, dùng chung cho mọi script.
+
+    Ưu tiên kho dữ liệu cột (result.arrow / result.parquet cạnh result.csv) nếu có và không cũ hơn
+    CSV; ngược lại đọc result.csv với cùng quy ước ("N/A" là giá trị thiếu, mã hóa utf-8-sig).
+    columns: chỉ đọc các cột này (theo đúng thứ tự); filters: danh sách điều kiện (cột, phép so sánh, giá trị)
+    kết hợp bằng AND, phép so sánh là ==, !=, >, >=, <, <=, in, not in. Ví dụ:
+        load_players(result_path, columns=["Player", "Minutes"], filters=[("Minutes", ">", 900)])
+    Kiểu dữ liệu trả về giống pd.read_csv: cột số nguyên có giá trị thiếu thành float64.
+    compact=True: đổi sang kiểu gọn theo schema ghi cạnh tệp (result.schema.json, xem compact_schema),
+    hoặc tính schema từ dữ liệu nếu chưa có.
+    """
+    filters = list(filters or [])
+    _check_filters(filters)
+    store_path = _find_store(csv_path)
+    if store_path is not None:
+        df = _read_store(store_path, columns, filters, memory_map)
+    else:
+        df = _read_csv(csv_path, columns, filters)
+    if compact:
+        df = compact_players(df, load_schema(csv_path))
+    return df
+
+
+def iter_players(csv_path, chunk_size=100_000, columns=None, memory_map=True):
+    """Đọc bảng cầu thủ theo từng khối tối đa chunk_size dòng (bộ nhớ không phụ thuộc số dòng của bảng).
+
+    Cùng nguồn và cùng quy ước như load_players: kho dữ liệu cột nếu có (Arrow qua memory-map, Parquet theo
+    từng lô), ngược lại result.csv đọc theo khối. Mỗi khối là một DataFrame.
+    """
+    store_path = _find_store(csv_path)
+    if store_path is None:
+        yield from pd.read_csv(csv_path, na_values=["N/A"], encoding="utf-8-sig", usecols=columns, chunksize=chunk_size)
+        return
+    pa = _import_pyarrow()
+    if store_path.endswith(STORE_FORMATS["parquet"]):
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(store_path, memory_map=memory_map).iter_batches(batch_size=chunk_size, columns=columns)
+        for batch in batches:
+            yield pa.Table.from_batches([batch]).to_pandas(ignore_metadata=True)
+        return
+    source = pa.memory_map(store_path, "r") if memory_map else pa.OSFile(store_path, "rb")
+    reader = pa.ipc.open_file(source)
+    for index in range(reader.num_record_batches):
+        batch = reader.get_batch(index)
+        if columns is not None:
+            batch = batch.select(list(columns))
+        # Cắt lô thành các khối nhỏ (không sao chép khi dùng memory-map)
+        for start in range(0, batch.num_rows, chunk_size):
+            yield pa.Table.from_batches([batch.slice(start, chunk_size)]).to_pandas(ignore_metadata=True)
+
+
+def schema_path_for(csv_path):
+    """Đường dẫn tệp schema đi kèm tệp CSV, ví dụ csv/result.csv -> csv/result.schema.json."""
+    return os.path.splitext(csv_path)[0] + SCHEMA_SUFFIX
+
+
+def _exact_float_type(values):
+    # Kiểu số thực nhỏ nhất biểu diễn đúng từng giá trị (đổi sang rồi đổi về float64 vẫn như cũ), None nếu không có
+    for float_type in _FLOAT_TYPES:
+        with np.errstate(over="ignore"):
+            if np.array_equal(values.astype(float_type).astype("float64"), values):
+                return float_type
+    return None
+
+
+def _int_type(values, nullable):
+    low, high = (values.min(), values.max()) if len(values) else (0, 0)
+    for int_type in _INT_TYPES:
+        info = np.iinfo(int_type)
+        if info.min <= low and high <= info.max:
+            return int_type.capitalize() if nullable else int_type
+    return "Int64" if nullable else "int64"
+
+
+def compact_schema(df):
+    """Kiểu dữ liệu gọn nhất không mất thông tin cho từng cột: {"version", "columns": {cột: {"dtype", "compact"}},
+    "dictionary": [...]}.
+
+    - Số nguyên (kể cả Int64 có giá trị thiếu) và số thực chỉ chứa số nguyên: kiểu nguyên nhỏ nhất chứa được
+      mọi giá trị (Int8 / Int16... nếu có giá trị thiếu).
+    - Số thực: float16 rồi float32 nếu mọi giá trị được biểu diễn đúng ở kiểu đó (ví dụ 0.5, 12.25),
+      ngược lại giữ float64; số thập phân như 0.45 hay 45.3 không biểu diễn đúng ở float16 / float32
+      nên cột chứa chúng vẫn là float64.
+    - Chuỗi có ít giá trị khác nhau (tỉ lệ < CATEGORY_MAX_RATIO): categorical, mọi cột dùng chung một từ điển
+      "dictionary" (theo thứ tự tên); cột gần như duy nhất (ví dụ Player) giữ nguyên kiểu chuỗi.
+    "dtype" là kiểu ban đầu để restore_players khôi phục lại đúng bảng cũ.
+    """
+    columns = {}
+    dictionary = set()
+    for col in df.columns:
+        series = df[col]
+        entry = {"dtype": str(series.dtype), "compact": str(series.dtype)}
+        if pd.api.types.is_bool_dtype(series.dtype):
+            pass
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            values = series.dropna().to_numpy(dtype="int64")
+            entry["compact"] = _int_type(values, series.isna().any())
+        elif pd.api.types.is_float_dtype(series.dtype):
+            values = series.dropna().to_numpy(dtype="float64")
+            if np.isfinite(values).all() and np.array_equal(np.round(values), values):
+                entry["compact"] = _int_type(values, series.isna().any())
+            elif _exact_float_type(values) is not None:
+                entry["compact"] = _exact_float_type(values)
+        elif pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype):
+            uniques = series.dropna().unique()
+            if len(uniques) < CATEGORY_MAX_RATIO * len(series):
+                entry["compact"] = "category"
+                dictionary.update(str(value) for value in uniques)
+        columns[col] = entry
+    return {"version": SCHEMA_VERSION, "columns": columns, "dictionary": sorted(dictionary)}
+
+
+def compact_players(df, schema=None):
+    """Bảng với các cột được đổi sang kiểu gọn của schema (mặc định compact_schema(df)); cột không có trong
+    schema được giữ nguyên. Mọi cột categorical dùng chung một CategoricalDtype (một từ điển trong bộ nhớ).
+    Cột số thực chỉ được đổi sang float16 / float32 khi mọi giá trị hiện có vẫn biểu diễn đúng (dữ liệu có thể
+    đã khác lúc tạo schema)."""
+    schema = schema or compact_schema(df)
+    shared = pd.CategoricalDtype(schema["dictionary"])
+    columns = {}
+    for col in df.columns:
+        entry = schema["columns"].get(col)
+        if entry is None or entry["compact"] == str(df[col].dtype):
+            columns[col] = df[col]
+        elif entry["compact"] == "category":
+            columns[col] = df[col].astype(shared)
+        elif entry["compact"] in _FLOAT_TYPES:
+            with np.errstate(over="ignore"):
+                compact = df[col].astype(entry["compact"])
+            exact = compact.astype("float64").equals(df[col].astype("float64"))
+            columns[col] = compact if exact else df[col]
+        else:
+            columns[col] = df[col].astype(entry["compact"])
+    return pd.DataFrame(columns, index=df.index)
+
+
+def restore_players(df, schema):
+    """Ngược lại của compact_players: khôi phục kiểu ban đầu, giá trị giống hệt bảng trước khi thu gọn."""
+    columns = {}
+    for col in df.columns:
+        entry = schema["columns"].get(col)
+        series = df[col]
+        if entry is not None and entry["compact"] != entry["dtype"]:
+            if entry["compact"] == "category":
+                series = series.astype(object)
+            series = series.astype(entry["dtype"])
+        columns[col] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
+def save_schema(schema, csv_path):
+    """Ghi schema cạnh tệp kết quả csv_path để người đọc (load_players(..., compact=True)) dùng lại."""
+    path = schema_path_for(csv_path)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(schema, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load_schema(csv_path):
+    """Schema đã ghi cạnh tệp kết quả csv_path, None nếu không có (hoặc thuộc phiên bản khác SCHEMA_VERSION)."""
+    try:
+        with open(schema_path_for(csv_path), "r", encoding="utf-8") as f:
+            schema = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return schema if schema.get("version") == SCHEMA_VERSION else None
+
+
+def memory_report(before, after):
+    """Số byte của từng cột trước và sau khi thu gọn (kể cả chuỗi), thêm hàng "Tổng".
+
+    Cột categorical chỉ tính phần mã; mỗi từ điển categorical khác nhau được tính một lần ở hàng
+    "Từ điển categorical" (memory_usage của pandas tính lại từ điển dùng chung cho từng cột).
+    """
+    before_bytes = before.memory_usage(deep=True, index=False)
+    after_bytes = after.memory_usage(deep=True, index=False).reindex(before_bytes.index)
+    dictionaries = {}
+    for col in after.columns:
+        if isinstance(after[col].dtype, pd.CategoricalDtype):
+            after_bytes[col] = after[col].cat.codes.memory_usage(deep=True, index=False)
+            categories = after[col].cat.categories
+            dictionaries[id(categories)] = categories.memory_usage(deep=True)
+    report = pd.DataFrame({
+        "Kiểu trước": before.dtypes.astype(str),
+        "Byte trước": before_bytes,
+        "Kiểu sau": after.dtypes.astype(str).reindex(before_bytes.index),
+        "Byte sau": after_bytes,
+    })
+    if dictionaries:
+        report.loc["Từ điển categorical"] = ["", 0, "", sum(dictionaries.values())]
+    report.loc["Tổng"] = ["", report["Byte trước"].sum(), "", report["Byte sau"].sum()]
+    report["Giảm (lần)"] = (report["Byte trước"] / report["Byte sau"]).round(2)
+    return report
+
+
+if __name__ == "__main__":
+    # Đo so sánh đọc CSV và đọc kho dữ liệu cột: python player_store.py [số dòng]  (mặc định 500k dòng x 78 cột)
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    df = synthetic_players(n_rows, n_stats=73, distribution="uniform", nan_rate=0.05)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "result.csv")
+        df.to_csv(csv_path, index=False, encoding="utf-8-sig", na_rep="N/A")
+        save_store(df, store_path_for(csv_path), string_columns=["Player", "Nation", "Team", "Position"])
+        print(f"📦 {n_rows:,} dòng x {df.shape[1]} cột: CSV {os.path.getsize(csv_path) / 1e6:.0f} MB, "
+              f"Arrow {os.path.getsize(store_path_for(csv_path)) / 1e6:.0f} MB")
+
+        from_csv, csv_time = best_time(lambda: pd.read_csv(csv_path, na_values=["N/A"], encoding="utf-8-sig"), repeat=1)
+        from_store, store_time = best_time(lambda: load_players(csv_path))
+        print(f"   Toàn bộ bảng : CSV {csv_time * 1000:9.1f} ms | Arrow {store_time * 1000:9.1f} ms | "
+              f"giống hệt: {'có' if from_csv.equals(from_store) else 'KHÔNG'}")
+
+        projection = ["Player", "Team", "Minutes", "Stat 0"]
+        filters = [("Minutes", ">", 900)]
+        _, table_time = best_time(lambda: load_players(csv_path, columns=projection, filters=filters))
+        print(f"   4 cột, Minutes > 900 : Arrow {table_time * 1000:9.1f} ms")
+
+    schema = compact_schema(df)
+    compact = compact_players(df, schema)
+    total = memory_report(df, compact).loc["Tổng"]
+    print(f"   Thu gọn kiểu dữ liệu: {total['Byte trước'] / 1e6:9.1f} MB -> {total['Byte sau'] / 1e6:.1f} MB "
+          f"(giảm {total['Giảm (lần)']:.1f} lần) | khôi phục giống hệt: "
+          f"{'có' if restore_players(compact, schema).equals(df) else 'KHÔNG'}")
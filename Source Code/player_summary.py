@@ -0,0 +1,123 @@
+import sys
+import warnings
+import numpy as np
+import pandas as pd
+from benchmark_utils import best_time, synthetic_players
+
+# Các thống kê hỗ trợ (tên hàm tổng hợp của pandas -> nhãn tiếng Việt trong tên cột, ví dụ "Trung vị của Age")
+SUMMARY_STATS = {
+    "median": "Trung vị",
+    "mean": "Trung bình",
+    "std": "Độ lệch chuẩn",
+    "min": "Nhỏ nhất",
+    "max": "Lớn nhất",
+    "count": "Số lượng",
+}
+DEFAULT_SUMMARY_STATS = ["median", "mean", "std"]
+
+# Khóa nhóm -> tiêu đề cột đầu tiên của bảng thống kê (results2.csv dùng "Đội/Tổng thể")
+SUMMARY_GROUP_LABELS = {
+    "Team": "Đội/Tổng thể",
+    "Nation": "Quốc tịch/Tổng thể",
+    "Position": "Vị trí/Tổng thể",
+}
+
+
+def _segment_stats(segment, stats):
+    # Thống kê của một nhóm cho mọi cột cùng lúc; segment có dạng (số cột, số dòng của nhóm), mỗi cột liền kề
+    # trong bộ nhớ nên np.sum cộng theo cùng thứ tự (pairwise) như Series.mean / Series.std của pandas
+    present = ~np.isnan(segment)
+    count = present.sum(axis=1)
+    filled = np.where(present, segment, 0.0)
+    mean = filled.sum(axis=1) / count
+    results = {"count": count.astype("float64"), "mean": mean}
+    if "std" in stats:
+        squares = np.where(present, (mean[:, None] - filled) ** 2, 0.0)
+        results["std"] = np.sqrt(squares.sum(axis=1) / (count - 1))
+    if "median" in stats:
+        results["median"] = np.nanmedian(segment, axis=1)
+    if "min" in stats:
+        results["min"] = np.nanmin(segment, axis=1)
+    if "max" in stats:
+        results["max"] = np.nanmax(segment, axis=1)
+    return np.column_stack([results[stat] for stat in stats])
+
+
+def summarize_groups(df, columns, by="Team", stats=None, overall_label="all", decimals=2, groups=None):
+    """Bảng thống kê theo nhóm theo định dạng của results2.csv: hàng đầu là toàn bộ dữ liệu (overall_label),
+    sau đó mỗi nhóm một hàng theo thứ tự tên nhóm; với mỗi cột có các cột "<nhãn thống kê> của <cột>".
+
+    Các dòng được sắp theo mã nhóm (pd.factorize, dạng categorical) một lần, khối số được chuyển thành ma trận
+    (cột x dòng) để mỗi nhóm là một đoạn liên tiếp; mọi thống kê của mọi cột trong một nhóm được tính cùng
+    lúc trên đoạn đó, không lọc hay sao chép DataFrame cho từng nhóm. Kết quả giống hệt cách tính bằng
+    Series.median / mean / std cũ. stats là danh sách tên trong SUMMARY_STATS (mặc định trung vị, trung bình,
+    độ lệch chuẩn); giá trị thiếu được bỏ qua, dòng thiếu khóa nhóm chỉ được tính vào hàng tổng thể.
+    groups: chỉ tính hàng của các nhóm này (hàng tổng thể vẫn tính trên mọi dòng); decimals=None: không làm tròn.
+    """
+    stats = list(stats or DEFAULT_SUMMARY_STATS)
+    unknown = [stat for stat in stats if stat not in SUMMARY_STATS]
+    if unknown:
+        raise ValueError(f"Thống kê không hỗ trợ: {', '.join(unknown)} (hỗ trợ: {', '.join(SUMMARY_STATS)})")
+    columns = list(columns)
+
+    codes, labels = pd.factorize(df[by], sort=True)
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    starts = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+    wanted = range(len(labels))
+    if groups is not None:
+        groups = set(groups)
+        wanted = [i for i, label in enumerate(labels) if label in groups]
+    matrix = np.ascontiguousarray(df[columns].to_numpy(dtype="float64", na_value=np.nan).T)
+    grouped_matrix = np.ascontiguousarray(matrix[:, order])
+
+    # Nhóm một phần tử có độ lệch chuẩn NaN, cột toàn NaN có trung vị NaN (như pandas), không cần cảnh báo
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        blocks = [_segment_stats(matrix, stats)]
+        blocks += [_segment_stats(grouped_matrix[:, starts[i]:starts[i + 1]], stats) for i in wanted]
+
+    # Mỗi khối có dạng (cột, thống kê); trải thành một hàng theo thứ tự cột rồi thống kê
+    summary = pd.DataFrame(
+        np.stack(blocks).reshape(len(blocks), -1),
+        columns=[f"{SUMMARY_STATS[stat]} của {col}" for col in columns for stat in stats],
+    )
+    if decimals is not None:
+        summary = summary.round(decimals)
+    summary.insert(0, SUMMARY_GROUP_LABELS.get(by, f"{by}/Tổng thể"), [overall_label] + [labels[i] for i in wanted])
+    return summary
+
+
+def _loop_summary(df, columns, by="Team"):
+    # Cách cũ của Bai2.py: lọc và sao chép dữ liệu của từng nhóm rồi tính từng thống kê cho từng cột
+    rows = [{"": "all", **{key: value for col in columns for key, value in [
+        (f"Trung vị của {col}", df[col].median()),
+        (f"Trung bình của {col}", df[col].mean()),
+        (f"Độ lệch chuẩn của {col}", df[col].std()),
+    ]}}]
+    for group in sorted(df[by].unique()):
+        group_df = df[df[by] == group].copy()
+        row = {"": group}
+        for col in columns:
+            row[f"Trung vị của {col}"] = group_df[col].median()
+            row[f"Trung bình của {col}"] = group_df[col].mean()
+            row[f"Độ lệch chuẩn của {col}"] = group_df[col].std()
+        rows.append(row)
+    return pd.DataFrame(rows).rename(columns={"": "Đội/Tổng thể"}).round(2)
+
+
+if __name__ == "__main__":
+    # Đo so sánh: python player_summary.py [số dòng] [số đội]  (mặc định 100k cầu thủ x 75 cột, 500 đội)
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_teams = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    df = synthetic_players(n_rows, n_teams=n_teams)
+    stats = [col for col in df.columns if col.startswith("Stat ")]
+
+    expected, loop_time = best_time(lambda: _loop_summary(df, stats), repeat=1)
+    actual, grouped_time = best_time(lambda: summarize_groups(df, stats))
+    print(f"📊 {n_rows:,} cầu thủ x {len(stats)} cột, {n_teams} đội: vòng lặp từng đội {loop_time * 1000:9.1f} ms | "
+          f"gom nhóm một lần {grouped_time * 1000:7.1f} ms | nhanh hơn {loop_time / grouped_time:5.1f} lần | "
+          f"giống hệt: {'có' if expected.equals(actual) else 'KHÔNG'}")
+    for by in ["Nation", "Position"]:
+        _, by_time = best_time(lambda: summarize_groups(df, stats, by=by))
+        print(f"   Theo {by}: {by_time * 1000:7.1f} ms")
@@ -0,0 +1,14 @@
+import multiprocessing
+
+
+def pool_context():
+    """Ngữ cảnh multiprocessing dùng chung cho mọi ProcessPoolExecutor của dự án.
+
+    - fork (Linux): tiến trình con kế thừa sẵn bộ nhớ của tiến trình cha, khởi động gần như tức thì;
+    - spawn (Windows, nơi không có fork): tiến trình con khởi động một trình thông dịch mới và import lại
+      script chính, nên script gọi pool phải đặt mã chạy chính dưới if __name__ == "__main__":
+      (Bai2.py, Bai3.py, Bai4_1.py); hàm chạy trong tiến trình con và tham số của nó phải pickle được.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
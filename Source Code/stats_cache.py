@@ -0,0 +1,137 @@
+import json
+import os
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+# Tăng khi thay đổi cách tính dấu vân tay hoặc định dạng các bảng trung gian để lần chạy sau tính lại toàn bộ
+STATE_VERSION = 2
+STATE_FILE = "state.json"
+# Nhóm riêng cho các dòng thiếu khóa nhóm (ví dụ Team "N/A"): không phải một nhóm thật trong kết quả, nhưng
+# thay đổi ở các dòng này vẫn làm các cột tương ứng thay đổi (xếp hạng toàn bảng như top_3 có cả các dòng này)
+MISSING_GROUP = "\0missing"
+
+# Kết quả so sánh với lần chạy trước cho một khóa nhóm (ví dụ Team)
+# - groups: các nhóm hiện có (theo thứ tự tên), changed_groups: nhóm mới hoặc có dữ liệu thay đổi
+# - changed_columns: cột thay đổi ở ít nhất một nhóm (kể cả nhóm bị xóa), full: không có trạng thái cũ để dùng lại
+GroupChanges = namedtuple("GroupChanges", ["groups", "changed_groups", "changed_columns", "full"])
+
+
+def _row_hashes(df, columns):
+    # Dấu vân tay của từng dòng cho từng cột, gồm cả tên cầu thủ (đổi tên cũng là thay đổi)
+    player_hash = pd.util.hash_pandas_object(df["Player"], index=False).to_numpy()
+    for col in columns:
+        yield col, pd.util.hash_array(player_hash ^ pd.util.hash_pandas_object(df[col], index=False).to_numpy())
+
+
+def group_digests(df, by, columns):
+    """Dấu vân tay nội dung của từng (nhóm, cột): DataFrame chuỗi hex, chỉ mục là các nhóm theo thứ tự tên.
+
+    Mỗi dòng được băm cùng vị trí của nó trong nhóm rồi cộng dồn (modulo 2^64) theo nhóm, nên dấu vân tay
+    thay đổi khi một giá trị, một cầu thủ hoặc thứ tự các cầu thủ trong nhóm thay đổi. Các dòng thiếu khóa nhóm
+    được băm vào nhóm MISSING_GROUP ở cuối (chỉ có khi tồn tại những dòng này).
+    """
+    codes, groups = pd.factorize(df[by], sort=True)
+    groups = list(groups)
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(groups), codes)
+        groups.append(MISSING_GROUP)
+    positions = pd.Series(codes).groupby(codes).cumcount().to_numpy().astype(np.uint64)
+    position_hash = pd.util.hash_array(positions)
+    sizes = pd.util.hash_array(np.bincount(codes, minlength=len(groups)).astype(np.uint64))
+
+    digests = {}
+    for col, row_hash in _row_hashes(df, columns):
+        sums = np.zeros(len(groups), dtype=np.uint64)
+        np.add.at(sums, codes, pd.util.hash_array(row_hash ^ position_hash))
+        digests[col] = [f"{value:016x}" for value in pd.util.hash_array(sums ^ sizes)]
+    return pd.DataFrame(digests, index=pd.Index(groups, dtype=object), columns=list(columns))
+
+
+def row_order_digest(df):
+    """Dấu vân tay của thứ tự (Player, Team) trên toàn bảng: khác nhau thì vị trí dòng cũ không còn dùng được."""
+    row_hash = pd.util.hash_pandas_object(df[["Player", "Team"]], index=False).to_numpy()
+    mixed = pd.util.hash_array(row_hash ^ pd.util.hash_array(np.arange(len(df), dtype=np.uint64)))
+    return f"{int(mixed.sum(dtype=np.uint64)):016x}-{len(df)}"
+
+
+class StatsCache:
+    """Trạng thái của lần chạy trước trong state_dir: dấu vân tay nội dung theo (nhóm, cột) và các bảng trung gian.
+
+    Dùng để chỉ tính lại phần bị ảnh hưởng khi chỉ một số cầu thủ thay đổi. Trạng thái cũ bị bỏ qua (tính lại
+    toàn bộ) khi full=True, khi config (danh sách cột, các thống kê...) khác lần trước hoặc khi STATE_VERSION đổi.
+    Trạng thái mới chỉ được ghi ra đĩa khi gọi save(), sau khi mọi tệp kết quả đã được ghi xong.
+    """
+
+    def __init__(self, state_dir, config, full=False):
+        self.state_dir = state_dir
+        self._previous = {}
+        if not full:
+            try:
+                with open(os.path.join(state_dir, STATE_FILE), "r", encoding="utf-8") as f:
+                    previous = json.load(f)
+                if previous.get("version") == STATE_VERSION and previous.get("config") == config:
+                    self._previous = previous
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+        self.full = not self._previous
+        self._state = {"version": STATE_VERSION, "config": config, "digests": {}, "row_order": None, "tables": []}
+        self._tables = {}
+        self._changes = {}
+
+    def changes(self, df, by, columns):
+        """So sánh dữ liệu hiện tại với lần chạy trước theo khóa nhóm by, trả về GroupChanges."""
+        if by in self._changes:
+            return self._changes[by]
+        current = group_digests(df, by, columns)
+        self._state["digests"][by] = {"columns": list(columns),
+                                      "groups": {str(group): list(row) for group, row in zip(current.index, current.values)}}
+        previous = self._previous.get("digests", {}).get(by)
+        # MISSING_GROUP chỉ góp vào changed_columns, không phải một nhóm của kết quả
+        groups = [group for group in current.index if group != MISSING_GROUP]
+        if self.full or previous is None or previous["columns"] != list(columns):
+            result = GroupChanges(groups, groups, list(columns), True)
+        else:
+            previous = pd.DataFrame.from_dict(previous["groups"], orient="index", columns=previous["columns"])
+            every_group = current.index.union(previous.index, sort=False)
+            # Nhóm mới hoặc bị xóa có giá trị thiếu ở một bên nên được tính là thay đổi
+            changed = current.reindex(every_group).ne(previous.reindex(every_group)).to_numpy()
+            changed_rows = changed.any(axis=1)
+            changed_groups = [group for group, flag in zip(every_group, changed_rows) if flag and group in groups]
+            changed_columns = [col for col, flag in zip(columns, changed.any(axis=0)) if flag]
+            result = GroupChanges(groups, changed_groups, changed_columns, False)
+        self._changes[by] = result
+        return result
+
+    def row_order_changed(self, df):
+        """True nếu thứ tự các dòng (Player, Team) khác lần chạy trước (hoặc không có trạng thái cũ)."""
+        digest = row_order_digest(df)
+        self._state["row_order"] = digest
+        return self.full or self._previous.get("row_order") != digest
+
+    def table(self, name):
+        """Bảng trung gian đã lưu ở lần chạy trước, None nếu không có (hoặc đang tính lại toàn bộ)."""
+        if self.full or name not in self._previous.get("tables", []):
+            return None
+        try:
+            # round_trip: số thực đọc lại giống hệt từng bit lúc ghi
+            return pd.read_csv(os.path.join(self.state_dir, f"{name}.csv"), encoding="utf-8",
+                               keep_default_na=False, na_values=[""], float_precision="round_trip")
+        except FileNotFoundError:
+            return None
+
+    def set_table(self, name, df):
+        self._tables[name] = df
+
+    def save(self):
+        """Ghi các bảng trung gian và dấu vân tay (ghi tệp tạm rồi đổi tên)."""
+        os.makedirs(self.state_dir, exist_ok=True)
+        for name, df in self._tables.items():
+            path = os.path.join(self.state_dir, f"{name}.csv")
+            df.to_csv(path + ".tmp", index=False, encoding="utf-8")
+            os.replace(path + ".tmp", path)
+        self._state["tables"] = sorted(self._tables)
+        path = os.path.join(self.state_dir, STATE_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
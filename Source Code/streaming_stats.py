@@ -0,0 +1,317 @@
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import pandas as pd
+from process_pool import pool_context
+from player_summary import SUMMARY_STATS, SUMMARY_GROUP_LABELS, DEFAULT_SUMMARY_STATS, summarize_groups
+from benchmark_utils import synthetic_players
+
+# Độ chính xác tương đối mặc định của phác thảo phân vị (giống DDSketch): sai số tương đối của trung vị <= 1%
+SKETCH_ACCURACY = 0.01
+# Giá trị có trị tuyệt đối nhỏ hơn ngưỡng này được đếm vào ô số 0 (sai số tuyệt đối < 1e-9)
+SKETCH_MIN_VALUE = 1e-9
+
+# Mỗi ô của phác thảo được mã hóa thành một số int64: (cột << 43) | (nhóm << 22) | (ô + 2^21)
+# Ô > 0 cho giá trị dương, < 0 cho giá trị âm, 0 cho giá trị ~0, nên thứ tự các mã trùng với thứ tự giá trị
+_BUCKET_BITS = 22
+_GROUP_BITS = 21
+_BUCKET_SHIFT = 1 << (_BUCKET_BITS - 1)
+_BUCKET_OFFSET = 1 << 20
+
+
+def _bucket_ids(values, log_gamma):
+    # Ô của từng giá trị: ceil(log_gamma(|x|)) (dịch cho luôn dương), mang dấu của x; ~0 vào ô 0
+    ids = np.zeros(values.shape, dtype=np.int64)
+    positive = values > SKETCH_MIN_VALUE
+    negative = values < -SKETCH_MIN_VALUE
+    ids[positive] = np.ceil(np.log(values[positive]) / log_gamma).astype(np.int64) + _BUCKET_OFFSET
+    ids[negative] = -(np.ceil(np.log(-values[negative]) / log_gamma).astype(np.int64) + _BUCKET_OFFSET)
+    return ids
+
+
+def _bucket_values(ids, gamma):
+    # Giá trị đại diện của ô k là 2 * gamma^k / (gamma + 1): cách mọi giá trị trong ô không quá alpha (tương đối)
+    magnitude = 2.0 * np.power(gamma, np.abs(ids) - _BUCKET_OFFSET) / (gamma + 1.0)
+    return np.where(ids == 0, 0.0, np.sign(ids) * magnitude)
+
+
+def _merge_sketch(keys, counts, other_keys, other_counts):
+    # Gộp hai phác thảo (mảng mã ô + số đếm): sắp xếp theo mã rồi cộng số đếm của các mã trùng nhau
+    keys = np.concatenate([keys, other_keys])
+    counts = np.concatenate([counts, other_counts])
+    order = np.argsort(keys, kind="stable")
+    keys, counts = keys[order], counts[order]
+    unique_keys, starts = np.unique(keys, return_index=True)
+    return unique_keys, np.add.reduceat(counts, starts) if len(keys) else counts
+
+
+class StreamingSummary:
+    """Thống kê theo nhóm tính dần từ một luồng các khối dòng, bộ nhớ không phụ thuộc số dòng đã đọc.
+
+    Với mỗi (nhóm, cột) chỉ giữ: số giá trị, trung bình và tổng bình phương độ lệch (Welford; các khối và
+    các phần được gộp bằng công thức của Chan), nhỏ nhất / lớn nhất, và một phác thảo phân vị kiểu DDSketch
+    cho trung vị. Phác thảo chia trục giá trị thành các ô [gamma^(k-1), gamma^k) với
+    gamma = (1 + alpha) / (1 - alpha) nên:
+    - mỗi thống kê thứ tự (ví dụ phần tử giữa) được ước lượng với sai số tương đối <= alpha
+      (giá trị |x| < SKETCH_MIN_VALUE được coi là 0); trung vị của số phần tử chẵn là trung bình của hai phần tử
+      giữa như pandas, nên sai số <= alpha * max(|x_giữa_1|, |x_giữa_2|);
+    - số ô của mỗi (nhóm, cột) không quá ln(max|x| / min|x|) / ln(gamma) cho mỗi dấu, ví dụ khoảng 1000 ô
+      cho dữ liệu từ 0.001 đến 1e6 với alpha = 1%, dù đã đọc bao nhiêu dòng.
+    Trung bình, độ lệch chuẩn, nhỏ nhất, lớn nhất và số lượng là chính xác (sai khác chỉ ở mức làm tròn số thực).
+
+    Các phần tính ở những tiến trình khác nhau (trên các khối khác nhau) gộp được bằng merge(); kết quả không
+    phụ thuộc cách chia khối. by=None: chỉ tính hàng tổng thể.
+    """
+
+    def __init__(self, columns, by=None, relative_accuracy=SKETCH_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy phải nằm trong (0, 1): {relative_accuracy}")
+        self.columns = list(columns)
+        self.by = by
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.groups = [] # Nhãn nhóm theo thứ tự gặp; None là các dòng thiếu khóa nhóm (chỉ tính vào hàng tổng thể)
+        self._group_index = {}
+        shape = (0, len(self.columns))
+        self.count = np.zeros(shape)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+        self._sketch_keys = np.empty(0, dtype=np.int64)
+        self._sketch_counts = np.empty(0, dtype=np.int64)
+
+    def _register(self, labels):
+        # Chỉ số toàn cục của các nhãn nhóm (thêm nhóm mới vào cuối các mảng)
+        indices = []
+        for label in labels:
+            label = None if pd.isna(label) else label
+            if label not in self._group_index:
+                self._group_index[label] = len(self.groups)
+                self.groups.append(label)
+            indices.append(self._group_index[label])
+        missing = len(self.groups) - len(self.count)
+        if missing > 0:
+            if len(self.groups) >= 1 << _GROUP_BITS:
+                raise ValueError(f"Quá nhiều nhóm (tối đa {1 << _GROUP_BITS})")
+            pad = np.zeros((missing, len(self.columns)))
+            self.count = np.vstack([self.count, pad])
+            self.mean = np.vstack([self.mean, pad])
+            self.m2 = np.vstack([self.m2, pad])
+            self.min = np.vstack([self.min, pad + np.inf])
+            self.max = np.vstack([self.max, pad - np.inf])
+        return np.array(indices, dtype=np.int64)
+
+    def _combine(self, rows, count, mean, m2, minimum, maximum):
+        # Công thức của Chan: gộp (n_a, mean_a, M2_a) của các nhóm rows với (n_b, mean_b, M2_b)
+        n_a, mean_a = self.count[rows], self.mean[rows]
+        total = n_a + count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean - mean_a
+            weight = np.where(total > 0, count / total, 0.0)
+            self.mean[rows] = mean_a + delta * weight
+            self.m2[rows] += m2 + delta ** 2 * n_a * weight
+        self.count[rows] = total
+        self.min[rows] = np.minimum(self.min[rows], minimum)
+        self.max[rows] = np.maximum(self.max[rows], maximum)
+
+    def update(self, chunk):
+        """Thêm một khối dòng (DataFrame có các cột columns và cột by); giá trị thiếu (NaN) được bỏ qua."""
+        if len(chunk) == 0:
+            return self
+        if self.by is None:
+            codes = self._register([None])[np.zeros(len(chunk), dtype=np.int64)]
+        else:
+            local_codes, labels = pd.factorize(chunk[self.by], use_na_sentinel=False)
+            codes = self._register(labels)[local_codes]
+        rows, codes = np.unique(codes, return_inverse=True)
+
+        values = chunk[self.columns].to_numpy(dtype="float64", na_value=np.nan)
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        shape = (len(rows), len(self.columns))
+        count, total, m2 = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+        np.add.at(count, codes, present)
+        np.add.at(total, codes, filled)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total / count, 0.0)
+        # Hai lượt trong khối: tổng bình phương độ lệch so với trung bình của chính khối đó
+        np.add.at(m2, codes, np.where(present, filled - mean[codes], 0.0) ** 2)
+        minimum, maximum = np.full(shape, np.inf), np.full(shape, -np.inf)
+        np.minimum.at(minimum, codes, np.where(present, values, np.inf))
+        np.maximum.at(maximum, codes, np.where(present, values, -np.inf))
+        self._combine(rows, count, mean, m2, minimum, maximum)
+
+        row_index, column_index = np.nonzero(present)
+        buckets = _bucket_ids(values[row_index, column_index], np.log(self.gamma))
+        keys = (column_index.astype(np.int64) << (_GROUP_BITS + _BUCKET_BITS)) \
+            | (rows[codes[row_index]] << _BUCKET_BITS) | (buckets + _BUCKET_SHIFT)
+        chunk_keys, chunk_counts = np.unique(keys, return_counts=True)
+        self._sketch_keys, self._sketch_counts = _merge_sketch(self._sketch_keys, self._sketch_counts,
+                                                               chunk_keys, chunk_counts.astype(np.int64))
+        return self
+
+    def merge(self, other):
+        """Gộp một StreamingSummary khác (cùng cột, khóa nhóm và độ chính xác) vào đối tượng này."""
+        if other.columns != self.columns or other.by != self.by or other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Chỉ gộp được các StreamingSummary có cùng cột, khóa nhóm và độ chính xác")
+        if not other.groups:
+            return self
+        rows = self._register(other.groups)
+        self._combine(rows, other.count, other.mean, other.m2, other.min, other.max)
+        # Đổi chỉ số nhóm trong mã ô của other sang chỉ số nhóm của đối tượng này
+        group_mask = (1 << _GROUP_BITS) - 1
+        other_groups = (other._sketch_keys >> _BUCKET_BITS) & group_mask
+        keys = (other._sketch_keys & ~(group_mask << _BUCKET_BITS)) | (rows[other_groups] << _BUCKET_BITS)
+        self._sketch_keys, self._sketch_counts = _merge_sketch(self._sketch_keys, self._sketch_counts,
+                                                               keys, other._sketch_counts)
+        return self
+
+    def _quantiles(self, keys, counts, q):
+        # Phân vị q (nội suy tuyến tính giữa hai phần tử như numpy / pandas) cho từng đoạn (cột, nhóm) của phác thảo
+        segments, starts = np.unique(keys >> _BUCKET_BITS, return_index=True)
+        totals = np.add.reduceat(counts, starts)
+        cumulative = np.cumsum(counts)
+        before = cumulative[starts] - counts[starts]
+        position = q * (totals - 1)
+        lower, upper = np.floor(position).astype(np.int64), np.ceil(position).astype(np.int64)
+        buckets = (keys & ((1 << _BUCKET_BITS) - 1)) - _BUCKET_SHIFT
+        low = _bucket_values(buckets[np.searchsorted(cumulative, before + lower, side="right")], self.gamma)
+        high = _bucket_values(buckets[np.searchsorted(cumulative, before + upper, side="right")], self.gamma)
+        return segments, low + (high - low) * (position - lower)
+
+    def _overall(self):
+        # Hàng tổng thể: gộp mọi nhóm (kể cả dòng thiếu khóa nhóm) bằng công thức của Chan, cộng các phác thảo
+        count = self.count.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (self.count * self.mean).sum(axis=0) / count
+            m2 = (self.m2 + self.count * (self.mean - mean) ** 2).sum(axis=0)
+        group_mask = (1 << _GROUP_BITS) - 1
+        keys = self._sketch_keys & ~(group_mask << _BUCKET_BITS)
+        order = np.argsort(keys, kind="stable")
+        keys, starts = np.unique(keys[order], return_index=True)
+        counts = np.add.reduceat(self._sketch_counts[order], starts) if len(order) else self._sketch_counts
+        return count, mean, m2, self.min.min(axis=0, initial=np.inf), self.max.max(axis=0, initial=-np.inf), keys, counts
+
+    def summary(self, stats=None, overall_label="all", decimals=2):
+        """Bảng thống kê cùng định dạng với summarize_groups (results2.csv): hàng tổng thể rồi từng nhóm theo tên."""
+        stats = list(stats or DEFAULT_SUMMARY_STATS)
+        unknown = [stat for stat in stats if stat not in SUMMARY_STATS]
+        if unknown:
+            raise ValueError(f"Thống kê không hỗ trợ: {', '.join(unknown)} (hỗ trợ: {', '.join(SUMMARY_STATS)})")
+        labels = sorted(label for label in self.groups if label is not None)
+        rows = np.array([self._group_index[label] for label in labels], dtype=np.int64)
+
+        count, mean, m2, minimum, maximum, keys, counts = self._overall()
+        count = np.vstack([count, self.count[rows]])
+        mean = np.vstack([mean, self.mean[rows]])
+        m2 = np.vstack([m2, self.m2[rows]])
+        minimum = np.vstack([minimum, self.min[rows]])
+        maximum = np.vstack([maximum, self.max[rows]])
+
+        median = np.full(count.shape, np.nan)
+        if "median" in stats:
+            # Hàng 0 là tổng thể (phác thảo đã gộp, mã nhóm 0), hàng i + 1 là nhóm labels[i]
+            segments, values = self._quantiles(keys, counts, 0.5)
+            median[0, segments >> _GROUP_BITS] = values
+            segments, values = self._quantiles(self._sketch_keys, self._sketch_counts, 0.5)
+            position = np.full(len(self.groups), -1)
+            position[rows] = np.arange(1, len(rows) + 1)
+            target = position[segments & ((1 << _GROUP_BITS) - 1)]
+            wanted = target > 0
+            median[target[wanted], (segments >> _GROUP_BITS)[wanted]] = values[wanted]
+
+        empty = count == 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            results = {
+                "median": median,
+                "mean": np.where(empty, np.nan, mean),
+                "std": np.where(count > 1, np.sqrt(m2 / (count - 1)), np.nan),
+                "min": np.where(empty, np.nan, minimum),
+                "max": np.where(empty, np.nan, maximum),
+                "count": count,
+            }
+        summary = pd.DataFrame(
+            np.stack([results[stat] for stat in stats], axis=2).reshape(len(count), -1),
+            columns=[f"{SUMMARY_STATS[stat]} của {col}" for col in self.columns for stat in stats],
+        )
+        if decimals is not None:
+            summary = summary.round(decimals)
+        summary.insert(0, SUMMARY_GROUP_LABELS.get(self.by, f"{self.by}/Tổng thể"), [overall_label] + labels)
+        return summary
+
+    def nbytes(self):
+        """Bộ nhớ (byte) của các bộ tích lũy: tỉ lệ với số nhóm x số cột x số ô, không với số dòng đã đọc."""
+        arrays = [self.count, self.mean, self.m2, self.min, self.max, self._sketch_keys, self._sketch_counts]
+        return sum(array.nbytes for array in arrays)
+
+
+def _summarize_chunk(chunk, columns, keys, relative_accuracy):
+    return {key: StreamingSummary(columns, by=key, relative_accuracy=relative_accuracy).update(chunk) for key in keys}
+
+
+def stream_summaries(chunks, columns, keys, relative_accuracy=SKETCH_ACCURACY, workers=1):
+    """Đọc luồng chunks (các DataFrame) một lần và trả về {khóa nhóm: StreamingSummary} cho mọi khóa trong keys.
+
+    workers > 1: các khối được tính ở các tiến trình con rồi gộp bằng merge(); số khối đang xử lý được giới hạn
+    ở 2 x workers nên bộ nhớ vẫn không phụ thuộc số dòng.
+    """
+    summaries = {key: StreamingSummary(columns, by=key, relative_accuracy=relative_accuracy) for key in keys}
+    if workers <= 1:
+        for chunk in chunks:
+            for summary in summaries.values():
+                summary.update(chunk)
+        return summaries
+
+    def merge_done(done):
+        for future in done:
+            for key, partial in future.result().items():
+                summaries[key].merge(partial)
+
+    # Các phần được gộp theo thứ tự hoàn thành: kết quả không phụ thuộc thứ tự gộp (trừ làm tròn số thực)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as executor:
+        pending = set()
+        for chunk in chunks:
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                merge_done(done)
+            pending.add(executor.submit(_summarize_chunk, chunk, columns, list(keys), relative_accuracy))
+        merge_done(wait(pending).done)
+    return summaries
+
+
+if __name__ == "__main__":
+    # Đo so sánh với cách tính chính xác trong bộ nhớ:
+    #   python streaming_stats.py [số dòng] [số dòng mỗi khối] [độ chính xác]  (mặc định 200k, 20k, 0.01)
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    accuracy = float(sys.argv[3]) if len(sys.argv) > 3 else SKETCH_ACCURACY
+    df = synthetic_players(n_rows, n_stats=20, n_teams=500, distribution="lognormal", zero_rate=0.2)
+    stats = [col for col in df.columns if col.startswith("Stat ")]
+    chunks = [df.iloc[start:start + chunk_size] for start in range(0, n_rows, chunk_size)]
+
+    start = time.perf_counter()
+    exact = summarize_groups(df, stats, decimals=None)
+    exact_time = time.perf_counter() - start
+    start = time.perf_counter()
+    streamed = stream_summaries(iter(chunks), stats, ["Team"], accuracy)["Team"]
+    stream_time = time.perf_counter() - start
+    approx = streamed.summary(decimals=None)
+
+    medians = [col for col in exact.columns if col.startswith("Trung vị")]
+    others = [col for col in exact.columns[1:] if col not in medians]
+    truth = exact[medians].to_numpy()
+    relative = np.abs(approx[medians].to_numpy() - truth) / np.where(truth == 0, 1, np.abs(truth))
+    print(f"🌊 {n_rows:,} dòng x {len(stats)} cột, {df['Team'].nunique()} đội, khối {chunk_size:,} dòng, alpha={accuracy}:")
+    print(f"   trong bộ nhớ {exact_time * 1000:8.1f} ms | theo luồng {stream_time * 1000:8.1f} ms | "
+          f"bộ tích lũy {streamed.nbytes() / 1e6:.1f} MB (dữ liệu {df[stats].to_numpy().nbytes / 1e6:.1f} MB)")
+    print(f"   sai số tương đối lớn nhất của trung vị {relative.max():.5f} (giới hạn {accuracy}) | "
+          f"trung bình / độ lệch chuẩn lệch tối đa {np.nanmax(np.abs(approx[others].to_numpy() - exact[others].to_numpy())):.2e}")
+
+    # Hai nửa tính riêng (như ở hai tiến trình) rồi gộp: trung vị, số lượng giống hệt một lượt, phần còn lại
+    # chỉ khác ở mức làm tròn số thực
+    halves = [stream_summaries(iter(chunks[i::2]), stats, ["Team"], accuracy)["Team"] for i in range(2)]
+    merged = halves[0].merge(halves[1]).summary(decimals=None)
+    same = merged[medians].equals(approx[medians]) and np.allclose(merged[others], approx[others], rtol=1e-12, equal_nan=True)
+    print(f"   gộp hai phần giống một lượt: {'có' if same else 'KHÔNG'}")
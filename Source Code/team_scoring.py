@@ -0,0 +1,132 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from player_summary import summarize_groups
+from player_percentiles import primary_position
+from benchmark_utils import synthetic_players
+
+# Các thống kê mà giá trị thấp hơn là tốt hơn (số bàn thua, thẻ phạt, mất bóng...): mặc định có dấu âm
+NEGATIVE_STATS = ["GA90", "crdY", "crdR", "Lost", "Mis", "Dis", "Fls", "Off", "Aerl Lost"]
+
+# Khóa nhóm của bảng xếp hạng -> cách lấy nhóm của từng cầu thủ (Position: vị trí chính, "MF,FW" -> "MF")
+SCORING_GROUPS = {
+    "Team": lambda df: df["Team"],
+    "Position": lambda df: primary_position(df["Position"]),
+    "Nation": lambda df: df["Nation"],
+}
+# Tên cột của bảng xếp hạng (sau cột nhóm)
+LEADERBOARD_COLUMNS = ["Hạng", "Điểm tổng hợp", "Số thống kê dẫn đầu"]
+
+
+def parse_weights(items):
+    """Đọc trọng số dạng ["Gls=2", "GA90=-1.5"] thành dict thống kê -> trọng số (có dấu)."""
+    weights = {}
+    for item in items or []:
+        stat, sep, value = item.rpartition("=")
+        if not sep or not stat:
+            raise ValueError(f"Trọng số không hợp lệ: {item} (dạng <thống kê>=<trọng số>, ví dụ GA90=-1.5)")
+        weights[stat] = float(value)
+    return weights
+
+
+def weight_vector(columns, weights=None, negative_stats=NEGATIVE_STATS):
+    """Vector trọng số có dấu theo thứ tự columns: mặc định 1 cho mỗi thống kê và -1 cho negative_stats;
+    weights (thống kê -> trọng số có dấu) ghi đè giá trị mặc định, trọng số 0 là bỏ thống kê đó."""
+    weights = weights or {}
+    unknown = [stat for stat in weights if stat not in columns]
+    if unknown:
+        raise ValueError(f"Thống kê không có trong dữ liệu: {', '.join(unknown)}")
+    negative = set(negative_stats)
+    return np.array([weights.get(col, -1.0 if col in negative else 1.0) for col in columns])
+
+
+def zscores(means):
+    """Chuẩn hóa ma trận trung bình (nhóm x thống kê) theo từng cột: (x - trung bình) / độ lệch chuẩn giữa các nhóm.
+
+    Ô thiếu và cột không đổi giữa các nhóm có điểm 0 (không làm lệch điểm tổng hợp).
+    """
+    means = np.asarray(means, dtype="float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (means - np.nanmean(means, axis=0)) / np.nanstd(means, axis=0)
+    return np.nan_to_num(z, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+class TeamScorer:
+    """Điểm tổng hợp của các nhóm (đội, vị trí chính hoặc quốc tịch) theo một hay nhiều bộ trọng số.
+
+    Trung bình theo nhóm và z-score được tính một lần khi tạo; điểm của một bộ trọng số w là z @ w / sum(|w|)
+    (trung bình có trọng số của các z-score đã đổi dấu), nên chấm điểm hàng nghìn bộ trọng số chỉ là một
+    phép nhân ma trận (nhóm x thống kê) @ (thống kê x số bộ trọng số).
+    """
+
+    def __init__(self, df, columns, by="Team"):
+        if by not in SCORING_GROUPS:
+            raise ValueError(f"Khóa nhóm không hỗ trợ: {by} (hỗ trợ: {', '.join(SCORING_GROUPS)})")
+        self.by = by
+        self.columns = list(columns)
+        grouped = df[self.columns].assign(**{by: SCORING_GROUPS[by](df)})
+        # Cùng cách tính trung bình theo nhóm như results2.csv, bỏ hàng tổng thể
+        means = summarize_groups(grouped, self.columns, by=by, stats=["mean"], decimals=None).iloc[1:]
+        self.groups = means.iloc[:, 0].tolist()
+        self.means = means.iloc[:, 1:].to_numpy(dtype="float64")
+        self.z = zscores(self.means)
+
+    def scores(self, weights):
+        """Điểm của mọi nhóm: weights dạng (thống kê,) cho kết quả (nhóm,), dạng (thống kê, k) cho (nhóm, k)."""
+        weights = np.asarray(weights, dtype="float64")
+        total = np.abs(weights).sum(axis=0)
+        return self.z @ weights / np.where(total == 0, 1.0, total)
+
+    def best(self, weights):
+        """Nhóm có điểm cao nhất cho từng bộ trọng số (các cột của weights dạng (thống kê, k))."""
+        return [self.groups[i] for i in np.argmax(self.scores(weights), axis=0)]
+
+    def leaderboard(self, weights):
+        """Bảng xếp hạng đầy đủ: cột nhóm rồi LEADERBOARD_COLUMNS, theo điểm giảm dần (bằng điểm: theo tên nhóm).
+
+        "Số thống kê dẫn đầu" đếm các thống kê có trọng số khác 0 mà nhóm có z-score đã đổi dấu cao nhất.
+        """
+        weights = np.asarray(weights, dtype="float64")
+        scores = self.scores(weights)
+        leads = np.zeros(len(self.groups), dtype=np.int64)
+        signed = (self.z * np.sign(weights))[:, weights != 0]
+        if signed.size:
+            leads += np.bincount(np.argmax(signed, axis=0), minlength=len(self.groups))
+        order = np.lexsort((np.arange(len(scores)), -scores))
+        return pd.DataFrame({
+            self.by: [self.groups[i] for i in order],
+            LEADERBOARD_COLUMNS[0]: np.arange(1, len(order) + 1),
+            LEADERBOARD_COLUMNS[1]: scores[order].round(4),
+            LEADERBOARD_COLUMNS[2]: leads[order],
+        })
+
+
+def _loop_best(df, columns, profiles):
+    # Cách làm khi chạy lại script cho mỗi bộ trọng số: tính lại trung bình theo đội, z-score và điểm từng lần
+    best = []
+    for weights in profiles.T:
+        team_means = df.groupby("Team")[columns].mean()
+        z = (team_means - team_means.mean()) / team_means.std(ddof=0)
+        best.append((z.fillna(0) * weights).sum(axis=1).idxmax())
+    return best
+
+
+if __name__ == "__main__":
+    # Đo so sánh: python team_scoring.py [số bộ trọng số]  (mặc định 5000 bộ, 500 cầu thủ x 70 thống kê, 20 đội)
+    n_profiles = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    df = synthetic_players(500, n_stats=70, n_teams=20)
+    stats = [col for col in df.columns if col.startswith("Stat ")]
+    profiles = np.random.default_rng(1).normal(size=(len(stats), n_profiles))
+
+    n_loop = min(n_profiles, 200)
+    start = time.perf_counter()
+    expected = _loop_best(df, stats, profiles[:, :n_loop])
+    loop_time = (time.perf_counter() - start) / n_loop * n_profiles
+    start = time.perf_counter()
+    scorer = TeamScorer(df, stats)
+    actual = scorer.best(profiles)
+    sweep_time = time.perf_counter() - start
+    print(f"🏆 {n_profiles} bộ trọng số x {len(stats)} thống kê, {len(scorer.groups)} đội: tính lại từng bộ "
+          f"~{loop_time:7.2f} s | một phép nhân ma trận {sweep_time * 1000:7.1f} ms | "
+          f"cùng đội tốt nhất: {'có' if expected == actual[:n_loop] else 'KHÔNG'}")